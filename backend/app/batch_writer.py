@@ -0,0 +1,215 @@
+"""Chấm điểm từng khối tin nhắn và ghi nối tiếp ra CSV kết quả."""
+
+from __future__ import annotations
+
+import csv
+import gzip
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from itertools import repeat
+from typing import Any, Callable, Iterable, Iterator, TextIO
+
+import numpy as np
+
+from .metrics import stage
+from .model_registry import ColumnarPrediction, ModelRegistry, MultiModelPrediction
+
+RESULT_COLUMNS = ["row_id", "text", "label", "score", "threshold_used", "model_id"]
+# Model cascade ghi thêm tầng đã quyết định từng tin.
+CASCADE_COLUMNS = [*RESULT_COLUMNS, "decided_by"]
+
+
+@dataclass(slots=True)
+class BatchFileSummary:
+    total_rows: int = 0
+    unique_rows: int = 0
+    disagreement_rows: int = 0
+    preview: list[dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def dedup_ratio(self) -> float:
+        """Tổng dòng / tổng tin duy nhất (khử trùng theo từng khối)."""
+        return self.total_rows / self.unique_rows if self.unique_rows else 1.0
+
+
+def _csv_rows(batch: ColumnarPrediction, first_row_id: int) -> Iterator[tuple]:
+    """Dòng CSV ghép thẳng từ các cột, theo thứ tự `RESULT_COLUMNS` (+ `decided_by`)."""
+    count = batch.total_rows
+    scores = batch.scores.tolist() if batch.scores is not None else repeat(None, count)
+    columns = [
+        range(first_row_id, first_row_id + count),
+        batch.texts,
+        batch.labels.tolist(),
+        scores,
+        repeat(batch.threshold, count),
+        repeat(batch.model_id, count),
+    ]
+    if batch.decided_by is not None:
+        columns.append(batch.decided_by.tolist())
+    return zip(*columns)
+
+
+def _multi_columns(registry: ModelRegistry, model_ids: list[str]) -> list[str]:
+    columns = ["row_id", "text"]
+    for model_id in model_ids:
+        columns += [f"label_{model_id}", f"score_{model_id}"]
+        if registry.get_config(model_id).type == "cascade":
+            columns.append(f"decided_by_{model_id}")
+    return [*columns, "disagree"]
+
+
+def _multi_csv_rows(batch: MultiModelPrediction, first_row_id: int) -> Iterator[tuple]:
+    """Dòng CSV: row_id, text, (nhãn, điểm[, tầng]) từng model, cờ bất đồng 0/1."""
+    count = batch.total_rows
+    columns: list[Iterable] = [range(first_row_id, first_row_id + count), batch.texts]
+    for prediction in batch.predictions:
+        columns.append(prediction.labels.tolist())
+        if prediction.scores is not None:
+            columns.append(prediction.scores.tolist())
+        else:
+            columns.append(repeat(None, count))
+        if prediction.decided_by is not None:
+            columns.append(prediction.decided_by.tolist())
+    columns.append(batch.disagreement.astype(np.int8).tolist())
+    return zip(*columns)
+
+
+def score_matrix(batch: ColumnarPrediction | MultiModelPrediction) -> np.ndarray:
+    """Điểm dạng (dòng x model) float64, NaN với model không có `predict_proba`."""
+    predictions = batch.predictions if isinstance(batch, MultiModelPrediction) else [batch]
+    matrix = np.full((batch.total_rows, len(predictions)), np.nan)
+    for column, prediction in enumerate(predictions):
+        if prediction.scores is not None:
+            matrix[:, column] = prediction.scores
+    return matrix
+
+
+def open_result_csv(output_path: Path) -> TextIO:
+    """Đuôi `.gz` => ghi thẳng CSV nén (mức 6: nhanh hơn nhiều mức 9, file lớn hơn ~5%)."""
+    if output_path.suffix == ".gz":
+        return gzip.open(
+            output_path, "wt", compresslevel=6, encoding="utf-8-sig", newline=""
+        )
+    return output_path.open("w", encoding="utf-8-sig", newline="")
+
+
+def _write_csv(
+    output_path: Path,
+    columns: list[str],
+    chunks: Iterable[list[str]],
+    score: Callable[[list[str]], Any],
+    csv_rows: Callable[[Any, int], Iterator[tuple]],
+    summary: BatchFileSummary,
+    preview_limit: int,
+    on_chunk: Callable[[BatchFileSummary], None] | None,
+    model_id: str | None = None,
+    scores_path: Path | None = None,
+    first_row_id: int = 1,
+) -> BatchFileSummary:
+    scores_handle = scores_path.open("wb") if scores_path is not None else None
+    try:
+        with open_result_csv(output_path) as handle:
+            writer = csv.writer(handle, lineterminator=os.linesep)
+            writer.writerow(columns)
+            for messages in chunks:
+                if not messages:
+                    continue
+                batch = score(messages)
+                with stage("write", model_id):
+                    writer.writerows(csv_rows(batch, first_row_id + summary.total_rows))
+                    if scores_handle is not None:
+                        scores_handle.write(score_matrix(batch).tobytes())
+                    missing = preview_limit - len(summary.preview)
+                    if missing > 0:
+                        for row_id, row in enumerate(
+                            batch.rows(limit=missing), start=first_row_id + summary.total_rows
+                        ):
+                            summary.preview.append({"row_id": row_id, **row})
+                summary.total_rows += batch.total_rows
+                summary.unique_rows += batch.unique_rows
+                if on_chunk is not None:
+                    on_chunk(summary)
+        if summary.total_rows == 0:
+            raise ValueError("Không có dòng văn bản hợp lệ để dự đoán.")
+    except BaseException:
+        output_path.unlink(missing_ok=True)
+        if scores_path is not None:
+            scores_path.unlink(missing_ok=True)
+        raise
+    finally:
+        if scores_handle is not None:
+            scores_handle.close()
+    return summary
+
+
+def write_predictions_csv(
+    registry: ModelRegistry,
+    model_id: str,
+    chunks: Iterable[list[str]],
+    output_path: Path,
+    threshold: float | None = None,
+    preview_limit: int = 20,
+    on_chunk: Callable[[BatchFileSummary], None] | None = None,
+    scores_path: Path | None = None,
+    first_row_id: int = 1,
+) -> BatchFileSummary:
+    """Ghi CSV cùng định dạng `DataFrame.to_csv(index=False, encoding="utf-8-sig")`.
+
+    Mỗi khối chỉ sống trong bộ nhớ trong lúc chấm điểm nên bộ nhớ không phụ
+    thuộc kích thước file. Lỗi giữa chừng sẽ xoá file kết quả dở dang.
+    `scores_path`: ghi thêm ma trận điểm float64 thô (xem `score_matrix`).
+    `first_row_id`: `row_id` của dòng đầu (shard giữa file đánh số tiếp theo file gốc).
+    """
+    is_cascade = registry.get_config(model_id).type == "cascade"
+    return _write_csv(
+        output_path,
+        CASCADE_COLUMNS if is_cascade else RESULT_COLUMNS,
+        chunks,
+        lambda messages: registry.predict_batch_columnar(model_id, messages, threshold),
+        _csv_rows,
+        BatchFileSummary(),
+        preview_limit,
+        on_chunk,
+        model_id,
+        scores_path,
+        first_row_id,
+    )
+
+
+def write_multi_predictions_csv(
+    registry: ModelRegistry,
+    model_ids: list[str],
+    chunks: Iterable[list[str]],
+    output_path: Path,
+    threshold: float | None = None,
+    preview_limit: int = 20,
+    on_chunk: Callable[[BatchFileSummary], None] | None = None,
+    scores_path: Path | None = None,
+    first_row_id: int = 1,
+) -> BatchFileSummary:
+    """Như `write_predictions_csv` nhưng chấm mỗi khối bằng nhiều model trong 1 lượt.
+
+    Mỗi model 1 cặp cột `label_<model_id>`, `score_<model_id>`; cột `disagree` = 1
+    khi các model cho nhãn khác nhau (đếm trong `summary.disagreement_rows`).
+    """
+    model_ids = list(dict.fromkeys(model_ids))
+    summary = BatchFileSummary()
+
+    def score(messages: list[str]) -> MultiModelPrediction:
+        batch = registry.predict_batch_multi(model_ids, messages, threshold)
+        summary.disagreement_rows += int(batch.disagreement.sum())
+        return batch
+
+    return _write_csv(
+        output_path,
+        _multi_columns(registry, model_ids),
+        chunks,
+        score,
+        _multi_csv_rows,
+        summary,
+        preview_limit,
+        on_chunk,
+        scores_path=scores_path,
+        first_row_id=first_row_id,
+    )
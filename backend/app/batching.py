@@ -0,0 +1,154 @@
+"""Gom các request dự đoán đơn lẻ chạy đồng thời thành 1 batch cho model."""
+
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable
+
+# Mốc histogram kích thước batch (<= 1, 2, 4, ...).
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class MicroBatcher:
+    """Dispatcher cho 1 model: chờ tối đa `max_wait_ms` hoặc đủ `max_batch_size`.
+
+    Request đầu tiên mở cửa sổ gom; các request đến trong cửa sổ được chấm
+    chung 1 lần `score_fn(texts)` rồi trả kết quả về đúng Future của từng người
+    gọi. Thread worker khởi động lười và tự tạo lại sau khi fork hoặc khi đã chết.
+    Người gọi chờ tối đa `result_timeout_s` giây (`wait`).
+    """
+
+    def __init__(
+        self,
+        score_fn: Callable[[list[str]], list[Any]],
+        max_wait_ms: float = 5.0,
+        max_batch_size: int = 32,
+        name: str = "micro-batch",
+        result_timeout_s: float = 30.0,
+    ):
+        if max_batch_size <= 0:
+            raise ValueError("`max_batch_size` phải lớn hơn 0.")
+        if result_timeout_s <= 0:
+            raise ValueError("`result_timeout_s` phải lớn hơn 0.")
+        self.score_fn = score_fn
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self.max_batch_size = max_batch_size
+        self.name = name
+        self.result_timeout = result_timeout_s
+        self._queue: queue.SimpleQueue[tuple[str, Future, float]] = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._worker: threading.Thread | None = None
+        self._worker_pid: int | None = None
+
+        self.batches = 0
+        self.items = 0
+        self.max_seen_batch = 0
+        self.total_wait_seconds = 0.0
+        self.size_histogram = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+        self.size_histogram_overflow = 0
+
+    def _worker_ready(self, pid: int) -> bool:
+        return self._worker is not None and self._worker_pid == pid and self._worker.is_alive()
+
+    def _ensure_worker(self) -> None:
+        pid = os.getpid()
+        if self._worker_ready(pid):
+            return
+        with self._lock:
+            if self._worker_ready(pid):
+                return
+            if self._worker_pid != pid:
+                # Sau fork: hàng đợi của process cha không còn thread phục vụ.
+                self._queue = queue.SimpleQueue()
+            self._worker = threading.Thread(target=self._loop, name=self.name, daemon=True)
+            self._worker_pid = pid
+            self._worker.start()
+
+    def submit(self, text: str) -> Future:
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def wait(self, future: Future) -> Any:
+        """Kết quả của `future` từ `submit`; quá `result_timeout` giây => TimeoutError."""
+        try:
+            return future.result(timeout=self.result_timeout)
+        except TimeoutError as exc:
+            future.cancel()  # chưa vào batch thì worker sẽ bỏ qua
+            raise TimeoutError(
+                f"{self.name}: quá {self.result_timeout:g}s chờ kết quả micro-batch."
+            ) from exc
+
+    def _collect(self) -> list[tuple[str, Future, float]]:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _record(self, batch: list[tuple[str, Future, float]], started: float) -> None:
+        size = len(batch)
+        with self._lock:
+            self.batches += 1
+            self.items += size
+            self.max_seen_batch = max(self.max_seen_batch, size)
+            self.total_wait_seconds += sum(started - enqueued for _, _, enqueued in batch)
+            for bucket in BATCH_SIZE_BUCKETS:
+                if size <= bucket:
+                    self.size_histogram[bucket] += 1
+                    break
+            else:
+                self.size_histogram_overflow += 1
+
+    def _loop(self) -> None:
+        while True:
+            batch: list[tuple[str, Future, float]] = []
+            try:
+                # Future đã bị huỷ (người gọi hết thời gian chờ) thì bỏ khỏi batch.
+                batch = [item for item in self._collect() if item[1].set_running_or_notify_cancel()]
+                if not batch:
+                    continue
+                started = time.perf_counter()
+                self._record(batch, started)
+                results = self.score_fn([text for text, _, _ in batch])
+                if len(results) != len(batch):
+                    raise ValueError(
+                        f"{self.name}: score_fn trả {len(results)} kết quả cho {len(batch)} tin."
+                    )
+                for (_, future, _), result in zip(batch, results, strict=True):
+                    future.set_result(result)
+            except Exception as exc:  # lỗi trả về cho từng người gọi, thread vẫn chạy tiếp
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_wait_ms": self.max_wait * 1000,
+                "max_batch_size": self.max_batch_size,
+                "batches": self.batches,
+                "items": self.items,
+                "avg_batch_size": (self.items / self.batches) if self.batches else 0.0,
+                "max_seen_batch_size": self.max_seen_batch,
+                "avg_queue_wait_ms": (
+                    self.total_wait_seconds * 1000 / self.items if self.items else 0.0
+                ),
+                "batch_size_histogram": {
+                    **{f"le_{bucket}": count for bucket, count in self.size_histogram.items()},
+                    f"gt_{BATCH_SIZE_BUCKETS[-1]}": self.size_histogram_overflow,
+                },
+            }
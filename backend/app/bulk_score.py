@@ -0,0 +1,276 @@
+"""Chấm điểm offline khối lượng lớn: pool process, ghi theo shard, chạy tiếp từ manifest.
+
+Process cha đọc luồng từng file đầu vào (`iter_message_chunks`), mỗi khối
+`shard_rows` tin là 1 shard gửi cho pool. Mỗi process con nạp registry đúng 1 lần
+(initializer) rồi ghi shard ra file tạm và `os.replace` khi xong. Shard hoàn tất
+được ghi vào `manifest.json` trong thư mục output; chạy lại cùng cấu hình sẽ bỏ
+qua các shard đã có (vẫn phải đọc lại file để đếm dòng nhưng không chấm điểm).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable
+
+from .batch_writer import write_multi_predictions_csv, write_predictions_csv
+from .file_parser import STREAM_CHUNK_ROWS, iter_message_chunks
+from .model_registry import ModelRegistry
+from .serving import limit_threads
+
+MANIFEST_NAME = "manifest.json"
+DEFAULT_SHARD_ROWS = 200_000
+
+_worker_registry: ModelRegistry | None = None
+_worker_model_ids: list[str] = []
+
+
+@dataclass(slots=True)
+class WorkerStats:
+    shards: int = 0
+    rows: int = 0
+    busy_seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.busy_seconds if self.busy_seconds else 0.0
+
+
+@dataclass(slots=True)
+class BulkScoreReport:
+    output_dir: Path
+    total_rows: int = 0
+    scored_rows: int = 0
+    shards_written: int = 0
+    shards_skipped: int = 0
+    wall_seconds: float = 0.0
+    workers: dict[int, WorkerStats] = field(default_factory=dict)
+
+    @property
+    def rows_per_second(self) -> float:
+        """Tốc độ tổng của lần chạy này (chỉ tính dòng thật sự được chấm)."""
+        return self.scored_rows / self.wall_seconds if self.wall_seconds else 0.0
+
+
+def _init_worker(registry_path: str, model_ids: list[str], threads: int) -> None:
+    global _worker_registry, _worker_model_ids
+    limit_threads(threads)
+    registry = ModelRegistry(Path(registry_path), model_ids=model_ids)
+    for model_id in model_ids:
+        registry.get_model(model_id)
+    _worker_registry = registry
+    _worker_model_ids = model_ids
+
+
+def _score_shard(
+    texts: list[str],
+    output_path: str,
+    first_row_id: int,
+    threshold: float | None,
+) -> dict[str, Any]:
+    """Chạy trong process con: chấm 1 shard theo khối `STREAM_CHUNK_ROWS`, ghi nguyên tử."""
+    if _worker_registry is None:
+        raise RuntimeError("Worker chưa nạp registry.")
+    started = time.perf_counter()
+    final_path = Path(output_path)
+    # Giữ đuôi cuối (.gz) để batch_writer ghi nén.
+    temp_path = final_path.with_name(
+        f"{final_path.name}.{uuid.uuid4().hex}.tmp{final_path.suffix}"
+    )
+    chunks = (
+        texts[start : start + STREAM_CHUNK_ROWS]
+        for start in range(0, len(texts), STREAM_CHUNK_ROWS)
+    )
+    options = {"threshold": threshold, "preview_limit": 0, "first_row_id": first_row_id}
+    if len(_worker_model_ids) == 1:
+        summary = write_predictions_csv(
+            _worker_registry, _worker_model_ids[0], chunks, temp_path, **options
+        )
+    else:
+        summary = write_multi_predictions_csv(
+            _worker_registry, _worker_model_ids, chunks, temp_path, **options
+        )
+    os.replace(temp_path, final_path)
+    return {
+        "rows": summary.total_rows,
+        "seconds": time.perf_counter() - started,
+        "worker": os.getpid(),
+    }
+
+
+def _input_fingerprint(path: Path) -> dict[str, Any]:
+    stat = path.stat()
+    return {"path": str(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _load_manifest(path: Path, settings: dict[str, Any]) -> dict[str, Any]:
+    if not path.exists():
+        return {"settings": settings, "shards": {}, "inputs": {}}
+    manifest = json.loads(path.read_text(encoding="utf-8"))
+    if manifest.get("settings") != settings:
+        raise ValueError(
+            f"{path} thuộc lần chạy với cấu hình/file/model khác. "
+            "Dùng thư mục output khác hoặc xoá thư mục này để chạy lại từ đầu."
+        )
+    return manifest
+
+
+def _save_manifest(path: Path, manifest: dict[str, Any]) -> None:
+    temp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+    temp_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(temp_path, path)
+
+
+def _remove_stale_temp_files(output_dir: Path, stems: list[str], suffix: str) -> None:
+    """Xoá shard/manifest dở dang của lần chạy bị ngắt; chỉ xoá tên tạm do chính module này đặt.
+
+    Tên tạm: `<stem>.part-00000<suffix>.<uuid hex>.tmp<đuôi cuối>` và
+    `manifest.json.<uuid hex>.tmp` (xem `_score_shard`, `_save_manifest`).
+    """
+    shard_names = "|".join(re.escape(stem) for stem in stems)
+    pattern = re.compile(
+        rf"(?:(?:{shard_names})\.part-\d{{5,}}{re.escape(suffix)}"
+        rf"\.[0-9a-f]{{32}}\.tmp{re.escape(suffix[suffix.rfind('.'):])}"
+        rf"|{re.escape(MANIFEST_NAME)}\.[0-9a-f]{{32}}\.tmp)"
+    )
+    for temp_path in output_dir.iterdir():
+        if pattern.fullmatch(temp_path.name) and temp_path.is_file():
+            temp_path.unlink(missing_ok=True)
+
+
+def score_files(
+    inputs: list[Path],
+    output_dir: Path,
+    registry_path: Path,
+    model_ids: list[str],
+    threshold: float | None = None,
+    text_column: str | None = None,
+    shard_rows: int = DEFAULT_SHARD_ROWS,
+    workers: int | None = None,
+    threads_per_worker: int | None = None,
+    compress: bool = False,
+    log: Callable[[str], None] = print,
+) -> BulkScoreReport:
+    """Chấm mọi file `inputs`, ghi `<tên file>.part-00000.csv[.gz]`... vào `output_dir`.
+
+    `row_id` đánh số liên tục trong từng file gốc như `/predict-file`. Tối đa
+    `2 * workers` shard chờ trong pool nên bộ nhớ process cha không phụ thuộc cỡ file.
+    """
+    if shard_rows <= 0:
+        raise ValueError("`shard_rows` phải lớn hơn 0.")
+    model_ids = list(dict.fromkeys(model_ids))
+    if not model_ids:
+        raise ValueError("Cần ít nhất 1 model_id.")
+    inputs = [path.resolve() for path in inputs]
+    stems = [path.stem for path in inputs]
+    if len(set(stems)) != len(stems):
+        raise ValueError("Các file đầu vào phải có tên (bỏ đuôi) khác nhau để đặt tên shard.")
+    for path in inputs:
+        if not path.is_file():
+            raise FileNotFoundError(f"Không thấy file đầu vào: {path}")
+
+    workers = max(1, workers or os.cpu_count() or 1)
+    threads = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+    # Registry ở process cha chỉ đọc cấu hình (không nạp model) để kiểm tra model_id
+    # và lấy phiên bản artifact cho manifest.
+    registry = ModelRegistry(registry_path, model_ids=model_ids)
+    settings = {
+        "inputs": [_input_fingerprint(path) for path in inputs],
+        "model_versions": {model_id: registry.model_version(model_id) for model_id in model_ids},
+        "threshold": threshold,
+        "text_column": text_column,
+        "shard_rows": shard_rows,
+        "compress": compress,
+    }
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = output_dir / MANIFEST_NAME
+    manifest = _load_manifest(manifest_path, settings)
+    suffix = ".csv.gz" if compress else ".csv"
+    _remove_stale_temp_files(output_dir, stems, suffix)
+    report = BulkScoreReport(output_dir=output_dir)
+    started = time.perf_counter()
+
+    def finish(future: Future, shard_name: str, shard: dict[str, Any]) -> None:
+        result = future.result()
+        manifest["shards"][shard_name] = {**shard, **result}
+        _save_manifest(manifest_path, manifest)
+        stats = report.workers.setdefault(result["worker"], WorkerStats())
+        stats.shards += 1
+        stats.rows += result["rows"]
+        stats.busy_seconds += result["seconds"]
+        report.scored_rows += result["rows"]
+        report.shards_written += 1
+        log(
+            f"{shard_name}: {result['rows']:,} dòng, "
+            f"{result['rows'] / max(result['seconds'], 1e-9):,.0f} dòng/s (pid {result['worker']})"
+        )
+
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(str(registry_path.resolve()), model_ids, threads),
+    )
+    pending: dict[Future, tuple[str, dict[str, Any]]] = {}
+    try:
+        for path in inputs:
+            done_input = manifest["inputs"].get(path.name)
+            if done_input is not None and all(
+                name in manifest["shards"] and (output_dir / name).exists()
+                for name in done_input["shards"]
+            ):
+                report.total_rows += done_input["rows"]
+                report.shards_skipped += len(done_input["shards"])
+                log(f"{path.name}: đã xong ở lần chạy trước, bỏ qua.")
+                continue
+
+            shard_names = []
+            next_row_id = 1
+            with path.open("rb") as stream:
+                # CLI offline: không giới hạn 10MB của upload cho .xlsx.
+                chunks, _ = iter_message_chunks(
+                    path.name, stream, text_column, shard_rows, max_xlsx_bytes=None
+                )
+                for index, texts in enumerate(chunks):
+                    shard_name = f"{path.stem}.part-{index:05d}{suffix}"
+                    shard = {"input": path.name, "first_row_id": next_row_id}
+                    shard_names.append(shard_name)
+                    next_row_id += len(texts)
+                    report.total_rows += len(texts)
+                    if shard_name in manifest["shards"] and (output_dir / shard_name).exists():
+                        report.shards_skipped += 1
+                        continue
+                    while len(pending) >= 2 * workers:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            finish(future, *pending.pop(future))
+                    future = executor.submit(
+                        _score_shard,
+                        texts,
+                        str(output_dir / shard_name),
+                        shard["first_row_id"],
+                        threshold,
+                    )
+                    pending[future] = (shard_name, shard)
+            manifest["inputs"][path.name] = {"rows": next_row_id - 1, "shards": shard_names}
+
+        for future in list(pending):
+            finish(future, *pending.pop(future))
+        _save_manifest(manifest_path, manifest)
+    except BaseException:
+        # Lỗi/Ctrl+C: bỏ shard chưa chạy, chờ shard đang chạy rồi ghi các shard xong vào
+        # manifest để lần sau không chấm lại.
+        executor.shutdown(wait=True, cancel_futures=True)
+        for future, (shard_name, shard) in pending.items():
+            if not future.cancelled() and future.exception() is None:
+                finish(future, shard_name, shard)
+        raise
+    executor.shutdown()
+
+    report.wall_seconds = time.perf_counter() - started
+    return report
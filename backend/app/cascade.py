@@ -0,0 +1,59 @@
+"""Cascade 2 tầng: model rẻ chấm trước, chỉ tin không chắc chắn mới lên model đắt."""
+
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from typing import Any
+
+DEFAULT_UNCERTAINTY_BAND = (0.1, 0.9)
+
+
+@dataclass(slots=True, frozen=True)
+class CascadeScore:
+    """Điểm spam cuối cùng kèm model_id của tầng đã quyết định."""
+
+    score: float
+    stage: str
+
+
+class CascadeModel:
+    """Cấu hình cascade đã kiểm tra + bộ đếm tỉ lệ chuyển tầng.
+
+    Chỉ giữ model_id của 2 tầng (không giữ object model) để `reload_model`
+    của từng tầng có hiệu lực ngay với cascade.
+    """
+
+    def __init__(self, model_id: str, options: dict[str, Any]):
+        stages = list(options.get("stages") or [])
+        if len(stages) != 2:
+            raise ValueError(f"Cascade '{model_id}' cần đúng 2 tầng: [model nhanh, model chậm].")
+        band = options.get("band", DEFAULT_UNCERTAINTY_BAND)
+        lower, upper = float(band[0]), float(band[1])
+        if not 0.0 <= lower <= upper <= 1.0:
+            raise ValueError(f"Cascade '{model_id}': `band` phải thoả 0 <= thấp <= cao <= 1.")
+        self.model_id = model_id
+        self.fast_model_id, self.slow_model_id = str(stages[0]), str(stages[1])
+        self.lower = lower
+        self.upper = upper
+        self._lock = threading.Lock()
+        self.messages = 0
+        self.escalated = 0
+
+    def is_uncertain(self, score: float) -> bool:
+        return self.lower <= score <= self.upper
+
+    def record(self, messages: int, escalated: int) -> None:
+        with self._lock:
+            self.messages += messages
+            self.escalated += escalated
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "stages": [self.fast_model_id, self.slow_model_id],
+                "band": [self.lower, self.upper],
+                "messages": self.messages,
+                "escalated": self.escalated,
+                "escalation_rate": self.escalated / self.messages if self.messages else 0.0,
+            }
@@ -0,0 +1,226 @@
+"""CountVectorizer với từ điển dạng mảng numpy thay cho dict `vocabulary_`.
+
+`vocabulary_` của sklearn là dict Python: mỗi token tốn 1 object str + 1 int + 1
+slot hash (~150-200 byte), unpickle phải dựng lại toàn bộ và mỗi worker giữ 1 bản
+riêng. Bản rút gọn lưu 4 mảng, sắp theo hash FNV-1a 64 bit của token:
+
+- `vocab_hashes_` (uint64): hash đã sắp xếp, tra bằng `np.searchsorted`;
+- `vocab_indices_` (int32): chỉ số feature tương ứng;
+- `vocab_offsets_` (int32) + `vocab_blob_` (uint8): bytes UTF-8 của token, dùng để
+  so khớp chính xác (token ngoài từ điển trùng hash không bị nhận nhầm).
+
+Mảng chỉ đọc, pickle/`joblib.load(mmap_mode="r")` map thẳng từ file nên các
+worker dùng chung page cache. `transform` cho ma trận giống hệt `CountVectorizer`.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Iterable
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.exceptions import NotFittedError
+from sklearn.feature_extraction.text import CountVectorizer
+
+_FNV_OFFSET = np.uint64(0xCBF29CE484222325)
+_FNV_PRIME = np.uint64(0x100000001B3)
+_ARRAY_ATTRIBUTES = ("vocab_hashes_", "vocab_indices_", "vocab_offsets_", "vocab_blob_")
+# Thuộc tính fit chỉ để tra cứu/giải thích, không dùng khi transform.
+_DROPPED_ATTRIBUTES = ("vocabulary_", "stop_words_")
+
+
+def _index_dtype(max_value: int) -> type:
+    return np.int64 if max_value > np.iinfo(np.int32).max else np.int32
+
+
+def _encode(tokens: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    """(blob uint8, offsets int64 dài len(tokens) + 1) của các token UTF-8 nối liền."""
+    encoded = [token.encode("utf-8") for token in tokens]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(item) for item in encoded], out=offsets[1:])
+    blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return blob, offsets
+
+
+def _by_length(offsets: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """(thứ tự dài -> ngắn, số chuỗi dài hơn j cho từng vị trí byte j)."""
+    lengths = np.diff(offsets)
+    order = np.argsort(-lengths, kind="stable")
+    sorted_lengths = lengths[order]
+    width = int(sorted_lengths[0]) if len(sorted_lengths) else 0
+    active = np.searchsorted(-sorted_lengths, -np.arange(width), side="left")
+    return order, active
+
+
+def fnv1a_hashes(blob: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """FNV-1a 64 bit của từng chuỗi `blob[offsets[i]:offsets[i + 1]]`, tính theo cột byte.
+
+    Chuỗi sắp theo độ dài giảm dần nên ở vị trí byte j chỉ cần xử lý phần đầu mảng.
+    """
+    order, active = _by_length(offsets)
+    starts = offsets[:-1][order]
+    hashes = np.full(len(order), _FNV_OFFSET, dtype=np.uint64)
+    for position, count in enumerate(active):
+        head = hashes[:count]
+        head ^= blob[starts[:count] + position]
+        head *= _FNV_PRIME
+    result = np.empty_like(hashes)
+    result[order] = hashes
+    return result
+
+
+class CompactCountVectorizer(CountVectorizer):
+    """`CountVectorizer` tra từ điển bằng mảng hash thay cho dict (xem docstring module).
+
+    Dùng `from_vectorizer` để chuyển 1 vectorizer đã fit; `fit` trực tiếp cũng được
+    (sklearn gán `vocabulary_` xong sẽ được nén lại). `vocabulary_` vẫn đọc được
+    nhưng là dict dựng mới mỗi lần, chỉ nên dùng khi cần tương thích.
+    """
+
+    @classmethod
+    def from_vectorizer(cls, vectorizer: CountVectorizer) -> "CompactCountVectorizer":
+        if type(vectorizer) is not CountVectorizer:
+            # Lớp con (vd: TfidfVectorizer) còn trạng thái khác ngoài từ điển.
+            raise ValueError(
+                f"Chỉ rút gọn được CountVectorizer, không phải {type(vectorizer).__name__}."
+            )
+        if not hasattr(vectorizer, "vocabulary_"):
+            raise NotFittedError("Vectorizer chưa fit, không có `vocabulary_` để rút gọn.")
+        params = vectorizer.get_params()
+        params["vocabulary"] = None
+        compact = cls(**params)
+        for name, value in vars(vectorizer).items():
+            if name.endswith("_") and name not in _DROPPED_ATTRIBUTES:
+                setattr(compact, name, value)
+        compact.vocabulary_ = vectorizer.vocabulary_
+        return compact
+
+    @property
+    def vocabulary_(self) -> dict[str, int]:
+        if not hasattr(self, "vocab_hashes_"):
+            raise AttributeError("vocabulary_")
+        tokens = self._tokens()
+        return {token: int(index) for token, index in zip(tokens, self.vocab_indices_)}
+
+    @vocabulary_.setter
+    def vocabulary_(self, vocabulary: dict[str, int]) -> None:
+        tokens = list(vocabulary)
+        blob, offsets = _encode(tokens)
+        hashes = fnv1a_hashes(blob, offsets)
+        order = np.argsort(hashes, kind="stable")
+        hashes = hashes[order]
+        if len(hashes) > 1 and np.any(hashes[1:] == hashes[:-1]):
+            raise ValueError("Hai token của từ điển trùng hash 64 bit, không rút gọn được.")
+        sorted_tokens = [tokens[index] for index in order]
+        sorted_blob, sorted_offsets = _encode(sorted_tokens)
+        indices = np.fromiter(
+            (vocabulary[token] for token in sorted_tokens), dtype=np.int64, count=len(tokens)
+        )
+        self.vocab_hashes_ = hashes
+        self.vocab_indices_ = indices.astype(_index_dtype(len(tokens)))
+        self.vocab_offsets_ = sorted_offsets.astype(_index_dtype(sorted_offsets[-1]))
+        # `np.frombuffer` trên bytes đã chỉ đọc; copy để pickle không giữ tham chiếu bytes.
+        self.vocab_blob_ = sorted_blob.copy()
+        self._freeze()
+
+    def _freeze(self) -> None:
+        for name in _ARRAY_ATTRIBUTES:
+            array = getattr(self, name, None)
+            if isinstance(array, np.ndarray) and array.flags.writeable:
+                array.flags.writeable = False
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        super().__setstate__(state)
+        self._freeze()
+
+    @property
+    def n_features(self) -> int:
+        return len(self.vocab_hashes_)
+
+    def _tokens(self) -> list[str]:
+        blob = self.vocab_blob_.tobytes()
+        offsets = self.vocab_offsets_.tolist()
+        return [
+            blob[start:end].decode("utf-8") for start, end in zip(offsets[:-1], offsets[1:])
+        ]
+
+    def _check_vocabulary(self) -> None:
+        if not hasattr(self, "vocab_hashes_"):
+            raise NotFittedError("Vocabulary not fitted or provided")
+        if self.n_features == 0:
+            raise ValueError("Vocabulary is empty")
+
+    def lookup(self, tokens: list[str]) -> np.ndarray:
+        """Chỉ số feature của từng token, -1 nếu ngoài từ điển."""
+        blob, offsets = _encode(tokens)
+        hashes = fnv1a_hashes(blob, offsets)
+        result = np.full(len(tokens), -1, dtype=np.int64)
+        if not len(tokens):
+            return result
+        positions = np.searchsorted(self.vocab_hashes_, hashes)
+        np.minimum(positions, self.n_features - 1, out=positions)
+        candidates = np.flatnonzero(self.vocab_hashes_[positions] == hashes)
+        positions = positions[candidates]
+
+        # Xác nhận đúng token (trùng hash giữa token lạ và token trong từ điển).
+        starts = offsets[candidates]
+        lengths = offsets[candidates + 1] - starts
+        vocab_starts = self.vocab_offsets_[positions]
+        same = lengths == self.vocab_offsets_[positions + 1] - vocab_starts
+        for position in range(int(lengths.max()) if len(lengths) else 0):
+            check = same & (lengths > position)
+            same[check] = (
+                blob[starts[check] + position] == self.vocab_blob_[vocab_starts[check] + position]
+            )
+        result[candidates[same]] = self.vocab_indices_[positions[same]]
+        return result
+
+    def transform(self, raw_documents: Iterable[str]):
+        """Như `CountVectorizer.transform`: CSR cùng dtype, chỉ số đã sắp, không trùng."""
+        if isinstance(raw_documents, str):
+            raise ValueError(
+                "Iterable over raw text documents expected, string object received."
+            )
+        self._check_vocabulary()
+        analyze = self.build_analyzer()
+
+        # Token -> id cục bộ của lượt này; chỉ tra mảng hash cho token khác nhau.
+        local_ids: dict[str, int] = {}
+        token_ids: list[int] = []
+        indptr = [0]
+        for doc in raw_documents:
+            token_ids.extend(local_ids.setdefault(token, len(local_ids)) for token in analyze(doc))
+            indptr.append(len(token_ids))
+
+        n_docs = len(indptr) - 1
+        features = self.lookup(list(local_ids))[np.asarray(token_ids, dtype=np.int64)]
+        known = features >= 0
+        rows = np.repeat(np.arange(n_docs), np.diff(indptr))[known]
+        row_pointers = np.zeros(n_docs + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n_docs), out=row_pointers[1:])
+
+        indices_dtype = _index_dtype(row_pointers[-1])
+        matrix = sp.csr_matrix(
+            (
+                np.ones(int(row_pointers[-1]), dtype=self.dtype),
+                features[known].astype(indices_dtype),
+                row_pointers.astype(indices_dtype),
+            ),
+            shape=(n_docs, self.n_features),
+            dtype=self.dtype,
+        )
+        matrix.sum_duplicates()
+        if self.binary:
+            matrix.data.fill(1)
+        return matrix
+
+
+def matrices_identical(expected, actual) -> bool:
+    """2 ma trận CSR giống hệt: cùng shape, dtype, thứ tự chỉ số và giá trị."""
+    return (
+        expected.shape == actual.shape
+        and expected.dtype == actual.dtype
+        and np.array_equal(expected.indptr, actual.indptr)
+        and np.array_equal(expected.indices, actual.indices)
+        and np.array_equal(expected.data, actual.data)
+    )
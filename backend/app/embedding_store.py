@@ -0,0 +1,330 @@
+"""Kho embedding trên đĩa (memmap float32 + index) cho EmbeddingLogisticPipeline."""
+
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+KEY_BYTES = 16
+META_FILE = "meta.json"
+# Kho tạo trước khi tách file theo thế hệ: meta không có tên file.
+LEGACY_VECTORS_FILE = "vectors.f32"
+LEGACY_KEYS_FILE = "keys.bin"
+
+
+def _generation_files(generation: int) -> tuple[str, str]:
+    return f"vectors.{generation}.f32", f"keys.{generation}.bin"
+
+
+class EmbeddingStore:
+    """Lưu embedding theo hash(văn bản đã chuẩn hoá + định danh embedder).
+
+    Dữ liệu gồm 1 ma trận float32 `vectors.<thế hệ>.f32` và mảng khoá
+    `keys.<thế hệ>.bin` (cùng cấp phát sẵn `max_rows` dòng, file thưa), cộng
+    `meta.json` ghi thế hệ, tên file và số dòng hợp lệ. Chỉ 1 process được mở ở chế
+    độ ghi; các worker khác mở `read_only=True` dùng chung page cache và tự nạp phần
+    index mới khi `meta.json` thay đổi. Khi đầy, kho nén lại, giữ `compact_ratio` số
+    dòng được dùng gần nhất vào cặp file của thế hệ mới; chỉ việc ghi `meta.json`
+    mới chuyển reader sang thế hệ đó. File đã có thể đang được map thì không bao giờ
+    bị ghi đè hay cắt ngắn; thế hệ trước đó được giữ lại, cũ hơn nữa thì xoá.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        embedder_id: str,
+        max_rows: int = 1_000_000,
+        read_only: bool = False,
+        compact_ratio: float = 0.5,
+    ):
+        if max_rows <= 0:
+            raise ValueError("`max_rows` phải lớn hơn 0.")
+        if not 0.0 < compact_ratio < 1.0:
+            raise ValueError("`compact_ratio` phải nằm trong (0, 1).")
+        digest = hashlib.blake2b(embedder_id.encode("utf-8"), digest_size=8).hexdigest()
+        self.directory = Path(directory) / digest
+        self.embedder_id = embedder_id
+        self.max_rows = max_rows
+        self.read_only = read_only
+        self.compact_ratio = compact_ratio
+
+        self.dim: int | None = None
+        self._rows = 0
+        self._generation = 0
+        self._files = _generation_files(0)
+        self._vectors: np.memmap | None = None
+        self._keys: np.memmap | None = None
+        self._index: dict[bytes, int] = {}
+        self._last_used = np.zeros(0, dtype=np.int64)
+        self._clock = 0
+        self._lock = threading.Lock()
+
+        if not read_only:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self._refresh()
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def make_key(self, normalized_text: str) -> bytes:
+        payload = f"{self.embedder_id}\0{normalized_text}".encode("utf-8")
+        return hashlib.blake2b(payload, digest_size=KEY_BYTES).digest()
+
+    # ----- đọc/ghi meta + memmap -----
+
+    @property
+    def _meta_path(self) -> Path:
+        return self.directory / META_FILE
+
+    def _read_meta(self) -> dict[str, Any] | None:
+        try:
+            return json.loads(self._meta_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self) -> None:
+        meta = {
+            "embedder_id": self.embedder_id,
+            "dim": self.dim,
+            "rows": self._rows,
+            "max_rows": self.max_rows,
+            "generation": self._generation,
+            "vectors_file": self._files[0],
+            "keys_file": self._files[1],
+        }
+        tmp_path = self._meta_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(meta), encoding="utf-8")
+        os.replace(tmp_path, self._meta_path)
+
+    def _open_arrays(self) -> None:
+        mode = "r" if self.read_only else "r+"
+        self._vectors = np.memmap(
+            self.directory / self._files[0],
+            dtype=np.float32,
+            mode=mode,
+            shape=(self.max_rows, self.dim),
+        )
+        self._keys = np.memmap(
+            self.directory / self._files[1],
+            dtype=np.uint8,
+            mode=mode,
+            shape=(self.max_rows, KEY_BYTES),
+        )
+
+    def _create_generation(self, generation: int) -> tuple[str, str]:
+        """Tạo cặp file rỗng (thưa) cho `generation`; meta chưa trỏ tới nên chưa ai map."""
+        files = _generation_files(generation)
+        for name, row_bytes in zip(files, (self.dim * 4, KEY_BYTES)):
+            with open(self.directory / name, "wb") as handle:
+                handle.truncate(self.max_rows * row_bytes)
+        return files
+
+    def _switch_generation(self, generation: int, files: tuple[str, str], rows: int) -> None:
+        """Ghi meta trỏ sang thế hệ mới (bước duy nhất reader nhìn thấy) rồi dọn file cũ."""
+        self._generation = generation
+        self._files = files
+        self._rows = rows
+        self._open_arrays()
+        self._index = {}
+        self._index_rows(0, rows)
+        self._write_meta()
+        self._remove_old_generations()
+
+    def _remove_old_generations(self) -> None:
+        """Xoá file cũ hơn thế hệ trước (reader chậm nhất vẫn có thể đang mở thế hệ trước).
+
+        Trên Windows file đang được map không xoá được: bỏ qua, lần dọn sau thử lại.
+        """
+        previous = _generation_files(self._generation - 1)
+        keep = {*self._files, *previous}
+        stale = [
+            path
+            for pattern in ("vectors.*.f32", "keys.*.bin")
+            for path in self.directory.glob(pattern)
+            if path.name not in keep
+        ]
+        if (self.directory / previous[0]).exists():
+            # Thế hệ trước đã dùng tên theo thế hệ => file kiểu cũ còn cũ hơn nữa.
+            stale += [self.directory / LEGACY_VECTORS_FILE, self.directory / LEGACY_KEYS_FILE]
+        for path in stale:
+            with contextlib.suppress(OSError):
+                path.unlink(missing_ok=True)
+
+    def _allocate(self, dim: int) -> None:
+        """Kho mới (chưa có hoặc khác cấu hình): bắt đầu thế hệ mới, không đụng file cũ."""
+        meta = self._read_meta()
+        generation = int(meta.get("generation", 0)) + 1 if meta else 0
+        self.dim = dim
+        self._last_used = np.zeros(self.max_rows, dtype=np.int64)
+        self._switch_generation(generation, self._create_generation(generation), 0)
+
+    def _index_rows(self, start: int, stop: int) -> None:
+        for row in range(start, stop):
+            self._index[self._keys[row].tobytes()] = row
+
+    def _refresh(self) -> None:
+        """Đồng bộ với meta trên đĩa (chỉ cần cho reader hoặc lần mở đầu)."""
+        meta = self._read_meta()
+        if meta is None:
+            return
+        if self._vectors is not None and (meta["rows"], meta["generation"]) == (
+            self._rows,
+            self._generation,
+        ):
+            return
+        if meta.get("embedder_id") != self.embedder_id or meta.get("max_rows") != self.max_rows:
+            if self.read_only:
+                raise ValueError(f"Kho embedding không khớp cấu hình: {self.directory}")
+            self._allocate(int(meta["dim"]))
+            return
+
+        # Số dòng giảm trong cùng thế hệ: kho đã bị ghi lại => dựng lại index từ đầu.
+        reopen = (
+            self._vectors is None
+            or meta["generation"] != self._generation
+            or meta["rows"] < self._rows
+        )
+        self.dim = int(meta["dim"])
+        if reopen:
+            self._files = (
+                meta.get("vectors_file", LEGACY_VECTORS_FILE),
+                meta.get("keys_file", LEGACY_KEYS_FILE),
+            )
+            self._open_arrays()
+            self._index = {}
+            self._last_used = np.zeros(self.max_rows, dtype=np.int64)
+            self._index_rows(0, int(meta["rows"]))
+        else:
+            self._index_rows(self._rows, int(meta["rows"]))
+        self._rows = int(meta["rows"])
+        self._generation = int(meta["generation"])
+
+    # ----- API -----
+
+    def get_many(self, keys: list[bytes]) -> tuple[np.ndarray, np.ndarray]:
+        """Trả về (ma trận vector, mask hit). Dòng miss là vector 0."""
+        with self._lock:
+            if self.read_only:
+                self._refresh()
+            hit_mask = np.zeros(len(keys), dtype=bool)
+            if self._vectors is None or not keys:
+                return np.zeros((len(keys), self.dim or 0), dtype=np.float32), hit_mask
+
+            rows = np.full(len(keys), -1, dtype=np.int64)
+            for pos, key in enumerate(keys):
+                row = self._index.get(key)
+                if row is not None:
+                    rows[pos] = row
+            hit_mask = rows >= 0
+            output = np.zeros((len(keys), self.dim), dtype=np.float32)
+            if hit_mask.any():
+                hit_rows = rows[hit_mask]
+                output[hit_mask] = self._vectors[hit_rows]
+                self._clock += 1
+                self._last_used[hit_rows] = self._clock
+            return output, hit_mask
+
+    def add_many(self, keys: list[bytes], vectors: np.ndarray) -> None:
+        if self.read_only or not keys:
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            if self._vectors is None:
+                self._allocate(int(vectors.shape[1]))
+            elif vectors.shape[1] != self.dim:
+                raise ValueError("Số chiều embedding không khớp với kho đã lưu.")
+
+            fresh: dict[bytes, int] = {}
+            for pos, key in enumerate(keys):
+                if key not in self._index and key not in fresh:
+                    fresh[key] = pos
+            if not fresh:
+                return
+
+            # Không vượt quá max_rows: nếu đầy thì nén trước, rồi chỉ giữ phần mới nhất.
+            if self._rows + len(fresh) > self.max_rows:
+                self._compact_locked()
+            items = list(fresh.items())[-(self.max_rows - self._rows) :]
+            start = self._rows
+            stop = start + len(items)
+            positions = [pos for _, pos in items]
+            self._vectors[start:stop] = vectors[positions]
+            self._keys[start:stop] = np.frombuffer(
+                b"".join(key for key, _ in items), dtype=np.uint8
+            ).reshape(-1, KEY_BYTES)
+            self._vectors.flush()
+            self._keys.flush()
+            self._clock += 1
+            self._last_used[start:stop] = self._clock
+            for row, (key, _) in enumerate(items, start=start):
+                self._index[key] = row
+            self._rows = stop
+            self._write_meta()
+
+    def resync(self) -> None:
+        """Bỏ trạng thái trong bộ nhớ, mở lại memmap và dựng lại index theo `meta.json`.
+
+        Dùng khi process ghi được fork lại từ process cha: bản sao index/số dòng của
+        cha đã cũ so với những gì process ghi trước đó để lại trên đĩa.
+        """
+        with self._lock:
+            self._vectors = None
+            self._keys = None
+            self._rows = 0
+            self._index = {}
+            self._last_used = np.zeros(0, dtype=np.int64)
+            self._refresh()
+
+    def make_read_only(self) -> None:
+        """Chuyển sang chế độ chỉ đọc (vd. worker fork từ process ghi)."""
+        with self._lock:
+            if self.read_only:
+                return
+            self.read_only = True
+            if self._vectors is not None:
+                self._open_arrays()
+
+    def compact(self) -> None:
+        if self.read_only:
+            raise ValueError("Kho embedding đang mở chế độ chỉ đọc.")
+        with self._lock:
+            if self._vectors is not None:
+                self._compact_locked()
+
+    def _compact_locked(self) -> None:
+        keep = int(self.max_rows * self.compact_ratio)
+        order = np.argsort(self._last_used[: self._rows], kind="stable")
+        kept_rows = np.sort(order[-keep:]) if keep else order[:0]
+
+        # Ghi vào file của thế hệ mới; reader đang map thế hệ hiện tại không bị ảnh hưởng.
+        generation = self._generation + 1
+        files = self._create_generation(generation)
+        for name, source in zip(files, (self._vectors, self._keys)):
+            target = np.memmap(
+                self.directory / name, dtype=source.dtype, mode="r+", shape=source.shape
+            )
+            target[: len(kept_rows)] = source[kept_rows]
+            target.flush()
+            del target
+
+        last_used = np.zeros(self.max_rows, dtype=np.int64)
+        last_used[: len(kept_rows)] = self._last_used[kept_rows]
+        self._last_used = last_used
+        self._switch_generation(generation, files, len(kept_rows))
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "path": str(self.directory),
+            "rows": self._rows,
+            "max_rows": self.max_rows,
+            "dim": self.dim,
+            "read_only": self.read_only,
+            "generation": self._generation,
+        }
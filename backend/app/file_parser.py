@@ -1,32 +1,54 @@
-"""Đọc file batch (.txt/.csv/.xlsx) thành danh sách tin nhắn."""
+"""Đọc file batch (.txt/.csv/.xlsx) thành danh sách tin nhắn.
+
+pandas/openpyxl chỉ được import khi thật sự đọc .csv/.xlsx để server khởi động nhanh.
+"""
 
 from __future__ import annotations
 
-from io import BytesIO
+import io
+import time
 from pathlib import Path
+from typing import TYPE_CHECKING, Any, BinaryIO, Iterator
+
+import numpy as np
 
-import pandas as pd
+from .metrics import timed, timed_iter
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 SUPPORTED_EXTENSIONS = {".txt", ".csv", ".xlsx"}
 MAX_FILE_SIZE_BYTES = 10 * 1024 * 1024
+MAX_STREAM_FILE_SIZE_BYTES = 8 * 1024 * 1024 * 1024
+STREAM_CHUNK_ROWS = 5000
 
 
-def validate_file(filename: str, content: bytes) -> str:
+def validate_extension(filename: str) -> str:
     if not filename:
         raise ValueError("Thiếu tên file upload.")
     extension = Path(filename).suffix.lower()
     if extension not in SUPPORTED_EXTENSIONS:
         raise ValueError("Chỉ hỗ trợ file .txt, .csv, .xlsx.")
+    return extension
+
+
+def validate_file(
+    filename: str,
+    content: bytes,
+    max_bytes: int | None = MAX_FILE_SIZE_BYTES,
+) -> str:
+    """`max_bytes=None`: không giới hạn kích thước (chấm điểm offline qua CLI)."""
+    extension = validate_extension(filename)
     if len(content) == 0:
         raise ValueError("File rỗng.")
-    if len(content) > MAX_FILE_SIZE_BYTES:
-        raise ValueError("File vượt quá 10MB.")
+    if max_bytes is not None and len(content) > max_bytes:
+        raise ValueError(f"File vượt quá {max_bytes // (1024 * 1024)}MB.")
     return extension
 
 
-def _pick_text_column(df: pd.DataFrame, requested: str | None) -> str:
-    cols = [str(col) for col in df.columns]
-    lower_map = {col.lower(): col for col in cols}
+def _resolve_column_from_header(columns: list[str], requested: str | None) -> str | None:
+    """Chọn cột văn bản chỉ từ tên cột; None nếu phải xét kiểu dữ liệu (cần đọc dữ liệu)."""
+    lower_map = {col.lower(): col for col in columns}
 
     if requested:
         key = requested.strip().lower()
@@ -36,11 +58,20 @@ def _pick_text_column(df: pd.DataFrame, requested: str | None) -> str:
 
     if "text" in lower_map:
         return lower_map["text"]
+    return None
+
+
+def _pick_text_column(df: pd.DataFrame, requested: str | None) -> str:
+    cols = [str(col) for col in df.columns]
+    selected = _resolve_column_from_header(cols, requested)
+    if selected is not None:
+        return selected
 
     string_like = [
         col
         for col in cols
-        if df[col].dtype == "object" or str(df[col].dtype).startswith("string")
+        # pandas >= 3 đọc chuỗi thành dtype "str" thay cho "object"/"string".
+        if df[col].dtype == "object" or str(df[col].dtype).startswith("str")
     ]
     if string_like:
         return string_like[0]
@@ -57,12 +88,109 @@ def _clean_series_to_list(series: pd.Series) -> list[str]:
     return values
 
 
+def _csv_header(source: BinaryIO) -> list[str]:
+    import pandas as pd
+
+    try:
+        return [str(col) for col in pd.read_csv(source, nrows=0).columns]
+    except pd.errors.EmptyDataError as exc:
+        raise ValueError("File không có dữ liệu.") from exc
+
+
+def _parse_csv(content: bytes, text_column: str | None) -> tuple[list[str], str]:
+    """Đọc header trước; xác định được cột theo tên thì chỉ parse đúng cột đó (`usecols`).
+
+    Cột văn bản luôn đọc với `dtype=str` (như `iter_message_chunks`) để pandas không
+    đổi tin toàn chữ số thành số ("0912000000" -> 912000000, "4.50" -> 4.5).
+    """
+    import pandas as pd
+
+    columns = _csv_header(io.BytesIO(content))
+    selected_column = _resolve_column_from_header(columns, text_column)
+    if selected_column is None:
+        # Suy kiểu cả bảng chỉ để chọn cột văn bản.
+        df = pd.read_csv(io.BytesIO(content))
+        if df.empty:
+            raise ValueError("File không có dữ liệu.")
+        selected_column = _pick_text_column(df, text_column)
+        position = [str(col) for col in df.columns].index(selected_column)
+    else:
+        position = columns.index(selected_column)
+
+    df = pd.read_csv(io.BytesIO(content), usecols=[position], dtype=str, engine="c")
+    if df.empty:
+        raise ValueError("File không có dữ liệu.")
+    return _clean_series_to_list(df.iloc[:, 0]), selected_column
+
+
+def _convert_xlsx_cell(cell) -> Any:
+    """Giống `OpenpyxlReader._convert_cell` của pandas để kết quả khớp `pd.read_excel`."""
+    from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC
+
+    if cell.value is None:
+        return ""
+    if cell.data_type == TYPE_ERROR:
+        return np.nan
+    if cell.data_type == TYPE_NUMERIC:
+        value = int(cell.value)
+        return value if value == cell.value else float(cell.value)
+    return cell.value
+
+
+def _parse_xlsx(content: bytes, text_column: str | None) -> tuple[list[str], str]:
+    """Sheet đầu tiên, openpyxl `read_only`: đọc dòng header rồi chỉ duyệt ô của cột văn bản.
+
+    Giá trị đi qua `TextParser` (bộ parse `pd.read_excel` dùng) nên suy kiểu, NA và
+    chuỗi kết quả giống hệt đọc cả sheet.
+    """
+    import pandas as pd
+    from openpyxl import load_workbook
+    from pandas.io.parsers import TextParser
+
+    workbook = load_workbook(
+        io.BytesIO(content), read_only=True, data_only=True, keep_links=False
+    )
+    try:
+        sheet = workbook.worksheets[0]
+        sheet.reset_dimensions()
+        header_row = next(sheet.rows, ())
+        header = [_convert_xlsx_cell(cell) for cell in header_row]
+        while header and header[-1] == "":
+            header.pop()
+        if not header:
+            raise ValueError("File không có dữ liệu.")
+        columns = [str(col) for col in TextParser([header], header=0).read().columns]
+        selected_column = _resolve_column_from_header(columns, text_column)
+        if selected_column is not None:
+            position = columns.index(selected_column) + 1
+            data = [[header[position - 1]]]
+            for (cell,) in sheet.iter_rows(min_row=2, min_col=position, max_col=position):
+                data.append([_convert_xlsx_cell(cell)])
+    finally:
+        workbook.close()
+
+    if selected_column is None:
+        # Phải xét kiểu dữ liệu từng cột => đọc cả sheet như trước.
+        df = pd.read_excel(io.BytesIO(content), sheet_name=0)
+        if df.empty:
+            raise ValueError("File không có dữ liệu.")
+        selected_column = _pick_text_column(df, text_column)
+        return _clean_series_to_list(df[selected_column]), selected_column
+
+    series = TextParser(data, header=0).read().iloc[:, 0]
+    if series.empty:
+        raise ValueError("File không có dữ liệu.")
+    return _clean_series_to_list(series), selected_column
+
+
+@timed("parse")
 def parse_messages_from_content(
     filename: str,
     content: bytes,
     text_column: str | None = None,
+    max_bytes: int | None = MAX_FILE_SIZE_BYTES,
 ) -> tuple[list[str], str]:
-    extension = validate_file(filename, content)
+    extension = validate_file(filename, content, max_bytes)
 
     if extension == ".txt":
         rows = [line.strip() for line in content.decode("utf-8", errors="ignore").splitlines()]
@@ -70,16 +198,110 @@ def parse_messages_from_content(
         return messages, "text"
 
     if extension == ".csv":
-        df = pd.read_csv(BytesIO(content))
+        messages, selected_column = _parse_csv(content, text_column)
     else:
-        df = pd.read_excel(BytesIO(content), sheet_name=0)
-
-    if df.empty:
-        raise ValueError("File không có dữ liệu.")
-
-    selected_column = _pick_text_column(df, text_column)
-    messages = _clean_series_to_list(df[selected_column])
+        messages, selected_column = _parse_xlsx(content, text_column)
     if not messages:
         raise ValueError("Không có dòng văn bản hợp lệ để dự đoán.")
     return messages, selected_column
 
+
+def _iter_txt_chunks(stream: BinaryIO, chunk_rows: int) -> Iterator[list[str]]:
+    # newline="" + splitlines() từng dòng => tách dòng giống hệt content.splitlines().
+    reader = io.TextIOWrapper(stream, encoding="utf-8", errors="ignore", newline="")
+    chunk: list[str] = []
+    try:
+        for physical_line in reader:
+            for line in physical_line.splitlines():
+                text = line.strip()
+                if text:
+                    chunk.append(text)
+            if len(chunk) >= chunk_rows:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    finally:
+        # Generator bị bỏ dở sau khi stream đã đóng (vd: Ctrl+C) thì không detach được nữa.
+        if not reader.closed:
+            reader.detach()
+
+
+def _iter_frame_chunks(
+    frames: Iterator[pd.DataFrame],
+    first: pd.DataFrame,
+    column: str,
+) -> Iterator[list[str]]:
+    messages = _clean_series_to_list(first[column])
+    if messages:
+        yield messages
+    for frame in frames:
+        messages = _clean_series_to_list(frame[column])
+        if messages:
+            yield messages
+
+
+def iter_message_chunks(
+    filename: str,
+    stream: BinaryIO,
+    text_column: str | None = None,
+    chunk_rows: int = STREAM_CHUNK_ROWS,
+    max_xlsx_bytes: int | None = MAX_FILE_SIZE_BYTES,
+) -> tuple[Iterator[list[str]], str]:
+    """Đọc file theo từng khối `chunk_rows` dòng, không giữ cả file trong bộ nhớ.
+
+    .txt đọc từng dòng, .csv đọc bằng `read_csv(chunksize=...)`: stream seek được
+    thì chọn cột văn bản theo header và chỉ parse cột đó, ngược lại chọn theo khối
+    đầu tiên. .xlsx không đọc luồng được nên vẫn đọc cả file vào bộ nhớ rồi đi qua
+    `parse_messages_from_content`, giới hạn `max_xlsx_bytes` (None: không giới hạn).
+    """
+    extension = validate_extension(filename)
+
+    if extension == ".txt":
+        return timed_iter(_iter_txt_chunks(stream, chunk_rows), "parse"), "text"
+
+    if extension == ".csv":
+        import pandas as pd
+
+        started = time.perf_counter()
+        selected_column = None
+        usecols = None
+        if stream.seekable():
+            # Đọc header rồi quay lại đầu file để chỉ parse cột văn bản.
+            start = stream.tell()
+            columns = _csv_header(stream)
+            stream.seek(start)
+            selected_column = _resolve_column_from_header(columns, text_column)
+            if selected_column is not None:
+                usecols = [columns.index(selected_column)]
+        try:
+            frames = iter(
+                pd.read_csv(stream, chunksize=chunk_rows, usecols=usecols, dtype=str, engine="c")
+            )
+            first = next(frames)
+        except (pd.errors.EmptyDataError, StopIteration) as exc:
+            raise ValueError("File không có dữ liệu.") from exc
+        if selected_column is None:
+            # Mọi cột đã đọc dạng chuỗi: parse lại khối đầu để suy kiểu khi chọn cột văn bản.
+            inferred = pd.read_csv(io.StringIO(first.to_csv(index=False)))
+            selected_column = _pick_text_column(inferred, text_column)
+        else:
+            first.columns = [selected_column]
+            frames = (frame.set_axis([selected_column], axis=1) for frame in frames)
+        chunks = timed_iter(
+            _iter_frame_chunks(frames, first, selected_column),
+            "parse",
+            initial_seconds=time.perf_counter() - started,
+        )
+        return chunks, selected_column
+
+    messages, selected_column = parse_messages_from_content(
+        filename=filename,
+        content=stream.read() if max_xlsx_bytes is None else stream.read(max_xlsx_bytes + 1),
+        text_column=text_column,
+        max_bytes=max_xlsx_bytes,
+    )
+    chunks = (
+        messages[start : start + chunk_rows] for start in range(0, len(messages), chunk_rows)
+    )
+    return chunks, selected_column
@@ -0,0 +1,161 @@
+"""Job chấm điểm file chạy nền với pool worker giới hạn."""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class JobQueueFullError(RuntimeError):
+    pass
+
+
+@dataclass(slots=True)
+class BatchJob:
+    model_id: str
+    filename: str
+    bytes_total: int
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = JOB_QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    rows_processed: int = 0
+    bytes_read: int = 0
+    error: str | None = None
+    result: dict[str, Any] = field(default_factory=dict)
+
+    def update_progress(self, rows_processed: int, bytes_read: int) -> None:
+        self.rows_processed = rows_processed
+        self.bytes_read = min(bytes_read, self.bytes_total)
+
+    def to_dict(self) -> dict[str, Any]:
+        now = self.finished_at or time.time()
+        elapsed = (now - self.started_at) if self.started_at else 0.0
+        progress = 1.0 if self.status == JOB_DONE else 0.0
+        if self.status == JOB_RUNNING and self.bytes_total:
+            progress = self.bytes_read / self.bytes_total
+        eta = None
+        if self.status == JOB_RUNNING and progress > 0:
+            eta = round(elapsed * (1 - progress) / progress, 2)
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "model_id": self.model_id,
+            "filename": self.filename,
+            "rows_processed": self.rows_processed,
+            "progress": round(progress, 4),
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(self.rows_processed / elapsed, 2) if elapsed else 0.0,
+            "eta_seconds": eta,
+            "error": self.error,
+            **self.result,
+        }
+
+
+class JobManager:
+    """Giữ trạng thái job trong bộ nhớ; tối đa `max_workers` job chạy cùng lúc.
+
+    Số job đang chờ bị chặn ở `max_pending` để upload lớn không chiếm hết
+    CPU/bộ nhớ của các request `/predict` tương tác. Khi có `state_dir`, trạng
+    thái job được ghi ra file JSON để process khác (chế độ nhiều worker) cũng
+    trả lời được `/jobs/<id>`.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 2,
+        max_pending: int = 8,
+        ttl_seconds: int = 3600,
+        state_dir: Path | None = None,
+    ):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self.state_dir = state_dir
+        if state_dir is not None:
+            state_dir.mkdir(parents=True, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="batch-job")
+        self._jobs: dict[str, BatchJob] = {}
+        self._lock = threading.Lock()
+
+    def _prune_locked(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        expired = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+            if self.state_dir is not None:
+                (self.state_dir / f"{job_id}.json").unlink(missing_ok=True)
+
+    def _persist(self, job: BatchJob) -> None:
+        if self.state_dir is None:
+            return
+        path = self.state_dir / f"{job.job_id}.json"
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(asdict(job), ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def report_progress(self, job: BatchJob, rows_processed: int, bytes_read: int) -> None:
+        job.update_progress(rows_processed, bytes_read)
+        self._persist(job)
+
+    def _active_locked(self) -> int:
+        return sum(item.status in (JOB_QUEUED, JOB_RUNNING) for item in self._jobs.values())
+
+    def submit(self, job: BatchJob, runner: Callable[[BatchJob], dict[str, Any]]) -> BatchJob:
+        with self._lock:
+            self._prune_locked()
+            if self._active_locked() >= self.max_workers + self.max_pending:
+                raise JobQueueFullError("Hàng đợi job đã đầy, thử lại sau.")
+            self._jobs[job.job_id] = job
+        self._persist(job)
+        self._executor.submit(self._run, job, runner)
+        return job
+
+    def _run(self, job: BatchJob, runner: Callable[[BatchJob], dict[str, Any]]) -> None:
+        job.status = JOB_RUNNING
+        job.started_at = time.time()
+        self._persist(job)
+        try:
+            job.result = runner(job)
+            job.status = JOB_DONE
+        except Exception as exc:  # lỗi của job trả về qua /jobs/<id>
+            job.error = str(exc)
+            job.status = JOB_FAILED
+        finally:
+            job.finished_at = time.time()
+            self._persist(job)
+
+    def get(self, job_id: str) -> BatchJob:
+        with self._lock:
+            if job_id in self._jobs:
+                return self._jobs[job_id]
+        # Job do process khác tạo: đọc ảnh chụp trạng thái mới nhất trên đĩa.
+        if self.state_dir is not None and all(c in "0123456789abcdef" for c in job_id):
+            path = self.state_dir / f"{job_id}.json"
+            if path.exists():
+                return BatchJob(**json.loads(path.read_text(encoding="utf-8")))
+        raise KeyError(f"Không tìm thấy job_id='{job_id}'.")
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            counts: dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return {"max_workers": self.max_workers, "max_pending": self.max_pending, **counts}
@@ -0,0 +1,261 @@
+"""Đo thời gian từng bước xử lý, xuất dạng Prometheus text và header Server-Timing."""
+
+from __future__ import annotations
+
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Iterator
+
+# Mốc histogram (giây): từ 1 tin nhắn (~ms) tới file lớn (~phút).
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+METRIC_PREFIX = "sms_spam"
+
+
+@dataclass(slots=True)
+class RequestTimings:
+    """Thời gian cộng dồn theo bước của 1 request/job (dùng cho Server-Timing)."""
+
+    model_id: str = ""
+    stages: dict[str, float] = field(default_factory=dict)
+
+
+_current: contextvars.ContextVar[RequestTimings | None] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class MetricsCollector:
+    """Histogram thời gian + counter trong bộ nhớ của process hiện tại (thread-safe)."""
+
+    def __init__(self, buckets: tuple[float, ...] = STAGE_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._stage: dict[tuple[str, str], _Histogram] = {}
+        self._request: dict[tuple[str, str], _Histogram] = {}
+        self._requests_total: dict[tuple[str, str, str], int] = {}
+        self._rows_total: dict[tuple[str], int] = {}
+        self._errors_total: dict[tuple[str, str], int] = {}
+        self._cascade_total: dict[tuple[str, str], int] = {}
+
+    def _observe(self, table: dict, key: tuple[str, ...], seconds: float) -> None:
+        with self._lock:
+            histogram = table.get(key)
+            if histogram is None:
+                histogram = table[key] = _Histogram(len(self.buckets))
+            for index, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram.counts[index] += 1
+                    break
+            histogram.sum += seconds
+            histogram.count += 1
+
+    def _increment(self, table: dict, key: tuple[str, ...], amount: int = 1) -> None:
+        with self._lock:
+            table[key] = table.get(key, 0) + amount
+
+    def observe_stage(self, stage: str, model_id: str, seconds: float) -> None:
+        self._observe(self._stage, (stage, model_id), seconds)
+
+    def observe_request(self, endpoint: str, method: str, status: int, seconds: float) -> None:
+        self._observe(self._request, (endpoint, method), seconds)
+        self._increment(self._requests_total, (endpoint, method, str(status)))
+
+    def count_rows(self, model_id: str, rows: int) -> None:
+        self._increment(self._rows_total, (model_id,), rows)
+
+    def count_error(self, endpoint: str, model_id: str) -> None:
+        self._increment(self._errors_total, (endpoint, model_id))
+
+    def count_cascade(self, model_id: str, stage_model_id: str, messages: int) -> None:
+        self._increment(self._cascade_total, (model_id, stage_model_id), messages)
+
+    def _render_histogram(
+        self,
+        lines: list[str],
+        name: str,
+        help_text: str,
+        label_names: tuple[str, ...],
+        table: dict[tuple[str, ...], _Histogram],
+    ) -> None:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for key, histogram in sorted(table.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, histogram.counts):
+                cumulative += count
+                labels = _labels(label_names, key, f'le="{bound}"')
+                lines.append(f"{name}_bucket{labels} {cumulative}")
+            labels = _labels(label_names, key, 'le="+Inf"')
+            lines.append(f"{name}_bucket{labels} {histogram.count}")
+            lines.append(f"{name}_sum{_labels(label_names, key)} {histogram.sum:.6f}")
+            lines.append(f"{name}_count{_labels(label_names, key)} {histogram.count}")
+
+    @staticmethod
+    def _render_counter(
+        lines: list[str],
+        name: str,
+        help_text: str,
+        label_names: tuple[str, ...],
+        table: dict[tuple[str, ...], int],
+    ) -> None:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for key, value in sorted(table.items()):
+            lines.append(f"{name}{_labels(label_names, key)} {value}")
+
+    def render(self) -> str:
+        """Toàn bộ metric theo Prometheus text exposition format 0.0.4."""
+        lines: list[str] = []
+        with self._lock:
+            self._render_histogram(
+                lines,
+                f"{METRIC_PREFIX}_stage_seconds",
+                "Thời gian từng bước (load, parse, preprocess, vectorize, embed, classify, write).",
+                ("stage", "model_id"),
+                self._stage,
+            )
+            self._render_histogram(
+                lines,
+                f"{METRIC_PREFIX}_request_seconds",
+                "Thời gian xử lý request HTTP.",
+                ("endpoint", "method"),
+                self._request,
+            )
+            self._render_counter(
+                lines,
+                f"{METRIC_PREFIX}_requests_total",
+                "Số request HTTP theo endpoint và mã trạng thái.",
+                ("endpoint", "method", "status"),
+                self._requests_total,
+            )
+            self._render_counter(
+                lines,
+                f"{METRIC_PREFIX}_rows_scored_total",
+                "Số tin nhắn đã chấm điểm.",
+                ("model_id",),
+                self._rows_total,
+            )
+            self._render_counter(
+                lines,
+                f"{METRIC_PREFIX}_errors_total",
+                "Số request/job lỗi.",
+                ("endpoint", "model_id"),
+                self._errors_total,
+            )
+            self._render_counter(
+                lines,
+                f"{METRIC_PREFIX}_cascade_decisions_total",
+                "Số tin (sau khử trùng) do từng tầng của cascade quyết định.",
+                ("model_id", "stage"),
+                self._cascade_total,
+            )
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsCollector()
+
+
+def begin_request(model_id: str = "") -> contextvars.Token:
+    """Bắt đầu gom thời gian theo bước cho request/job đang chạy trong context hiện tại."""
+    return _current.set(RequestTimings(model_id=model_id))
+
+
+def end_request(token: contextvars.Token) -> RequestTimings:
+    timings = _current.get() or RequestTimings()
+    _current.reset(token)
+    return timings
+
+
+def set_request_model(model_id: str) -> None:
+    timings = _current.get()
+    if timings is not None:
+        timings.model_id = model_id
+
+
+def _record(name: str, model_id: str | None, seconds: float) -> None:
+    timings = _current.get()
+    if model_id is None:
+        model_id = timings.model_id if timings is not None else ""
+    METRICS.observe_stage(name, model_id, seconds)
+    if timings is not None:
+        timings.stages[name] = timings.stages.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str, model_id: str | None = None) -> Iterator[None]:
+    """Đo 1 bước; `model_id=None` lấy model của request hiện tại (nếu có)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(name, model_id, time.perf_counter() - started)
+
+
+def timed(name: str) -> Callable:
+    """Decorator đo cả hàm như 1 bước."""
+
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with stage(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def timed_iter(
+    items: Iterable,
+    name: str,
+    model_id: str | None = None,
+    initial_seconds: float = 0.0,
+) -> Iterator:
+    """Đo tổng thời gian sinh phần tử của iterator lười (vd: đọc file theo khối) như 1 bước.
+
+    `initial_seconds`: thời gian đã tốn trước khi lặp (vd: đọc header) cộng vào cùng bước.
+    """
+    iterator = iter(items)
+    elapsed = initial_seconds
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            finally:
+                elapsed += time.perf_counter() - started
+            yield item
+    except StopIteration:
+        return
+    finally:
+        _record(name, model_id, elapsed)
+
+
+def server_timing_header(timings: RequestTimings, total_seconds: float) -> str:
+    parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.stages.items()]
+    parts.append(f"total;dur={total_seconds * 1000:.2f}")
+    return ", ".join(parts)
@@ -2,12 +2,30 @@
 
 from __future__ import annotations
 
+import contextvars
+import hashlib
 import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, asdict
 from pathlib import Path
 from typing import Any
 
-import joblib
+import numpy as np
+
+from .batching import MicroBatcher
+from .cascade import CascadeModel, CascadeScore
+from .embedding_store import EmbeddingStore
+from .metrics import METRICS, stage
+from .prediction_cache import PredictionCache
+from .text_preprocess import preprocess_batch
+
+
+WARMUP_TEXTS = [
+    "Xin chào, hẹn bạn 8h tối nay nhé.",
+    "URGENT! Claim your cash prize now at www.example.com, call 0912345678!",
+]
 
 
 def normalize_label(label: str | None, pos_label: str = "spam") -> str:
@@ -21,18 +39,159 @@ def normalize_label(label: str | None, pos_label: str = "spam") -> str:
 class ModelConfig:
     model_id: str
     display_name: str
-    joblib_path: str
-    has_proba: bool
-    default_threshold: float
-    pos_label: str
+    joblib_path: str = ""
+    has_proba: bool = True
+    default_threshold: float = 0.5
+    pos_label: str = "spam"
+    type: str = "model"
+    embedding_store: dict[str, Any] | None = None
+    micro_batch: dict[str, Any] | None = None
+    compiled_path: str | None = None
+    load_mode: str = "joblib"
+    encoder: dict[str, Any] | None = None
+    cascade: dict[str, Any] | None = None
+
+
+@dataclass(slots=True)
+class BatchPrediction:
+    texts: list[str]
+    results: list[dict[str, Any]]
+    unique_rows: int
+
+    @property
+    def total_rows(self) -> int:
+        return len(self.texts)
+
+    @property
+    def dedup_ratio(self) -> float:
+        """Số dòng / số tin duy nhất sau chuẩn hoá (x lần tiết kiệm inference)."""
+        return self.total_rows / self.unique_rows if self.unique_rows else 1.0
+
+    def rows(self) -> list[dict[str, Any]]:
+        return [
+            {"text": text, **result}
+            for text, result in zip(self.texts, self.results, strict=True)
+        ]
+
+
+@dataclass(slots=True)
+class ColumnarPrediction:
+    """Kết quả batch dạng cột: mỗi mảng cùng độ dài `texts`, không tạo dict cho từng dòng."""
+
+    model_id: str
+    threshold: float
+    texts: list[str]
+    labels: np.ndarray
+    scores: np.ndarray | None
+    unique_rows: int
+    decided_by: np.ndarray | None = None
+
+    @property
+    def total_rows(self) -> int:
+        return len(self.texts)
+
+    @property
+    def dedup_ratio(self) -> float:
+        return self.total_rows / self.unique_rows if self.unique_rows else 1.0
+
+    def rows(self, limit: int | None = None) -> list[dict[str, Any]]:
+        """Dạng từng dòng như `BatchPrediction.rows()` (dùng cho preview)."""
+        count = self.total_rows if limit is None else min(limit, self.total_rows)
+        rows = []
+        for index in range(count):
+            row = {
+                "text": self.texts[index],
+                "label": str(self.labels[index]),
+                "score": float(self.scores[index]) if self.scores is not None else None,
+                "threshold_used": self.threshold,
+                "model_id": self.model_id,
+            }
+            if self.decided_by is not None:
+                row["decided_by"] = str(self.decided_by[index])
+            rows.append(row)
+        return rows
+
+    def to_json(self) -> dict[str, Any]:
+        payload = {
+            "model_id": self.model_id,
+            "threshold_used": self.threshold,
+            "total_rows": self.total_rows,
+            "unique_rows": self.unique_rows,
+            "labels": self.labels.tolist(),
+            "scores": self.scores.tolist() if self.scores is not None else None,
+        }
+        if self.decided_by is not None:
+            payload["decided_by"] = self.decided_by.tolist()
+        return payload
+
+
+@dataclass(slots=True)
+class MultiModelPrediction:
+    """Kết quả nhiều model trên cùng 1 batch (chuẩn hoá + khử trùng chỉ làm 1 lần)."""
+
+    texts: list[str]
+    predictions: list[ColumnarPrediction]
+    unique_rows: int
+
+    @property
+    def total_rows(self) -> int:
+        return len(self.texts)
+
+    @property
+    def dedup_ratio(self) -> float:
+        return self.total_rows / self.unique_rows if self.unique_rows else 1.0
+
+    @property
+    def disagreement(self) -> np.ndarray:
+        """Mảng bool: dòng mà các model không cùng nhãn."""
+        first = self.predictions[0].labels
+        flags = np.zeros(self.total_rows, dtype=bool)
+        for prediction in self.predictions[1:]:
+            flags |= prediction.labels != first
+        return flags
+
+    def rows(self, limit: int | None = None) -> list[dict[str, Any]]:
+        """Mỗi dòng: text, kết quả từng model (bỏ `text`) và cờ `disagree`."""
+        per_model = [prediction.rows(limit) for prediction in self.predictions]
+        disagreement = self.disagreement
+        rows = []
+        for index, text in enumerate(self.texts[: len(per_model[0])]):
+            predictions = {}
+            for model_rows in per_model:
+                row = dict(model_rows[index])
+                row.pop("text")
+                predictions[row.pop("model_id")] = row
+            rows.append(
+                {
+                    "text": text,
+                    "predictions": predictions,
+                    "disagree": bool(disagreement[index]),
+                }
+            )
+        return rows
 
 
 class ModelRegistry:
-    def __init__(self, registry_path: Path):
+    def __init__(
+        self,
+        registry_path: Path,
+        prediction_cache: PredictionCache | None = None,
+        micro_batch: dict[str, Any] | None = None,
+        model_ids: list[str] | None = None,
+    ):
+        """`model_ids`: chỉ dùng các model này (cùng các tầng cascade của chúng), mục
+        khác trong registry bị bỏ qua hẳn: không liệt kê, không nạp, không preload.
+        """
         self.registry_path = registry_path.resolve()
         self.root_dir = self.registry_path.parent
-        self._configs = self._load_configs()
+        self._configs = self._select_configs(self._load_configs(), model_ids)
         self._cache: dict[str, Any] = {}
+        self.prediction_cache = prediction_cache
+        self.micro_batch_defaults = micro_batch
+        self._batchers: dict[str, MicroBatcher | None] = {}
+        self._batchers_lock = threading.Lock()
+        self._load_locks = {model_id: threading.Lock() for model_id in self._configs}
+        self._status: dict[str, dict[str, Any]] = {}
 
     def _load_configs(self) -> dict[str, ModelConfig]:
         raw = json.loads(self.registry_path.read_text(encoding="utf-8"))
@@ -44,14 +203,53 @@ class ModelRegistry:
             configs[config.model_id] = config
         if not configs:
             raise ValueError("Registry không có model nào.")
+        for config in configs.values():
+            if config.type == "cascade":
+                stages = (config.cascade or {}).get("stages") or []
+                for stage_id in stages:
+                    if stage_id not in configs or configs[stage_id].type == "cascade":
+                        raise ValueError(
+                            f"Cascade '{config.model_id}': tầng '{stage_id}' phải là model "
+                            "thường có trong registry."
+                        )
+            elif config.type != "model":
+                raise ValueError(f"type không hỗ trợ: {config.type}")
+            elif not config.joblib_path:
+                raise ValueError(f"Model '{config.model_id}' thiếu `joblib_path`.")
         return configs
 
+    @staticmethod
+    def _select_configs(
+        configs: dict[str, ModelConfig],
+        model_ids: list[str] | None,
+    ) -> dict[str, ModelConfig]:
+        if not model_ids:
+            return configs
+        unknown = [model_id for model_id in model_ids if model_id not in configs]
+        if unknown:
+            raise ValueError(f"Không tìm thấy model_id trong registry: {', '.join(unknown)}")
+        selected = set(model_ids)
+        for model_id in model_ids:
+            selected.update((configs[model_id].cascade or {}).get("stages") or [])
+        # Giữ thứ tự của registry.
+        return {model_id: config for model_id, config in configs.items() if model_id in selected}
+
+    @property
+    def model_ids(self) -> list[str]:
+        return list(self._configs)
+
     def list_models(self) -> list[dict[str, Any]]:
         models = []
         for model_id in sorted(self._configs):
             config = self._configs[model_id]
             item = asdict(config)
             item.pop("joblib_path", None)
+            item.pop("embedding_store", None)
+            item.pop("micro_batch", None)
+            item.pop("compiled_path", None)
+            item.pop("load_mode", None)
+            item.pop("encoder", None)
+            item.pop("cascade", None)
             models.append(item)
         return models
 
@@ -65,14 +263,164 @@ class ModelRegistry:
             return self._cache[model_id]
 
         config = self.get_config(model_id)
+        # Mỗi model 1 lock: request đồng thời đầu tiên chờ nhau thay vì cùng joblib.load.
+        with self._load_locks[model_id]:
+            if model_id in self._cache:
+                return self._cache[model_id]
+            started = time.perf_counter()
+            try:
+                with stage("load", model_id):
+                    model = self._load_model(config)
+            except Exception as exc:
+                self._status[model_id] = {"ready": False, "error": str(exc)}
+                raise
+            self._status[model_id] = {
+                "ready": True,
+                "load_seconds": round(time.perf_counter() - started, 4),
+                "warmup_ms": None,
+                "error": None,
+            }
+            self._cache[model_id] = model
+            return model
+
+    def _load_model(self, config: ModelConfig):
+        if config.type == "cascade":
+            cascade = CascadeModel(config.model_id, config.cascade or {})
+            # Nạp trước 2 tầng để lỗi thiếu artifact hiện ngay lúc nạp cascade.
+            self.get_model(cascade.fast_model_id)
+            self.get_model(cascade.slow_model_id)
+            return cascade
+
         model_path = (self.root_dir / config.joblib_path).resolve()
+        if config.compiled_path:
+            # Scorer biên dịch sẵn (nếu đã export) thay cho pipeline sklearn.
+            compiled_path = (self.root_dir / config.compiled_path).resolve()
+            if compiled_path.exists():
+                model_path = compiled_path
         if not model_path.exists():
             raise FileNotFoundError(f"Không thấy file model: {model_path}")
 
-        model = joblib.load(model_path)
-        self._cache[model_id] = model
+        import joblib
+
+        if config.load_mode == "mmap":
+            model = joblib.load(model_path, mmap_mode="r")
+        elif config.load_mode == "joblib":
+            model = joblib.load(model_path)
+        else:
+            raise ValueError(f"load_mode không hỗ trợ: {config.load_mode}")
+        if hasattr(model, "restore_embedder"):
+            model.restore_embedder(model_path.parent)
+        if hasattr(model, "configure_encoder"):
+            # Áp dụng thiết lập encode (kể cả số thread torch) đúng 1 lần khi nạp.
+            model.configure_encoder(**(config.encoder or {}))
+        if config.embedding_store and hasattr(model, "attach_embedding_store"):
+            model.attach_embedding_store(self._open_embedding_store(config, model_path))
         return model
 
+    def model_version(self, model_id: str) -> str:
+        """Dấu vân tay cấu hình + artifact (mtime/size) của model; đổi khi đóng gói lại."""
+        config = self.get_config(model_id)
+        parts = [json.dumps(asdict(config), sort_keys=True, default=str)]
+        for stage_id in (config.cascade or {}).get("stages") or []:
+            parts.append(self.model_version(stage_id))
+        for relative in (config.joblib_path, config.compiled_path):
+            path = self.root_dir / relative if relative else None
+            if path is not None and path.exists():
+                stat = path.stat()
+                parts.append(f"{relative}:{stat.st_mtime_ns}:{stat.st_size}")
+        return hashlib.blake2b("|".join(parts).encode("utf-8"), digest_size=8).hexdigest()
+
+    def loaded_model_ids(self) -> list[str]:
+        return sorted(self._cache)
+
+    def set_embedding_stores_read_only(self) -> None:
+        """Chỉ giữ 1 process ghi kho embedding; các process còn lại chỉ đọc."""
+        for model in self._cache.values():
+            store = getattr(model, "embedding_store", None)
+            if store is not None:
+                store.make_read_only()
+
+    def resync_embedding_stores(self) -> None:
+        """Nạp lại kho embedding từ đĩa (process ghi vừa được fork lại)."""
+        for model in self._cache.values():
+            store = getattr(model, "embedding_store", None)
+            if store is not None:
+                store.resync()
+
+    def warmup(self, model_id: str) -> float:
+        """Chạy 1 lần inference (bỏ qua cache) để khởi tạo kernel torch/BLAS, trả về ms."""
+        config = self.get_config(model_id)
+        model = self.get_model(model_id)
+        started = time.perf_counter()
+        self._raw_predict(config, model, preprocess_batch(WARMUP_TEXTS), WARMUP_TEXTS)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        status = self._status.setdefault(model_id, {})
+        status.update({"ready": True, "warmup_ms": round(elapsed_ms, 3), "error": None})
+        return elapsed_ms
+
+    def preload(
+        self,
+        model_ids: list[str] | None = None,
+        warmup: bool = True,
+        max_workers: int | None = None,
+    ) -> dict[str, dict[str, Any]]:
+        """Nạp song song các model (mặc định toàn bộ registry), tuỳ chọn warmup."""
+        targets = list(model_ids or self._configs)
+
+        def load(model_id: str) -> None:
+            try:
+                self.get_model(model_id)
+                if warmup:
+                    self.warmup(model_id)
+            except Exception as exc:  # lỗi từng model ghi vào status, không chặn model khác
+                self._status[model_id] = {"ready": False, "error": str(exc)}
+
+        with ThreadPoolExecutor(max_workers=max_workers or len(targets) or 1) as executor:
+            list(executor.map(load, targets))
+        return self.model_status()
+
+    def model_status(self) -> dict[str, dict[str, Any]]:
+        status = {}
+        for model_id in sorted(self._configs):
+            item = self._status.get(model_id)
+            if item is None:
+                item = {
+                    "ready": model_id in self._cache,
+                    "load_seconds": None,
+                    "warmup_ms": None,
+                    "error": None,
+                }
+            status[model_id] = dict(item)
+        return status
+
+    def is_ready(self, model_ids: list[str] | None = None) -> bool:
+        status = self.model_status()
+        return all(status[model_id]["ready"] for model_id in (model_ids or status))
+
+    def _open_embedding_store(self, config: ModelConfig, model_path: Path) -> EmbeddingStore:
+        options = dict(config.embedding_store or {})
+        stat = model_path.stat()
+        # Mặc định gắn định danh embedder với artifact: đóng gói lại => kho mới.
+        embedder_id = options.get("embedder_id") or (
+            f"{config.model_id}:{config.joblib_path}:{stat.st_size}:{stat.st_mtime_ns}"
+        )
+        return EmbeddingStore(
+            directory=(self.root_dir / options.get("path", "cache/embeddings")).resolve(),
+            embedder_id=str(embedder_id),
+            max_rows=int(options.get("max_rows", 1_000_000)),
+            read_only=bool(options.get("read_only", False)),
+        )
+
+    def reload_model(self, model_id: str):
+        """Nạp lại artifact từ đĩa và bỏ các kết quả cache của model cũ."""
+        self.get_config(model_id)
+        with self._load_locks[model_id]:
+            self._cache.pop(model_id, None)
+            self._status.pop(model_id, None)
+            if self.prediction_cache is not None:
+                self.prediction_cache.invalidate(model_id)
+        return self.get_model(model_id)
+
     @staticmethod
     def _spam_index(classes: Any, pos_label: str) -> int:
         classes_list = [str(c).lower() for c in classes]
@@ -82,81 +430,365 @@ class ModelRegistry:
             return classes_list.index("spam")
         raise ValueError("Model có predict_proba nhưng không có lớp spam.")
 
-    def predict_one(
-        self,
+    @staticmethod
+    def _run_model(
         model_id: str,
-        text: str,
-        threshold: float | None = None,
-    ) -> dict[str, Any]:
-        config = self.get_config(model_id)
-        model = self.get_model(model_id)
-        used_threshold = config.default_threshold if threshold is None else threshold
+        model: Any,
+        method: str,
+        items: list[str],
+        originals: list[str],
+    ):
+        """Gọi model trên văn bản đã chuẩn hoá, bỏ qua bước preprocess bên trong nếu có.
 
+        `preprocess_sms` không idempotent (token `<URL>` bị lower lần 2), nên
+        model không tách được bước preprocess sẽ nhận lại văn bản gốc đại diện.
+        Pipeline tách được bước đặc trưng/classifier thì đo riêng từng bước.
+        """
+        steps = getattr(model, "steps", None)
+        if steps and len(steps) > 2 and steps[0][0] == "preprocess":
+            with stage("vectorize", model_id):
+                features = model[1:-1].transform(items)
+            with stage("classify", model_id):
+                return getattr(model[-1], method)(features)
+        if steps and len(steps) > 1 and steps[0][0] == "preprocess":
+            with stage("classify", model_id):
+                return getattr(model[1:], method)(items)
+        classifier = getattr(model, "classifier", None)
+        if hasattr(model, "transform") and hasattr(classifier, method):
+            with stage("embed", model_id):
+                vectors = model.transform(items, preprocessed=True)
+            with stage("classify", model_id):
+                return getattr(classifier, method)(vectors)
+        with stage("classify", model_id):
+            if getattr(model, "supports_preprocessed", False):
+                return getattr(model, method)(items, preprocessed=True)
+            return getattr(model, method)(originals)
+
+    def _raw_predict(
+        self,
+        config: ModelConfig,
+        model: Any,
+        items: list[str],
+        originals: list[str],
+    ) -> list[Any]:
+        """Điểm spam (float) nếu model có predict_proba, ngược lại là nhãn thô."""
+        if isinstance(model, CascadeModel):
+            return self._cascade_raw_predict(model, items, originals, live=False)
         if hasattr(model, "predict_proba"):
             classes = getattr(model, "classes_", None)
             if classes is None:
                 raise ValueError("Model thiếu classes_, không tính được xác suất spam.")
-            proba = model.predict_proba([text])[0]
+            all_proba = self._run_model(
+                config.model_id, model, "predict_proba", items, originals
+            )
             spam_idx = self._spam_index(classes, config.pos_label)
-            score = float(proba[spam_idx])
-            label = "spam" if score >= used_threshold else "ham"
-            return {
-                "label": label,
-                "score": score,
-                "threshold_used": used_threshold,
-                "model_id": model_id,
-            }
+            return [float(row[spam_idx]) for row in all_proba]
 
-        pred_label = model.predict([text])[0]
+        predictions = self._run_model(config.model_id, model, "predict", items, originals)
+        return [str(pred) for pred in predictions]
+
+    def _cached_raw_predict(
+        self,
+        config: ModelConfig,
+        model: Any,
+        items: list[str],
+        originals: list[str],
+    ) -> list[Any]:
+        if isinstance(model, CascadeModel):
+            return self._cascade_raw_predict(model, items, originals, live=True)
+        cache = self.prediction_cache
+        if cache is None:
+            return self._raw_predict(config, model, items, originals)
+
+        keys = [cache.make_key(config.model_id, item) for item in items]
+        values = [cache.get(key) for key in keys]
+        missing = [idx for idx, value in enumerate(values) if value is None]
+        if missing:
+            fresh = self._raw_predict(
+                config,
+                model,
+                [items[idx] for idx in missing],
+                [originals[idx] for idx in missing],
+            )
+            for idx, value in zip(missing, fresh, strict=True):
+                values[idx] = value
+                cache.put(keys[idx], value)
+        return values
+
+    def _cascade_raw_predict(
+        self,
+        cascade: CascadeModel,
+        items: list[str],
+        originals: list[str],
+        live: bool = True,
+    ) -> list[CascadeScore]:
+        """Tầng nhanh chấm mọi tin; tin có điểm trong `band` được chấm lại 1 lượt ở tầng chậm.
+
+        `live=False` (warmup) bỏ qua cache dự đoán và không tính vào thống kê.
+        """
+        score = self._cached_raw_predict if live else self._raw_predict
+        fast_config = self.get_config(cascade.fast_model_id)
+        fast_scores = score(fast_config, self.get_model(fast_config.model_id), items, originals)
+        if not all(isinstance(value, float) for value in fast_scores):
+            raise ValueError(f"Tầng '{fast_config.model_id}' của cascade phải có predict_proba.")
+
+        results = [CascadeScore(value, fast_config.model_id) for value in fast_scores]
+        uncertain = [
+            index for index, value in enumerate(fast_scores) if cascade.is_uncertain(value)
+        ]
+        if uncertain:
+            slow_config = self.get_config(cascade.slow_model_id)
+            slow_scores = score(
+                slow_config,
+                self.get_model(slow_config.model_id),
+                [items[index] for index in uncertain],
+                [originals[index] for index in uncertain],
+            )
+            for index, value in zip(uncertain, slow_scores, strict=True):
+                if not isinstance(value, float):
+                    raise ValueError(
+                        f"Tầng '{slow_config.model_id}' của cascade phải có predict_proba."
+                    )
+                results[index] = CascadeScore(value, slow_config.model_id)
+
+        if live:
+            decided_fast = len(items) - len(uncertain)
+            cascade.record(len(items), len(uncertain))
+            METRICS.count_cascade(cascade.model_id, cascade.fast_model_id, decided_fast)
+            METRICS.count_cascade(cascade.model_id, cascade.slow_model_id, len(uncertain))
+        return results
+
+    def cascade_stats(self) -> dict[str, Any]:
+        return {
+            model_id: model.stats()
+            for model_id, model in list(self._cache.items())
+            if isinstance(model, CascadeModel)
+        }
+
+    def _dedup_raw_predict(
+        self,
+        config: ModelConfig,
+        model: Any,
+        texts: list[str],
+    ) -> tuple[list[Any], int]:
+        """Chuẩn hoá, gộp tin trùng, chấm mỗi tin duy nhất 1 lần rồi trả về đúng thứ tự."""
+        raws, inverse = self._dedup_unique_raw_predict(config, model, texts)
+        return [raws[slot] for slot in inverse], len(raws)
+
+    def _dedup_unique_raw_predict(
+        self,
+        config: ModelConfig,
+        model: Any,
+        texts: list[str],
+    ) -> tuple[list[Any], list[int]]:
+        """Điểm thô của từng tin duy nhất + chỉ số tin duy nhất của từng dòng."""
+        unique_items, representatives, inverse = self._dedup(texts, config.model_id)
+        raws = self._cached_raw_predict(config, model, unique_items, representatives)
+        return raws, inverse
+
+    @staticmethod
+    def _dedup(
+        texts: list[str],
+        model_id: str | None = None,
+    ) -> tuple[list[str], list[str], list[int]]:
+        """Chuẩn hoá rồi gộp tin trùng: (tin duy nhất, văn bản gốc đại diện, chỉ số từng dòng)."""
+        with stage("preprocess", model_id):
+            normalized = preprocess_batch(texts)
+        first_pos: dict[str, int] = {}
+        inverse = [first_pos.setdefault(item, len(first_pos)) for item in normalized]
+        unique_items = list(first_pos)
+        representatives = [""] * len(unique_items)
+        for text, slot in zip(texts, inverse):
+            if not representatives[slot]:
+                representatives[slot] = text
+        return unique_items, representatives, inverse
+
+    @staticmethod
+    def _make_result(config: ModelConfig, raw: Any, threshold: float) -> dict[str, Any]:
+        if isinstance(raw, CascadeScore):
+            result = ModelRegistry._make_result(config, raw.score, threshold)
+            result["decided_by"] = raw.stage
+            return result
+        if isinstance(raw, float):
+            label = "spam" if raw >= threshold else "ham"
+            score: float | None = raw
+        else:
+            label = normalize_label(raw, pos_label=config.pos_label)
+            score = None
+        return {
+            "label": label,
+            "score": score,
+            "threshold_used": threshold,
+            "model_id": config.model_id,
+        }
+
+    def _get_batcher(self, config: ModelConfig) -> MicroBatcher | None:
+        """Dispatcher gom batch cho `predict_one`; None nếu model không bật."""
+        if config.model_id in self._batchers:
+            return self._batchers[config.model_id]
+
+        with self._batchers_lock:
+            if config.model_id in self._batchers:
+                return self._batchers[config.model_id]
+            options = {**(self.micro_batch_defaults or {}), **(config.micro_batch or {})}
+            batcher = None
+            if options and int(options.get("max_batch_size", 32)) > 1:
+                model_id = config.model_id
+
+                def score(texts: list[str]) -> list[Any]:
+                    # Lấy model tại thời điểm chấm để reload_model có hiệu lực ngay.
+                    return self._dedup_raw_predict(config, self.get_model(model_id), texts)[0]
+
+                batcher = MicroBatcher(
+                    score,
+                    max_wait_ms=float(options.get("max_wait_ms", 5.0)),
+                    max_batch_size=int(options.get("max_batch_size", 32)),
+                    name=f"micro-batch-{model_id}",
+                    result_timeout_s=float(options.get("result_timeout_s", 30.0)),
+                )
+            self._batchers[config.model_id] = batcher
+            return batcher
+
+    def micro_batch_stats(self) -> dict[str, Any]:
         return {
-            "label": normalize_label(str(pred_label), pos_label=config.pos_label),
-            "score": None,
-            "threshold_used": used_threshold,
-            "model_id": model_id,
+            model_id: batcher.stats()
+            for model_id, batcher in self._batchers.items()
+            if batcher is not None
         }
 
+    def predict_one(
+        self,
+        model_id: str,
+        text: str,
+        threshold: float | None = None,
+    ) -> dict[str, Any]:
+        config = self.get_config(model_id)
+        model = self.get_model(model_id)
+        used_threshold = config.default_threshold if threshold is None else threshold
+        batcher = self._get_batcher(config)
+        if batcher is not None:
+            # Các bước con chạy ở thread dispatcher; request chỉ thấy tổng thời gian chờ + chấm.
+            with stage("micro_batch", model_id):
+                raw = batcher.wait(batcher.submit(text))
+        else:
+            raw = self._dedup_raw_predict(config, model, [text])[0][0]
+        METRICS.count_rows(model_id, 1)
+        return self._make_result(config, raw, used_threshold)
+
+    def score_batch(
+        self,
+        model_id: str,
+        texts: list[str],
+        threshold: float | None = None,
+    ) -> BatchPrediction:
+        config = self.get_config(model_id)
+        model = self.get_model(model_id)
+        used_threshold = config.default_threshold if threshold is None else threshold
+        raws, unique_rows = self._dedup_raw_predict(config, model, texts)
+        METRICS.count_rows(model_id, len(texts))
+        return BatchPrediction(
+            texts=texts,
+            results=[self._make_result(config, raw, used_threshold) for raw in raws],
+            unique_rows=unique_rows,
+        )
+
     def predict_batch(
         self,
         model_id: str,
         texts: list[str],
         threshold: float | None = None,
     ) -> list[dict[str, Any]]:
+        return self.score_batch(model_id, texts, threshold).rows()
+
+    def predict_batch_columnar(
+        self,
+        model_id: str,
+        texts: list[str],
+        threshold: float | None = None,
+    ) -> ColumnarPrediction:
+        """Như `predict_batch` nhưng trả mảng numpy thay vì dict cho từng dòng.
+
+        Điểm/nhãn tính trên tin duy nhất rồi trải ra theo chỉ số bằng numpy.
+        """
         config = self.get_config(model_id)
         model = self.get_model(model_id)
+        raws, inverse = self._dedup_unique_raw_predict(config, model, texts)
+        METRICS.count_rows(model_id, len(texts))
+        return self._columnar(config, raws, np.asarray(inverse, dtype=np.intp), texts, threshold)
+
+    @staticmethod
+    def _columnar(
+        config: ModelConfig,
+        raws: list[Any],
+        index: np.ndarray,
+        texts: list[str],
+        threshold: float | None,
+    ) -> ColumnarPrediction:
         used_threshold = config.default_threshold if threshold is None else threshold
+        decided_by = None
+        if raws and isinstance(raws[0], CascadeScore):
+            unique_scores = np.fromiter((raw.score for raw in raws), np.float64, len(raws))
+            decided_by = np.asarray([raw.stage for raw in raws])[index]
+        elif all(isinstance(raw, float) for raw in raws):
+            unique_scores = np.asarray(raws, dtype=np.float64)
+        else:
+            unique_scores = None
 
-        if hasattr(model, "predict_proba"):
-            classes = getattr(model, "classes_", None)
-            if classes is None:
-                raise ValueError("Model thiếu classes_, không tính được xác suất spam.")
-            all_proba = model.predict_proba(texts)
-            spam_idx = self._spam_index(classes, config.pos_label)
-            output = []
-            for text, row in zip(texts, all_proba, strict=True):
-                score = float(row[spam_idx])
-                label = "spam" if score >= used_threshold else "ham"
-                output.append(
-                    {
-                        "text": text,
-                        "label": label,
-                        "score": score,
-                        "threshold_used": used_threshold,
-                        "model_id": model_id,
-                    }
-                )
-            return output
+        if unique_scores is not None:
+            scores = unique_scores[index]
+            labels = np.where(scores >= used_threshold, "spam", "ham")
+        else:
+            scores = None
+            unique_labels = [normalize_label(raw, pos_label=config.pos_label) for raw in raws]
+            labels = np.asarray(unique_labels, dtype="<U4")[index]
+        return ColumnarPrediction(
+            model_id=config.model_id,
+            threshold=used_threshold,
+            texts=texts,
+            labels=labels,
+            scores=scores,
+            unique_rows=len(raws),
+            decided_by=decided_by,
+        )
 
-        preds = model.predict(texts)
-        output = []
-        for text, pred in zip(texts, preds, strict=True):
-            output.append(
-                {
-                    "text": text,
-                    "label": normalize_label(str(pred), pos_label=config.pos_label),
-                    "score": None,
-                    "threshold_used": used_threshold,
-                    "model_id": model_id,
-                }
-            )
-        return output
+    def predict_batch_multi(
+        self,
+        model_ids: list[str],
+        texts: list[str],
+        threshold: float | None = None,
+    ) -> MultiModelPrediction:
+        """Chấm cùng 1 batch bằng nhiều model: parse/chuẩn hoá/khử trùng 1 lần.
+
+        Các model chạy song song trên thread pool (encode torch và BLAS nhả GIL);
+        `threshold=None` dùng ngưỡng mặc định riêng của từng model.
+        """
+        model_ids = list(dict.fromkeys(model_ids))
+        if not model_ids:
+            raise ValueError("Cần ít nhất 1 `model_id`.")
+        configs = [self.get_config(model_id) for model_id in model_ids]
+        models = [self.get_model(model_id) for model_id in model_ids]
+        unique_items, representatives, inverse = self._dedup(texts)
+        index = np.asarray(inverse, dtype=np.intp)
+
+        def score(config: ModelConfig, model: Any) -> ColumnarPrediction:
+            raws = self._cached_raw_predict(config, model, unique_items, representatives)
+            METRICS.count_rows(config.model_id, len(texts))
+            return self._columnar(config, raws, index, texts, threshold)
 
+        if len(configs) == 1:
+            predictions = [score(configs[0], models[0])]
+        else:
+            with ThreadPoolExecutor(
+                max_workers=len(configs), thread_name_prefix="multi-model"
+            ) as executor:
+                # Mỗi model 1 bản sao context để Server-Timing của request vẫn gom được thời gian.
+                futures = [
+                    executor.submit(contextvars.copy_context().run, score, config, model)
+                    for config, model in zip(configs, models)
+                ]
+                predictions = [future.result() for future in futures]
+        return MultiModelPrediction(
+            texts=texts,
+            predictions=predictions,
+            unique_rows=len(unique_items),
+        )
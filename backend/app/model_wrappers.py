@@ -2,6 +2,9 @@
 
 from __future__ import annotations
 
+import contextlib
+import sys
+from pathlib import Path
 from typing import Iterable
 
 import numpy as np
@@ -12,11 +15,89 @@ from .text_preprocess import preprocess_batch
 class EmbeddingLogisticPipeline:
     """Pipeline nhẹ: preprocess -> sentence embedding -> logistic regression."""
 
-    def __init__(self, embedder, classifier, batch_size: int = 64):
+    supports_preprocessed = True
+
+    def __init__(
+        self,
+        embedder,
+        classifier,
+        batch_size: int = 64,
+        max_seq_length: int | None = None,
+        num_threads: int | None = None,
+    ):
+        """`max_seq_length=None` giữ độ dài tối đa của embedder (không cắt tin dài hơn)."""
         self.embedder = embedder
         self.classifier = classifier
         self.batch_size = batch_size
+        self.max_seq_length = max_seq_length
+        self.num_threads = num_threads
         self.classes_ = getattr(classifier, "classes_", None)
+        self.embedding_store = None
+        self.embedder_file: str | None = None
+        self._apply_max_seq_length()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # Kho embedding gắn lúc chạy (memmap + lock), không đóng gói vào artifact.
+        state.pop("embedding_store", None)
+        if state.get("embedder_file"):
+            # Định dạng mmap: trọng số embedder nằm ở file torch riêng cạnh artifact.
+            state["embedder"] = None
+        return state
+
+    def __setstate__(self, state):
+        state.setdefault("embedder_file", None)
+        # Artifact cũ: giữ nguyên độ dài tối đa của embedder, không ép số thread.
+        state.setdefault("max_seq_length", None)
+        state.setdefault("num_threads", None)
+        self.__dict__.update(state)
+        self.embedding_store = None
+
+    def restore_embedder(self, artifact_dir: Path) -> None:
+        """Nạp embedder tách riêng bằng `torch.load(mmap=True)` (trọng số chia sẻ page cache)."""
+        if self.embedder is not None or not self.embedder_file:
+            return
+        import torch
+
+        self.embedder = torch.load(
+            Path(artifact_dir) / self.embedder_file,
+            map_location="cpu",
+            mmap=True,
+            weights_only=False,
+        )
+
+    def attach_embedding_store(self, store) -> None:
+        self.embedding_store = store
+
+    def configure_encoder(
+        self,
+        batch_size: int | None = None,
+        max_seq_length: int | None = None,
+        num_threads: int | None = None,
+    ) -> None:
+        """Ghi đè thiết lập encode lưu trong artifact rồi áp dụng; registry gọi 1 lần khi nạp.
+
+        `num_threads` đổi số thread torch của cả process nên không đặt lại mỗi lần encode.
+        """
+        for name, value in (
+            ("batch_size", batch_size),
+            ("max_seq_length", max_seq_length),
+            ("num_threads", num_threads),
+        ):
+            if value is None:
+                continue
+            if int(value) <= 0:
+                raise ValueError(f"`{name}` phải lớn hơn 0.")
+            setattr(self, name, int(value))
+        self._apply_max_seq_length()
+        if self.num_threads:
+            import torch
+
+            torch.set_num_threads(self.num_threads)
+
+    def _apply_max_seq_length(self) -> None:
+        if self.max_seq_length and hasattr(self.embedder, "max_seq_length"):
+            self.embedder.max_seq_length = self.max_seq_length
 
     @staticmethod
     def _to_list(texts: Iterable[str] | str) -> list[str]:
@@ -24,27 +105,248 @@ class EmbeddingLogisticPipeline:
             return [texts]
         return list(texts)
 
-    def _encode(self, texts: Iterable[str] | str) -> np.ndarray:
-        items = preprocess_batch(self._to_list(texts))
-        return self.embedder.encode(
-            items,
-            batch_size=self.batch_size,
-            show_progress_bar=False,
-            convert_to_numpy=True,
-            normalize_embeddings=True,
+    def _embed(self, items: list[str]) -> np.ndarray:
+        """Encode trong `torch.inference_mode()` (không ghi đồ thị autograd).
+
+        sentence-transformers tự sắp tin theo độ dài trong mỗi lần `encode`.
+        """
+        # Embedder là module torch nên torch đã được import khi có embedder thật.
+        torch = sys.modules.get("torch")
+        context = torch.inference_mode() if torch is not None else contextlib.nullcontext()
+        with context:
+            return self.embedder.encode(
+                items,
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+            )
+
+    def _encode(self, texts: Iterable[str] | str, preprocessed: bool = False) -> np.ndarray:
+        items = self._to_list(texts) if preprocessed else preprocess_batch(self._to_list(texts))
+        store = self.embedding_store
+        if store is None or not items:
+            return self._embed(items)
+
+        keys = [store.make_key(item) for item in items]
+        vectors, hit_mask = store.get_many(keys)
+        if hit_mask.all():
+            return vectors
+
+        # Chỉ gửi các tin miss (đã khử trùng) sang sentence-transformer.
+        first_pos: dict[bytes, int] = {}
+        for pos in np.flatnonzero(~hit_mask):
+            first_pos.setdefault(keys[pos], int(pos))
+        miss_keys = list(first_pos)
+        fresh = np.asarray(
+            self._embed([items[first_pos[key]] for key in miss_keys]),
+            dtype=np.float32,
         )
+        if vectors.shape[1] != fresh.shape[1]:
+            vectors = np.zeros((len(items), fresh.shape[1]), dtype=np.float32)
+        row_of = {key: row for row, key in enumerate(miss_keys)}
+        for pos in np.flatnonzero(~hit_mask):
+            vectors[pos] = fresh[row_of[keys[pos]]]
+        store.add_many(miss_keys, fresh)
+        return vectors
+
+    def transform(self, texts: Iterable[str] | str, preprocessed: bool = False) -> np.ndarray:
+        """Vector embedding (đã chuẩn hoá L2) đưa vào classifier."""
+        return self._encode(texts, preprocessed=preprocessed)
 
-    def predict(self, texts: Iterable[str] | str):
-        vectors = self._encode(texts)
+    def predict(self, texts: Iterable[str] | str, preprocessed: bool = False):
+        vectors = self._encode(texts, preprocessed=preprocessed)
         return self.classifier.predict(vectors)
 
-    def predict_proba(self, texts: Iterable[str] | str):
-        vectors = self._encode(texts)
+    def predict_proba(self, texts: Iterable[str] | str, preprocessed: bool = False):
+        vectors = self._encode(texts, preprocessed=preprocessed)
         return self.classifier.predict_proba(vectors)
 
-    def decision_function(self, texts: Iterable[str] | str):
-        vectors = self._encode(texts)
+    def decision_function(self, texts: Iterable[str] | str, preprocessed: bool = False):
+        vectors = self._encode(texts, preprocessed=preprocessed)
         if hasattr(self.classifier, "decision_function"):
             return self.classifier.decision_function(vectors)
         raise AttributeError("Model hiện tại không hỗ trợ decision_function.")
 
+
+class CompiledBernoulliNB:
+    """Scorer rút gọn cho pipeline preprocess -> CountVectorizer -> BernoulliNB 2 lớp.
+
+    log P(c|x) của BernoulliNB = baseline_c + tổng (log p_cj - log(1 - p_cj))
+    trên các token có mặt. Vì vậy chỉ cần lưu hiệu delta (lớp 1 - lớp 0) cho
+    từng token và hiệu baseline khi mọi token vắng mặt: chấm điểm = tách token,
+    tra delta, cộng, sigmoid. Không tạo ma trận sparse, không qua kiểm tra
+    estimator của sklearn.
+
+    Delta lưu theo 1 trong 2 dạng:
+    - `vocabulary` (CompactCountVectorizer) + `feature_deltas` (float64 theo chỉ số
+      feature): tra bằng mảng hash chỉ đọc, map thẳng từ file khi nạp mmap;
+    - `token_deltas` (dict token -> delta): khi vectorizer gốc không rút gọn.
+    """
+
+    supports_preprocessed = True
+
+    def __init__(
+        self,
+        analyzer_params: dict,
+        token_deltas: dict[str, float] | None,
+        baseline: float,
+        classes,
+        binary: bool = True,
+        binarize: float | None = 0.0,
+        vocabulary=None,
+        feature_deltas: np.ndarray | None = None,
+    ):
+        if token_deltas is None and (vocabulary is None or feature_deltas is None):
+            raise ValueError("Cần `token_deltas` hoặc cặp `vocabulary` + `feature_deltas`.")
+        self.analyzer_params = analyzer_params
+        self.token_deltas = token_deltas
+        self.baseline = baseline
+        self.classes_ = np.asarray(classes)
+        self.binary = binary
+        self.binarize = binarize
+        self.vocabulary = vocabulary
+        self.feature_deltas = feature_deltas
+        self._analyzer = None
+
+    @classmethod
+    def from_parts(cls, vectorizer, classifier) -> "CompiledBernoulliNB":
+        from .compact_vectorizer import CompactCountVectorizer
+
+        classes = getattr(classifier, "classes_", None)
+        if classes is None or len(classes) != 2:
+            raise ValueError("Chỉ biên dịch được BernoulliNB 2 lớp đã fit.")
+
+        feature_log_prob = np.asarray(classifier.feature_log_prob_, dtype=np.float64)
+        neg_prob = np.log(1 - np.exp(feature_log_prob))
+        token_weight = feature_log_prob - neg_prob
+        deltas = token_weight[1] - token_weight[0]
+        prior = np.asarray(classifier.class_log_prior_, dtype=np.float64)
+        baseline = float((prior[1] + neg_prob[1].sum()) - (prior[0] + neg_prob[0].sum()))
+
+        params = vectorizer.get_params()
+        params.pop("vocabulary", None)
+        if isinstance(vectorizer, CompactCountVectorizer):
+            # Dùng lại mảng hash/blob của vectorizer, không dựng dict token.
+            feature_deltas = np.ascontiguousarray(deltas, dtype=np.float64)
+            feature_deltas.flags.writeable = False
+            return cls(
+                analyzer_params=params,
+                token_deltas=None,
+                baseline=baseline,
+                classes=classes,
+                binary=bool(vectorizer.binary),
+                binarize=classifier.binarize,
+                vocabulary=vectorizer,
+                feature_deltas=feature_deltas,
+            )
+
+        token_deltas = {
+            str(token): float(deltas[index]) for token, index in vectorizer.vocabulary_.items()
+        }
+        return cls(
+            analyzer_params=params,
+            token_deltas=token_deltas,
+            baseline=baseline,
+            classes=classes,
+            binary=bool(vectorizer.binary),
+            binarize=classifier.binarize,
+        )
+
+    @classmethod
+    def from_pipeline(cls, pipeline) -> "CompiledBernoulliNB":
+        return cls.from_parts(pipeline.named_steps["vectorizer"], pipeline.named_steps["classifier"])
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_analyzer"] = None
+        return state
+
+    def __setstate__(self, state):
+        # Artifact cũ chỉ có `token_deltas`.
+        state.setdefault("vocabulary", None)
+        state.setdefault("feature_deltas", None)
+        self.__dict__.update(state)
+
+    def _get_analyzer(self):
+        if self._analyzer is None:
+            from sklearn.feature_extraction.text import CountVectorizer
+
+            self._analyzer = CountVectorizer(**self.analyzer_params).build_analyzer()
+        return self._analyzer
+
+    def _feature_value(self, count: int) -> float:
+        value = 1 if self.binary else count
+        if self.binarize is not None:
+            return 1.0 if value > self.binarize else 0.0
+        return float(value)
+
+    def decision_function(self, texts: Iterable[str] | str, preprocessed: bool = False):
+        """Log-odds lớp `classes_[1]` so với `classes_[0]`."""
+        items = EmbeddingLogisticPipeline._to_list(texts)
+        if not preprocessed:
+            items = preprocess_batch(items)
+        logits = np.full(len(items), self.baseline, dtype=np.float64)
+        if self.token_deltas is None:
+            return self._add_feature_deltas(items, logits)
+
+        analyzer = self._get_analyzer()
+        deltas = self.token_deltas
+        if self.binary:
+            # Feature nhị phân: chỉ cần tập token có mặt.
+            present = self._feature_value(1)
+            for row, item in enumerate(items):
+                tokens = set(analyzer(item))
+                logits[row] += present * sum(deltas.get(token, 0.0) for token in tokens)
+            return logits
+
+        for row, item in enumerate(items):
+            counts: dict[str, int] = {}
+            for token in analyzer(item):
+                if token in deltas:
+                    counts[token] = counts.get(token, 0) + 1
+            logits[row] += sum(
+                deltas[token] * self._feature_value(count) for token, count in counts.items()
+            )
+        return logits
+
+    def _add_feature_deltas(self, items: list[str], logits: np.ndarray) -> np.ndarray:
+        """Cộng delta theo mảng: mỗi token khác nhau của batch chỉ tra hash 1 lần."""
+        analyzer = self._get_analyzer()
+        local_ids: dict[str, int] = {}
+        token_ids: list[int] = []
+        doc_lengths: list[int] = []
+        for item in items:
+            ids = [local_ids.setdefault(token, len(local_ids)) for token in analyzer(item)]
+            if self.binary:
+                # Feature nhị phân: chỉ cần tập token có mặt.
+                ids = list(set(ids))
+            token_ids.extend(ids)
+            doc_lengths.append(len(ids))
+        if not token_ids:
+            return logits
+
+        features = self.vocabulary.lookup(list(local_ids))[np.asarray(token_ids, dtype=np.int64)]
+        rows = np.repeat(np.arange(len(items)), doc_lengths)
+        known = features >= 0
+        features, rows = features[known], rows[known]
+        # Đếm số lần xuất hiện của từng cặp (tin, feature).
+        keys, counts = np.unique(rows * len(self.feature_deltas) + features, return_counts=True)
+        rows, features = np.divmod(keys, len(self.feature_deltas))
+        values = np.ones(len(keys)) if self.binary else counts.astype(np.float64)
+        if self.binarize is not None:
+            values = (values > self.binarize).astype(np.float64)
+        logits += np.bincount(
+            rows, weights=self.feature_deltas[features] * values, minlength=len(items)
+        )
+        return logits
+
+    def predict_proba(self, texts: Iterable[str] | str, preprocessed: bool = False):
+        logits = self.decision_function(texts, preprocessed=preprocessed)
+        positive = np.exp(-np.logaddexp(0.0, -logits))
+        negative = np.exp(-np.logaddexp(0.0, logits))
+        return np.column_stack([negative, positive])
+
+    def predict(self, texts: Iterable[str] | str, preprocessed: bool = False):
+        logits = self.decision_function(texts, preprocessed=preprocessed)
+        return self.classes_[(logits > 0).astype(int)]
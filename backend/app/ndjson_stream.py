@@ -0,0 +1,170 @@
+"""Chấm điểm luồng NDJSON liên tục: đọc từng dòng, gom batch giới hạn, trả NDJSON."""
+
+from __future__ import annotations
+
+import json
+import queue
+import threading
+import time
+from typing import Any, BinaryIO, Iterator
+
+from .model_registry import ModelRegistry
+
+STREAM_BATCH_SIZE = 256
+STREAM_MAX_WAIT_MS = 50.0
+MAX_LINE_BYTES = 64 * 1024
+# Thời gian chờ giữa các lần kiểm tra client đã ngắt kết nối hay chưa.
+_POLL_SECONDS = 0.5
+
+_END = object()
+
+
+def parse_record(line: bytes, line_no: int) -> tuple[Any, str]:
+    """1 dòng NDJSON -> (id, text). Dòng là chuỗi JSON hoặc object có `text` (+ `id`)."""
+    record = json.loads(line)
+    if isinstance(record, str):
+        return line_no, record
+    if isinstance(record, dict) and isinstance(record.get("text"), str):
+        return record.get("id", line_no), record["text"]
+    raise ValueError("Mỗi dòng phải là chuỗi JSON hoặc object có trường `text` kiểu chuỗi.")
+
+
+def _read_records(
+    stream: BinaryIO,
+    items: queue.Queue,
+    stop: threading.Event,
+    max_line_bytes: int,
+) -> None:
+    """Thread đọc: đẩy từng bản ghi vào hàng đợi có giới hạn.
+
+    Hàng đợi đầy thì thread dừng đọc socket, TCP tự hãm tốc độ gửi của client.
+    """
+
+    def put(item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=_POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    line_no = 0
+    try:
+        while not stop.is_set():
+            line = stream.readline(max_line_bytes + 1)
+            if not line:
+                break
+            line_no += 1
+            if len(line) > max_line_bytes and not line.endswith(b"\n"):
+                # Bỏ phần còn lại của dòng quá dài rồi báo lỗi cho dòng đó.
+                while line and not line.endswith(b"\n"):
+                    line = stream.readline(max_line_bytes + 1)
+                item: Any = (line_no, None, f"Dòng vượt quá {max_line_bytes} byte.")
+            elif not line.strip():
+                continue
+            else:
+                try:
+                    record_id, text = parse_record(line, line_no)
+                    item = (record_id, text, None)
+                except ValueError as exc:
+                    item = (line_no, None, str(exc))
+            if not put(item):
+                return
+    except OSError as exc:  # client ngắt kết nối giữa chừng
+        put((line_no + 1, None, f"Lỗi đọc luồng: {exc}"))
+    finally:
+        put(_END)
+
+
+def _dump(record: dict[str, Any]) -> str:
+    return json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def _score_batch(
+    registry: ModelRegistry,
+    model_id: str,
+    batch: list[tuple[Any, str | None, str | None]],
+    threshold: float | None,
+) -> str:
+    lines = []
+    valid = [(record_id, text) for record_id, text, error in batch if error is None]
+    results: dict[int, dict[str, Any]] = {}
+    if valid:
+        try:
+            prediction = registry.predict_batch_columnar(
+                model_id, [text for _, text in valid], threshold
+            )
+        except (FileNotFoundError, ValueError) as exc:
+            prediction = None
+            batch = [(record_id, None, str(exc)) for record_id, _, _ in batch]
+        if prediction is not None:
+            labels = prediction.labels.tolist()
+            scores = prediction.scores.tolist() if prediction.scores is not None else None
+            stages = prediction.decided_by.tolist() if prediction.decided_by is not None else None
+            for row, (record_id, _) in enumerate(valid):
+                result = {
+                    "id": record_id,
+                    "label": labels[row],
+                    "score": scores[row] if scores is not None else None,
+                }
+                if stages is not None:
+                    result["decided_by"] = stages[row]
+                results[row] = result
+
+    row = 0
+    for record_id, _, error in batch:
+        if error is not None:
+            lines.append(_dump({"id": record_id, "error": error}))
+        else:
+            lines.append(_dump(results[row]))
+            row += 1
+    return "".join(lines)
+
+
+def stream_predictions(
+    registry: ModelRegistry,
+    model_id: str,
+    stream: BinaryIO,
+    threshold: float | None = None,
+    batch_size: int = STREAM_BATCH_SIZE,
+    max_wait_ms: float = STREAM_MAX_WAIT_MS,
+    max_line_bytes: int = MAX_LINE_BYTES,
+) -> Iterator[str]:
+    """Generator NDJSON kết quả theo đúng thứ tự dòng đầu vào.
+
+    Bộ nhớ giữ cố định: hàng đợi tối đa 2 batch, mỗi lần chỉ chấm 1 batch
+    (`batch_size` tin hoặc những gì đến trong `max_wait_ms`). Client đọc kết
+    quả chậm thì generator dừng ở `yield`, hàng đợi đầy và thread đọc dừng theo.
+    """
+    items: queue.Queue = queue.Queue(maxsize=2 * batch_size)
+    stop = threading.Event()
+    reader = threading.Thread(
+        target=_read_records,
+        args=(stream, items, stop, max_line_bytes),
+        name="ndjson-reader",
+        daemon=True,
+    )
+    reader.start()
+    max_wait = max(0.0, max_wait_ms) / 1000
+    finished = False
+    try:
+        while not finished:
+            first = items.get()
+            if first is _END:
+                break
+            batch = [first]
+            deadline = time.perf_counter() + max_wait
+            while len(batch) < batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = items.get(timeout=remaining) if remaining > 0 else items.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _END:
+                    finished = True
+                    break
+                batch.append(item)
+            yield _score_batch(registry, model_id, batch, threshold)
+    finally:
+        stop.set()
@@ -0,0 +1,17 @@
+"""Kiểm tra parity khi đóng gói: bản tối ưu phải cho xác suất như pipeline sklearn gốc."""
+
+from __future__ import annotations
+
+import numpy as np
+
+# Sai lệch xác suất tối đa cho phép giữa bản tối ưu và pipeline sklearn gốc.
+PARITY_ATOL = 1e-9
+
+
+def max_proba_difference(reference, candidate, texts: list[str]) -> float:
+    """Sai lệch tuyệt đối lớn nhất giữa 2 model trên `texts`."""
+    if not texts:
+        return 0.0
+    expected = np.asarray(reference.predict_proba(texts), dtype=np.float64)
+    actual = np.asarray(candidate.predict_proba(texts), dtype=np.float64)
+    return float(np.max(np.abs(expected - actual)))
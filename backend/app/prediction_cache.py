@@ -0,0 +1,111 @@
+"""Cache LRU có giới hạn cho kết quả dự đoán, khoá theo văn bản đã chuẩn hoá."""
+
+from __future__ import annotations
+
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any
+
+# Ước lượng chi phí 1 node OrderedDict + slot trong bảng băm (CPython 64-bit).
+_NODE_OVERHEAD_BYTES = 112
+
+CacheKey = tuple[str, bytes]
+
+
+class PredictionCache:
+    """Cache điểm thô (score) theo (model_id, hash văn bản đã `preprocess_sms`).
+
+    Giá trị lưu là điểm spam chưa áp ngưỡng (hoặc nhãn thô với model không có
+    `predict_proba`), nên đổi `threshold` vẫn áp dụng đúng khi cache hit.
+    """
+
+    def __init__(self, max_entries: int = 100_000, max_bytes: int | None = None):
+        if max_entries <= 0:
+            raise ValueError("`max_entries` phải lớn hơn 0.")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: OrderedDict[CacheKey, Any] = OrderedDict()
+        self._sizes: dict[CacheKey, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(model_id: str, normalized_text: str) -> CacheKey:
+        digest = hashlib.blake2b(normalized_text.encode("utf-8"), digest_size=16).digest()
+        return model_id, digest
+
+    @staticmethod
+    def _entry_size(key: CacheKey, value: Any) -> int:
+        return (
+            _NODE_OVERHEAD_BYTES
+            + sys.getsizeof(key)
+            + sys.getsizeof(key[1])
+            + sys.getsizeof(value)
+        )
+
+    def get(self, key: CacheKey) -> Any | None:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: CacheKey, value: Any) -> None:
+        if value is None:
+            return
+        size = self._entry_size(key, value)
+        with self._lock:
+            if key in self._data:
+                self._bytes -= self._sizes[key]
+            self._data[key] = value
+            self._data.move_to_end(key)
+            self._sizes[key] = size
+            self._bytes += size
+            self._evict_locked()
+
+    def _evict_locked(self) -> None:
+        while self._data and (
+            len(self._data) > self.max_entries
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            old_key, _ = self._data.popitem(last=False)
+            self._bytes -= self._sizes.pop(old_key)
+            self.evictions += 1
+
+    def invalidate(self, model_id: str | None = None) -> int:
+        """Xoá cache của 1 model (hoặc toàn bộ), trả về số entry đã xoá."""
+        with self._lock:
+            if model_id is None:
+                removed = len(self._data)
+                self._data.clear()
+                self._sizes.clear()
+                self._bytes = 0
+                return removed
+
+            stale = [key for key in self._data if key[0] == model_id]
+            for key in stale:
+                del self._data[key]
+                self._bytes -= self._sizes.pop(key)
+            return len(stale)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "approx_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
@@ -2,14 +2,12 @@
 
 from __future__ import annotations
 
+import argparse
 import json
 from pathlib import Path
 from typing import Any
 
 import joblib
-import torch
-from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import FunctionTransformer
 
 from .model_wrappers import EmbeddingLogisticPipeline
 from .text_preprocess import preprocess_batch
@@ -21,6 +19,8 @@ def _load_joblib(path: Path) -> Any:
 
 def _load_sentence_model_cpu(path: Path):
     """Load sentence model đã lưu từ máy CUDA nhưng chạy trên CPU."""
+    import torch
+
     original_torch_load = torch.load
 
     def cpu_load(*args, **kwargs):
@@ -38,7 +38,53 @@ def _load_sentence_model_cpu(path: Path):
     return model
 
 
-def build_deploy_models(base_dir: Path | None = None) -> dict[str, Path]:
+ARTIFACT_FORMATS = ("joblib", "mmap")
+
+
+def dump_artifact(model: Any, output_path: Path, artifact_format: str = "joblib") -> Path:
+    """Ghi artifact inference.
+
+    - `joblib`: nén `compress=3`, nhỏ trên đĩa nhưng mỗi process giải nén 1 bản riêng.
+    - `mmap`: không nén để `joblib.load(mmap_mode="r")` map thẳng các mảng numpy;
+      embedder (torch) ghi riêng `<tên>.embedder.pt` để `torch.load(mmap=True)`.
+      Các worker đọc chung page cache thay vì giữ bản sao riêng.
+    """
+    if artifact_format not in ARTIFACT_FORMATS:
+        raise ValueError(f"Định dạng artifact không hỗ trợ: {artifact_format}")
+    if artifact_format == "joblib":
+        if isinstance(model, EmbeddingLogisticPipeline):
+            model.embedder_file = None
+        joblib.dump(model, output_path, compress=3)
+        return output_path
+
+    if isinstance(model, EmbeddingLogisticPipeline) and model.embedder is not None:
+        import torch
+
+        embedder_path = output_path.with_name(f"{output_path.stem}.embedder.pt")
+        torch.save(model.embedder, embedder_path)
+        model.embedder_file = embedder_path.name
+    joblib.dump(model, output_path)
+    return output_path
+
+
+DEPLOY_MODEL_IDS = ("bnb_binary", "lr_embedding")
+
+
+def build_deploy_models(
+    base_dir: Path | None = None,
+    artifact_format: str = "joblib",
+    model_ids: list[str] | None = None,
+) -> dict[str, Path]:
+    """Đóng gói pipeline inference; `model_ids` giới hạn model cần đóng gói (mặc định cả 2).
+
+    Chỉ `lr_embedding` cần torch/sentence-transformers, nên node chỉ phục vụ
+    `bnb_binary` không phải import chúng.
+    """
+    targets = list(model_ids or DEPLOY_MODEL_IDS)
+    unknown = [model_id for model_id in targets if model_id not in DEPLOY_MODEL_IDS]
+    if unknown:
+        raise ValueError(f"Không có cách đóng gói model: {', '.join(unknown)}")
+
     root = (base_dir or Path(__file__).resolve().parents[2]).resolve()
     models_dir = root / "models"
     models_dir.mkdir(parents=True, exist_ok=True)
@@ -48,32 +94,37 @@ def build_deploy_models(base_dir: Path | None = None) -> dict[str, Path]:
     lr_path = models_dir / "lr_embedding.joblib"
     embed_path = models_dir / "sentence_transformer_embed_model.joblib"
 
-    bnb_model = _load_joblib(bnb_path)
-    vec_model = _load_joblib(vec_path)
-
-    bnb_pipeline = Pipeline(
-        steps=[
-            ("preprocess", FunctionTransformer(preprocess_batch, validate=False)),
-            ("vectorizer", vec_model),
-            ("classifier", bnb_model),
-        ]
-    )
-    bnb_pipeline_path = models_dir / "bnb_binary_pipeline.joblib"
-    joblib.dump(bnb_pipeline, bnb_pipeline_path, compress=3)
-
-    lr_model = _load_joblib(lr_path)
-    embed_model = _load_sentence_model_cpu(embed_path)
-    lr_pipeline = EmbeddingLogisticPipeline(embedder=embed_model, classifier=lr_model)
-    lr_pipeline_path = models_dir / "lr_embedding_pipeline.joblib"
-    joblib.dump(lr_pipeline, lr_pipeline_path, compress=3)
-
-    return {
-        "bnb_binary_pipeline": bnb_pipeline_path,
-        "lr_embedding_pipeline": lr_pipeline_path,
-    }
-
-
-def write_default_registry(base_dir: Path | None = None) -> Path:
+    output: dict[str, Path] = {}
+    if "bnb_binary" in targets:
+        from sklearn.pipeline import Pipeline
+        from sklearn.preprocessing import FunctionTransformer
+
+        bnb_model = _load_joblib(bnb_path)
+        vec_model = _load_joblib(vec_path)
+
+        bnb_pipeline = Pipeline(
+            steps=[
+                ("preprocess", FunctionTransformer(preprocess_batch, validate=False)),
+                ("vectorizer", vec_model),
+                ("classifier", bnb_model),
+            ]
+        )
+        bnb_pipeline_path = models_dir / "bnb_binary_pipeline.joblib"
+        dump_artifact(bnb_pipeline, bnb_pipeline_path, artifact_format)
+        output["bnb_binary_pipeline"] = bnb_pipeline_path
+
+    if "lr_embedding" in targets:
+        lr_model = _load_joblib(lr_path)
+        embed_model = _load_sentence_model_cpu(embed_path)
+        lr_pipeline = EmbeddingLogisticPipeline(embedder=embed_model, classifier=lr_model)
+        lr_pipeline_path = models_dir / "lr_embedding_pipeline.joblib"
+        dump_artifact(lr_pipeline, lr_pipeline_path, artifact_format)
+        output["lr_embedding_pipeline"] = lr_pipeline_path
+
+    return output
+
+
+def write_default_registry(base_dir: Path | None = None, load_mode: str = "joblib") -> Path:
     root = (base_dir or Path(__file__).resolve().parents[2]).resolve()
     registry_path = root / "models_registry.json"
     registry = [
@@ -84,6 +135,7 @@ def write_default_registry(base_dir: Path | None = None) -> Path:
             "has_proba": True,
             "default_threshold": 0.5,
             "pos_label": "spam",
+            "load_mode": load_mode,
         },
         {
             "model_id": "lr_embedding",
@@ -92,6 +144,16 @@ def write_default_registry(base_dir: Path | None = None) -> Path:
             "has_proba": True,
             "default_threshold": 0.5,
             "pos_label": "spam",
+            "load_mode": load_mode,
+        },
+        {
+            "model_id": "cascade_bnb_lr",
+            "display_name": "Cascade: BernoulliNB -> LR Embedding (tin không chắc chắn)",
+            "type": "cascade",
+            "cascade": {"stages": ["bnb_binary", "lr_embedding"], "band": [0.1, 0.9]},
+            "has_proba": True,
+            "default_threshold": 0.5,
+            "pos_label": "spam",
         },
     ]
     registry_path.write_text(
@@ -102,8 +164,18 @@ def write_default_registry(base_dir: Path | None = None) -> Path:
 
 
 def main() -> None:
-    output = build_deploy_models()
-    registry_path = write_default_registry()
+    parser = argparse.ArgumentParser(description="Đóng gói lại model inference.")
+    parser.add_argument(
+        "--format",
+        dest="artifact_format",
+        choices=ARTIFACT_FORMATS,
+        default="joblib",
+        help="joblib (nén) hoặc mmap (không nén, map bộ nhớ dùng chung giữa worker)",
+    )
+    args = parser.parse_args()
+
+    output = build_deploy_models(artifact_format=args.artifact_format)
+    registry_path = write_default_registry(load_mode=args.artifact_format)
     print("Đã đóng gói model inference:")
     for name, path in output.items():
         print(f"- {name}: {path}")
@@ -0,0 +1,281 @@
+"""Kho kết quả batch theo nội dung: CSV nén gzip, khoá = hash(file, đuôi, model, ngưỡng, cột)."""
+
+from __future__ import annotations
+
+import contextlib
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator
+
+import numpy as np
+
+RESULT_SUFFIX = ".csv.gz"
+SCORES_SUFFIX = ".scores.f8"
+DEFAULT_TTL_SECONDS = 3 * 24 * 3600
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+_READ_BLOCK_BYTES = 1024 * 1024
+
+
+@dataclass(slots=True)
+class StoredResult:
+    result_id: str
+    download_name: str
+    created_at: float
+    size_bytes: int
+    payload: dict[str, Any]
+    # Thành phần khoá (digest file, phiên bản model, cột) để dựng khoá cho ngưỡng khác.
+    key_parts: dict[str, Any] | None = None
+    score_columns: list[str] | None = None
+
+    @property
+    def download_url(self) -> str:
+        return f"/download/{self.result_id}.csv"
+
+
+def digest_bytes(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def digest_stream(stream: BinaryIO) -> str:
+    """sha256 của stream seek được, đọc theo khối rồi quay về vị trí ban đầu."""
+    start = stream.tell()
+    digest = hashlib.sha256()
+    for block in iter(lambda: stream.read(_READ_BLOCK_BYTES), b""):
+        digest.update(block)
+    stream.seek(start)
+    return digest.hexdigest()
+
+
+class ResultStore:
+    """Kết quả nằm ở `<result_id>.csv.gz` + metadata `<result_id>.json` trong `root`.
+
+    Upload lặp lại (cùng nội dung + đuôi file, model, ngưỡng, cột văn bản) trả ngay kết
+    quả cũ. Entry quá `ttl_seconds` hoặc khi tổng dung lượng vượt `max_bytes` bị
+    xoá, ít được dùng gần đây nhất trước (thời điểm dùng = mtime file metadata).
+    Ghi file tạm rồi `os.replace` nên nhiều worker dùng chung thư mục an toàn.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        if ttl_seconds <= 0 or max_bytes <= 0:
+            raise ValueError("`ttl_seconds` và `max_bytes` phải lớn hơn 0.")
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(
+        content_digest: str,
+        model_versions: dict[str, str],
+        threshold: float | None,
+        text_column: str | None,
+        extension: str | None = None,
+    ) -> str:
+        """`model_versions`: model_id -> `ModelRegistry.model_version` (thứ tự cột giữ nguyên).
+
+        `extension` (đuôi file đã chuẩn hoá) quyết định cách parse: cùng bytes gửi dạng
+        .txt và .csv cho ra danh sách tin khác nhau nên phải khác khoá.
+        """
+        material = json.dumps(
+            [content_digest, list(model_versions.items()), threshold, text_column, extension],
+            ensure_ascii=False,
+        )
+        return hashlib.blake2b(material.encode("utf-8"), digest_size=16).hexdigest()
+
+    @staticmethod
+    def key_parts(
+        content_digest: str,
+        model_versions: dict[str, str],
+        text_column: str | None,
+        extension: str,
+    ) -> dict[str, Any]:
+        return {
+            "content_digest": content_digest,
+            "model_versions": model_versions,
+            "text_column": text_column,
+            "extension": extension,
+        }
+
+    @classmethod
+    def make_key_from_parts(cls, parts: dict[str, Any], threshold: float | None) -> str:
+        return cls.make_key(
+            parts["content_digest"],
+            parts["model_versions"],
+            threshold,
+            parts["text_column"],
+            parts.get("extension"),
+        )
+
+    def data_path(self, result_id: str) -> Path:
+        return self.root / f"{result_id}{RESULT_SUFFIX}"
+
+    def scores_path(self, result_id: str) -> Path:
+        return self.root / f"{result_id}{SCORES_SUFFIX}"
+
+    def _meta_path(self, result_id: str) -> Path:
+        return self.root / f"{result_id}.json"
+
+    def temp_paths(self, result_id: str) -> tuple[Path, Path]:
+        """(CSV, ma trận điểm) tạm để ghi trước khi `put` (đuôi .gz => batch_writer ghi nén)."""
+        token = uuid.uuid4().hex
+        return (
+            self.root / f"{result_id}.{token}.tmp.gz",
+            self.root / f"{result_id}.{token}.tmp.f8",
+        )
+
+    def _load(self, result_id: str) -> StoredResult | None:
+        try:
+            raw = json.loads(self._meta_path(result_id).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        return StoredResult(**raw)
+
+    def _remove(self, result_id: str) -> None:
+        self._meta_path(result_id).unlink(missing_ok=True)
+        self.data_path(result_id).unlink(missing_ok=True)
+        self.scores_path(result_id).unlink(missing_ok=True)
+
+    def _size(self, result_id: str) -> int:
+        size = self.data_path(result_id).stat().st_size
+        with contextlib.suppress(FileNotFoundError):
+            size += self.scores_path(result_id).stat().st_size
+        return size
+
+    def get(self, result_id: str, touch: bool = True) -> StoredResult | None:
+        """Entry còn hạn (None nếu chưa có/đã hết hạn); `touch` cập nhật thời điểm dùng."""
+        entry = self._load(result_id)
+        if entry is None or not self.data_path(result_id).exists():
+            return None
+        if time.time() - entry.created_at > self.ttl_seconds:
+            with self._lock:
+                self._remove(result_id)
+                self.evictions += 1
+            return None
+        if touch:
+            os.utime(self._meta_path(result_id))
+        return entry
+
+    def lookup(self, result_id: str) -> StoredResult | None:
+        """Như `get` nhưng có đếm hit/miss (dùng khi kiểm tra trước lúc chấm điểm)."""
+        entry = self.get(result_id)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def put(
+        self,
+        result_id: str,
+        temp_path: Path,
+        download_name: str,
+        payload: dict[str, Any],
+        key_parts: dict[str, Any] | None = None,
+        scores_temp_path: Path | None = None,
+        score_columns: list[str] | None = None,
+    ) -> StoredResult:
+        """Chuyển file tạm vào kho, ghi metadata rồi dọn theo TTL/dung lượng.
+
+        `scores_temp_path`: ma trận điểm float64 (dòng x `score_columns`) để đổi ngưỡng sau.
+        """
+        size = temp_path.stat().st_size
+        if scores_temp_path is not None:
+            size += scores_temp_path.stat().st_size
+            os.replace(scores_temp_path, self.scores_path(result_id))
+        entry = StoredResult(
+            result_id=result_id,
+            download_name=download_name,
+            created_at=time.time(),
+            size_bytes=size,
+            payload=payload,
+            key_parts=key_parts,
+            score_columns=score_columns if scores_temp_path is not None else None,
+        )
+        os.replace(temp_path, self.data_path(result_id))
+        meta_temp = self.root / f"{result_id}.{uuid.uuid4().hex}.tmp.json"
+        meta_temp.write_text(json.dumps(asdict(entry), ensure_ascii=False), encoding="utf-8")
+        os.replace(meta_temp, self._meta_path(result_id))
+        self.evict()
+        return entry
+
+    def evict(self) -> int:
+        """Xoá entry hết hạn, rồi entry lâu không dùng tới khi tổng dung lượng <= `max_bytes`."""
+        now = time.time()
+        removed = 0
+        with self._lock:
+            live: list[tuple[float, int, str]] = []
+            for meta_path in self.root.glob("*.json"):
+                if meta_path.name.endswith(".tmp.json"):
+                    continue
+                result_id = meta_path.stem
+                entry = self._load(result_id)
+                try:
+                    used_at = meta_path.stat().st_mtime
+                    size = self._size(result_id)
+                except FileNotFoundError:  # process khác vừa xoá/chưa ghi xong
+                    entry = None
+                if entry is None or now - entry.created_at > self.ttl_seconds:
+                    self._remove(result_id)
+                    removed += 1
+                    continue
+                live.append((used_at, size, result_id))
+
+            total = sum(size for _, size, _ in live)
+            for _, size, result_id in sorted(live):
+                if total <= self.max_bytes:
+                    break
+                self._remove(result_id)
+                total -= size
+                removed += 1
+            self.evictions += removed
+
+            # File tạm mồ côi (process bị kill giữa lúc ghi).
+            for temp_path in self.root.glob("*.tmp.*"):
+                with contextlib.suppress(FileNotFoundError):
+                    if now - temp_path.stat().st_mtime > self.ttl_seconds:
+                        temp_path.unlink()
+        return removed
+
+    def load_scores(self, entry: StoredResult) -> np.ndarray:
+        """Ma trận điểm (dòng x model) chỉ đọc qua memmap; NaN = model không có điểm."""
+        if not entry.score_columns or not self.scores_path(entry.result_id).exists():
+            raise ValueError("Kết quả này không lưu điểm, không đổi ngưỡng được.")
+        scores = np.memmap(self.scores_path(entry.result_id), dtype=np.float64, mode="r")
+        return scores.reshape(-1, len(entry.score_columns))
+
+    def iter_csv(self, result_id: str) -> Iterator[bytes]:
+        """Nội dung CSV đã giải nén, theo từng khối (cho client không nhận gzip)."""
+        with gzip.open(self.data_path(result_id), "rb") as handle:
+            yield from iter(lambda: handle.read(_READ_BLOCK_BYTES), b"")
+
+    def stats(self) -> dict[str, Any]:
+        entries = list(self.root.glob(f"*{RESULT_SUFFIX}"))
+        scores = list(self.root.glob(f"*{SCORES_SUFFIX}"))
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(entries),
+            "bytes": sum(path.stat().st_size for path in entries + scores if path.exists()),
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,108 @@
+"""Đổi ngưỡng kết quả batch đã lưu bằng ma trận điểm, không chạy lại model."""
+
+from __future__ import annotations
+
+import csv
+import gzip
+import os
+from itertools import islice
+from pathlib import Path
+from typing import Any, Sequence
+
+import numpy as np
+
+from .batch_writer import BatchFileSummary, open_result_csv
+
+DEFAULT_THRESHOLDS = tuple(round(0.05 * step, 2) for step in range(1, 20))
+RELABEL_CHUNK_ROWS = 5000
+
+
+def spam_counts(scores: np.ndarray, thresholds: Sequence[float]) -> list[int]:
+    """Số tin spam (`score >= t`) cho từng ngưỡng: sắp xếp 1 lần rồi `searchsorted`."""
+    ordered = np.sort(scores[~np.isnan(scores)])
+    positions = np.searchsorted(ordered, np.asarray(thresholds, dtype=np.float64), side="left")
+    return (len(ordered) - positions).tolist()
+
+
+def _relabel_result(result: dict[str, Any], threshold: float) -> dict[str, Any]:
+    result = dict(result)
+    if result.get("score") is not None:
+        result["label"] = "spam" if result["score"] >= threshold else "ham"
+    result["threshold_used"] = threshold
+    return result
+
+
+def relabel_preview(preview: list[dict[str, Any]], threshold: float) -> list[dict[str, Any]]:
+    """Preview 1 model (`label`/`score`) hoặc nhiều model (`predictions`, `disagree`)."""
+    rows = []
+    for row in preview:
+        if "predictions" in row:
+            predictions = {
+                model_id: _relabel_result(result, threshold)
+                for model_id, result in row["predictions"].items()
+            }
+            labels = {result["label"] for result in predictions.values()}
+            rows.append({**row, "predictions": predictions, "disagree": len(labels) > 1})
+        else:
+            rows.append(_relabel_result(row, threshold))
+    return rows
+
+
+def relabel_csv(
+    source_path: Path,
+    scores: np.ndarray,
+    model_ids: list[str],
+    threshold: float,
+    output_path: Path,
+    chunk_rows: int = RELABEL_CHUNK_ROWS,
+) -> BatchFileSummary:
+    """Ghi lại CSV kết quả (gzip) với nhãn theo `threshold`; văn bản, điểm giữ nguyên.
+
+    Nhãn tính theo từng khối `chunk_rows` dòng trên ma trận điểm (dòng x model);
+    dòng có điểm NaN (model không có `predict_proba`) giữ nhãn cũ.
+    """
+    multi = len(model_ids) > 1
+    summary = BatchFileSummary()
+    try:
+        with (
+            gzip.open(source_path, "rt", encoding="utf-8-sig", newline="") as source,
+            open_result_csv(output_path) as handle,
+        ):
+            reader = csv.reader(source)
+            writer = csv.writer(handle, lineterminator=os.linesep)
+            header = next(reader)
+            writer.writerow(header)
+            if multi:
+                label_columns = [header.index(f"label_{model_id}") for model_id in model_ids]
+                threshold_column = None
+                disagree_column = header.index("disagree")
+            else:
+                label_columns = [header.index("label")]
+                threshold_column = header.index("threshold_used")
+                disagree_column = None
+
+            while block := list(islice(reader, chunk_rows)):
+                start = summary.total_rows
+                block_scores = scores[start : start + len(block)]
+                if len(block_scores) != len(block):
+                    raise ValueError("Ma trận điểm không khớp số dòng của kết quả.")
+                has_score = ~np.isnan(block_scores)
+                is_spam = block_scores >= threshold
+                for offset, row in enumerate(block):
+                    for column, label_column in enumerate(label_columns):
+                        if has_score[offset, column]:
+                            row[label_column] = "spam" if is_spam[offset, column] else "ham"
+                    if threshold_column is not None:
+                        row[threshold_column] = threshold
+                    if disagree_column is not None:
+                        disagree = len({row[column] for column in label_columns}) > 1
+                        row[disagree_column] = int(disagree)
+                        summary.disagreement_rows += disagree
+                writer.writerows(block)
+                summary.total_rows += len(block)
+        if summary.total_rows != len(scores):
+            raise ValueError("Ma trận điểm không khớp số dòng của kết quả.")
+    except BaseException:
+        output_path.unlink(missing_ok=True)
+        raise
+    return summary
@@ -0,0 +1,151 @@
+"""Chạy Flask app bằng nhiều process fork từ 1 process cha đã nạp model (POSIX)."""
+
+from __future__ import annotations
+
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Callable
+
+# Worker chết quá nhiều lần trong cửa sổ này thì chờ trước khi fork lại (tránh vòng crash).
+RESTART_WINDOW_SECONDS = 10.0
+MAX_RESTARTS_IN_WINDOW = 5
+# Chu kỳ process cha kiểm tra worker khi có slot đang chờ fork lại.
+SUPERVISOR_POLL_SECONDS = 0.2
+
+
+def limit_threads(num_threads: int) -> None:
+    """Giới hạn số thread intra-op của torch và BLAS/OpenMP trong process hiện tại.
+
+    Pool BLAS/OpenMP chỉ đọc biến môi trường lúc thư viện được nạp, nên thư viện đã
+    nạp rồi được giới hạn qua `threadpoolctl`; biến môi trường áp dụng cho thư viện
+    nạp sau đó.
+    """
+    from threadpoolctl import threadpool_limits
+
+    for name in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[name] = str(num_threads)
+    threadpool_limits(limits=num_threads)
+    if "torch" in sys.modules:
+        torch = sys.modules["torch"]
+        torch.set_num_threads(num_threads)
+
+
+def _serve_worker(app, listener: socket.socket, worker_index: int, threads: int, on_start) -> None:
+    from werkzeug.serving import make_server
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    limit_threads(threads)
+    if on_start is not None:
+        on_start(worker_index)
+    host, port = listener.getsockname()[:2]
+    server = make_server(host, port, app, threaded=True, fd=listener.fileno())
+    server.serve_forever()
+
+
+def serve_prefork(
+    app,
+    host: str,
+    port: int,
+    workers: int,
+    threads_per_worker: int,
+    on_worker_start: Callable[[int], None] | None = None,
+) -> None:
+    """Mở socket ở process cha rồi fork `workers` process cùng accept trên socket đó.
+
+    Mọi thứ nạp trước khi gọi hàm này (registry, model) được chia sẻ copy-on-write;
+    `gc.freeze()` tránh GC chạm vào object cũ làm nhân bản trang nhớ. Process cha
+    chỉ giám sát: worker nào chết sẽ được fork lại với cùng `worker_index`; slot chết
+    quá `MAX_RESTARTS_IN_WINDOW` lần trong cửa sổ thì hẹn giờ fork lại, các slot khác
+    vẫn được giám sát bình thường.
+    """
+    if not hasattr(os, "fork"):
+        raise RuntimeError("--workers chỉ hỗ trợ hệ điều hành có fork (Linux/macOS).")
+
+    listener = socket.create_server((host, port), reuse_port=False, backlog=2048)
+    listener.set_inheritable(True)
+    gc.freeze()
+
+    children: dict[int, int] = {}
+    restarts: dict[int, list[float]] = {index: [] for index in range(workers)}
+    # worker_index -> thời điểm (monotonic) được phép fork lại.
+    next_restart: dict[int, float] = {}
+    stopping = False
+
+    def spawn(worker_index: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                _serve_worker(app, listener, worker_index, threads_per_worker, on_worker_start)
+            except KeyboardInterrupt:
+                pass
+            except BaseException:
+                import traceback
+
+                traceback.print_exc()
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        children[pid] = worker_index
+        print(f"Worker {worker_index} chạy với pid {pid} ({threads_per_worker} thread).")
+
+    def stop(signum, _frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for index in range(workers):
+        spawn(index)
+
+    while children or (next_restart and not stopping):
+        if next_restart and not stopping:
+            now = time.monotonic()
+            for worker_index, due in list(next_restart.items()):
+                if due <= now:
+                    del next_restart[worker_index]
+                    restarts[worker_index].append(now)
+                    spawn(worker_index)
+        try:
+            if next_restart and not stopping:
+                pid, status = os.waitpid(-1, os.WNOHANG) if children else (0, 0)
+                if pid == 0:
+                    remaining = min(next_restart.values()) - time.monotonic()
+                    time.sleep(min(SUPERVISOR_POLL_SECONDS, max(remaining, 0.0)))
+                    continue
+            else:
+                pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        worker_index = children.pop(pid, None)
+        if worker_index is None or stopping:
+            continue
+
+        now = time.monotonic()
+        recent = [t for t in restarts[worker_index] if now - t < RESTART_WINDOW_SECONDS]
+        if len(recent) >= MAX_RESTARTS_IN_WINDOW:
+            print(
+                f"Worker {worker_index} (pid {pid}) đã dừng, mã {status}; "
+                f"khởi động lại sau {RESTART_WINDOW_SECONDS:g}s."
+            )
+            restarts[worker_index] = recent
+            next_restart[worker_index] = now + RESTART_WINDOW_SECONDS
+            continue
+        print(f"Worker {worker_index} (pid {pid}) đã dừng, mã {status}; khởi động lại.")
+        restarts[worker_index] = [*recent, now]
+        spawn(worker_index)
+
+    listener.close()
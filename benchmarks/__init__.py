@@ -0,0 +1 @@
+"""Bộ đo hiệu năng inference cho SpamHam."""
@@ -0,0 +1,90 @@
+"""So sánh thời gian nạp + RSS giữa artifact joblib nén và artifact mmap.
+
+Mỗi artifact được nạp trong 1 process mới để số liệu không lẫn nhau.
+Chạy (sau khi đóng gói 2 định dạng ra 2 thư mục/tên khác nhau):
+  python -m benchmarks.bench_artifacts models/lr_embedding_pipeline.joblib:joblib \\
+      models_mmap/lr_embedding_pipeline.joblib:mmap
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from benchmarks.corpus import ROOT_DIR
+
+
+def _memory_kb() -> dict[str, int]:
+    """RSS hiện tại, phần dùng chung/riêng (Linux) và đỉnh RSS của process."""
+    usage = {"max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+    rollup = Path("/proc/self/smaps_rollup")
+    if rollup.exists():
+        fields = {}
+        for line in rollup.read_text().splitlines()[1:]:
+            name, _, value = line.partition(":")
+            fields[name.strip()] = int(value.split()[0])
+        usage["rss_kb"] = fields.get("Rss", 0)
+        usage["shared_kb"] = fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0)
+        usage["private_kb"] = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    return usage
+
+
+def probe(path: Path, load_mode: str) -> dict:
+    import joblib
+
+    started = time.perf_counter()
+    model = joblib.load(path, mmap_mode="r") if load_mode == "mmap" else joblib.load(path)
+    if hasattr(model, "restore_embedder"):
+        model.restore_embedder(path.parent)
+    load_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    model.predict_proba(["Xin chào, hẹn bạn 8h tối nay nhé."])
+    first_predict_ms = (time.perf_counter() - started) * 1000
+    return {
+        "artifact": str(path),
+        "load_mode": load_mode,
+        "load_seconds": round(load_seconds, 4),
+        "first_predict_ms": round(first_predict_ms, 3),
+        **_memory_kb(),
+    }
+
+
+def run_isolated(path: Path, load_mode: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_artifacts", "--probe", str(path), load_mode],
+        cwd=ROOT_DIR,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark nạp artifact joblib vs mmap.")
+    parser.add_argument("artifacts", nargs="*", help="Dạng <đường dẫn>:<joblib|mmap>")
+    parser.add_argument("--probe", nargs=2, metavar=("PATH", "LOAD_MODE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe:
+        print(json.dumps(probe(Path(args.probe[0]), args.probe[1])))
+        return
+
+    if not args.artifacts:
+        parser.error("Cần ít nhất 1 artifact dạng <đường dẫn>:<joblib|mmap>.")
+    for spec in args.artifacts:
+        path, _, load_mode = spec.rpartition(":")
+        if load_mode not in ("joblib", "mmap"):
+            path, load_mode = spec, "joblib"
+        result = run_isolated(Path(path).resolve(), load_mode)
+        print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
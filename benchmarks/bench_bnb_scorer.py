@@ -0,0 +1,62 @@
+"""So khớp và đo tốc độ scorer BernoulliNB biên dịch so với pipeline sklearn.
+
+Không truyền `--pipeline` thì fit 1 pipeline BernoulliNB trên corpus tổng hợp (không cần
+artifact Git LFS). Sai lệch xác suất vượt `PARITY_ATOL` => thoát với lỗi.
+Chạy:
+  python -m benchmarks.bench_bnb_scorer
+  python -m benchmarks.bench_bnb_scorer --pipeline models/bnb_binary_pipeline.joblib
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+
+import joblib
+
+from backend.app.model_wrappers import CompiledBernoulliNB
+from backend.app.parity import PARITY_ATOL, max_proba_difference
+from benchmarks.corpus import generate_corpus, synthetic_bnb_pipeline
+
+
+def _per_message_us(model, texts: list[str]) -> float:
+    start = time.perf_counter()
+    for text in texts:
+        model.predict_proba([text])
+    return (time.perf_counter() - start) / len(texts) * 1e6
+
+
+def _batch_rows_per_second(model, texts: list[str]) -> float:
+    start = time.perf_counter()
+    model.predict_proba(texts)
+    return len(texts) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark scorer BNB biên dịch vs sklearn.")
+    parser.add_argument(
+        "--pipeline",
+        default=None,
+        help="Pipeline sklearn preprocess -> vectorizer -> BernoulliNB (bỏ trống: tự fit)",
+    )
+    parser.add_argument("--size", type=int, default=20_000, help="Số tin nhắn tổng hợp")
+    args = parser.parse_args()
+
+    pipeline = joblib.load(Path(args.pipeline)) if args.pipeline else synthetic_bnb_pipeline()
+    scorer = CompiledBernoulliNB.from_pipeline(pipeline)
+    corpus = generate_corpus(args.size)
+
+    diff = max_proba_difference(pipeline, scorer, corpus)
+    print(f"Sai lệch xác suất tối đa: {diff:.2e}")
+    if diff > PARITY_ATOL:
+        raise SystemExit(f"Scorer biên dịch lệch pipeline sklearn: {diff:.3e} > {PARITY_ATOL}")
+    single = corpus[:2000]
+    print(f"- sklearn / 1 tin:   {_per_message_us(pipeline, single):,.1f} µs")
+    print(f"- biên dịch / 1 tin: {_per_message_us(scorer, single):,.1f} µs")
+    print(f"- sklearn batch:     {_batch_rows_per_second(pipeline, corpus):,.0f} tin/s")
+    print(f"- biên dịch batch:   {_batch_rows_per_second(scorer, corpus):,.0f} tin/s")
+
+
+if __name__ == "__main__":
+    main()
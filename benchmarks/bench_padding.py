@@ -0,0 +1,124 @@
+"""Đo lượng token padding khi encode theo thứ tự đến vs theo lô sắp theo độ dài.
+
+Không có `--pipeline`: đếm token bằng cách tách khoảng trắng (+2 token đặc biệt).
+Có `--pipeline`: dùng tokenizer của embedder và đo thêm thời gian encode thật: từng lô
+theo thứ tự đến vs 1 lần `encode` cả file (sentence-transformers tự sắp theo độ dài).
+Chạy:
+  python -m benchmarks.bench_padding --size 5000
+  python -m benchmarks.bench_padding --pipeline models/lr_embedding_pipeline.joblib
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from pathlib import Path
+from typing import Callable
+
+from backend.app.text_preprocess import preprocess_batch
+from benchmarks.corpus import generate_corpus
+
+# Giới hạn đếm token khi không có `--max-seq-length` lẫn embedder (độ dài tối đa của BERT).
+FALLBACK_MAX_TOKENS = 512
+
+
+def mixed_length_corpus(size: int, long_ratio: float, seed: int = 13) -> list[str]:
+    """Corpus trộn tin ngắn với tin dài (ghép 4-8 tin) như file SMS thực tế."""
+    rng = random.Random(seed)
+    base = generate_corpus(size, seed=seed)
+    corpus = []
+    for text in base:
+        if rng.random() < long_ratio:
+            text = " ".join([text, *rng.sample(base, rng.randint(3, 7))])
+        corpus.append(text)
+    return corpus
+
+
+def padded_tokens(lengths: list[int], batch_size: int) -> tuple[int, int]:
+    """(token thật, token sau padding) khi mỗi lô được pad tới tin dài nhất."""
+    real = sum(lengths)
+    padded = 0
+    for start in range(0, len(lengths), batch_size):
+        batch = lengths[start : start + batch_size]
+        padded += max(batch) * len(batch)
+    return real, padded
+
+
+def _token_counter(pipeline, max_seq_length: int | None) -> Callable[[str], int]:
+    embedder = getattr(pipeline, "embedder", None)
+    max_seq_length = (
+        max_seq_length or getattr(embedder, "max_seq_length", None) or FALLBACK_MAX_TOKENS
+    )
+    tokenizer = getattr(embedder, "tokenizer", None)
+    if tokenizer is None:
+        return lambda text: min(len(text.split()) + 2, max_seq_length)
+    return lambda text: len(
+        tokenizer(text, truncation=True, max_length=max_seq_length)["input_ids"]
+    )
+
+
+def _time_arrival_order(pipeline, items: list[str]) -> float:
+    """Encode từng lô theo thứ tự đến (mỗi lô 1 lần gọi, không sắp xếp chéo lô)."""
+    started = time.perf_counter()
+    for start in range(0, len(items), pipeline.batch_size):
+        pipeline.embedder.encode(
+            items[start : start + pipeline.batch_size],
+            batch_size=pipeline.batch_size,
+            show_progress_bar=False,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        )
+    return time.perf_counter() - started
+
+
+def _time_single_call(pipeline, items: list[str]) -> float:
+    """1 lần `encode` cả danh sách: sentence-transformers sắp theo độ dài trước khi chia lô."""
+    started = time.perf_counter()
+    pipeline._embed(items)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark padding của encode theo độ dài.")
+    parser.add_argument("--pipeline", help="Artifact EmbeddingLogisticPipeline (tuỳ chọn)")
+    parser.add_argument("--size", type=int, default=5000, help="Số tin nhắn tổng hợp")
+    parser.add_argument("--long-ratio", type=float, default=0.15, help="Tỉ lệ tin dài")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument(
+        "--max-seq-length",
+        type=int,
+        default=None,
+        help="Cắt tin ở số token này (mặc định: giữ độ dài tối đa của embedder)",
+    )
+    args = parser.parse_args()
+
+    pipeline = None
+    if args.pipeline:
+        import joblib
+
+        pipeline = joblib.load(Path(args.pipeline))
+        if hasattr(pipeline, "restore_embedder"):
+            pipeline.restore_embedder(Path(args.pipeline).parent)
+        pipeline.configure_encoder(
+            batch_size=args.batch_size,
+            max_seq_length=args.max_seq_length,
+        )
+
+    items = preprocess_batch(mixed_length_corpus(args.size, args.long_ratio))
+    count_tokens = _token_counter(pipeline, args.max_seq_length)
+    lengths = [count_tokens(item) for item in items]
+
+    real, arrival = padded_tokens(lengths, args.batch_size)
+    _, bucketed = padded_tokens(sorted(lengths), args.batch_size)
+    print(f"Token thật: {real:,} ({len(items):,} tin, lô {args.batch_size})")
+    print(f"- theo thứ tự đến: {arrival:,} token ({arrival / real - 1:.1%} padding)")
+    print(f"- sắp theo độ dài: {bucketed:,} token ({bucketed / real - 1:.1%} padding)")
+
+    if pipeline is not None:
+        print(f"- encode theo thứ tự đến: {_time_arrival_order(pipeline, items):.2f}s")
+        print(f"- encode 1 lần (tự sắp theo độ dài): {_time_single_call(pipeline, items):.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""So sánh đọc cả bảng rồi chọn cột (cách cũ) với đọc header trước + chỉ parse cột văn bản.
+
+File tổng hợp mô phỏng file xuất từ CRM: cột `text` cùng nhiều cột phụ bị bỏ đi.
+Đo thời gian (lần nhanh nhất) và bộ nhớ đỉnh (tracemalloc, gồm mảng numpy/pandas).
+Trước khi đo, kiểm tra đọc cả file (`_parse_csv`) và đọc luồng (`iter_message_chunks`)
+cho ra đúng cùng chuỗi, kể cả khối toàn số điện thoại/số ("0912000000", "4.50").
+Chạy:
+  python -m benchmarks.bench_parse_columns --rows 50000 --columns 40
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import random
+import time
+import tracemalloc
+from typing import Any, Callable
+
+import pandas as pd
+
+from backend.app.file_parser import (
+    _clean_series_to_list,
+    _parse_csv,
+    _parse_xlsx,
+    _pick_text_column,
+    iter_message_chunks,
+)
+from benchmarks.corpus import generate_corpus
+
+
+def wide_rows(size: int, columns: int, seed: int = 13) -> tuple[list[str], list[list[Any]]]:
+    """Header + dòng dữ liệu: cột văn bản ở giữa, cột phụ là số nguyên, số thực, mã KH, ghi chú."""
+    rng = random.Random(seed)
+    messages = generate_corpus(size, seed=seed)
+    extra = [f"field_{index}" for index in range(columns - 1)]
+    middle = len(extra) // 2
+    header = [*extra[:middle], "text", *extra[middle:]]
+    rows = []
+    for message in messages:
+        values: list[Any] = []
+        for index in range(columns - 1):
+            kind = index % 4
+            if kind == 0:
+                values.append(rng.randint(1, 10**9))
+            elif kind == 1:
+                values.append(round(rng.random() * 1000, 2))
+            elif kind == 2:
+                values.append(f"KH{rng.randint(0, 10**6):07d}")
+            else:
+                values.append(rng.choice(["", "đã gọi lại", "chờ xác nhận", "khiếu nại"]))
+        rows.append([*values[:middle], message, *values[middle:]])
+    return header, rows
+
+
+def file_content(extension: str, header: list[str], rows: list[list[Any]]) -> bytes:
+    if extension == ".csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(header)
+        writer.writerows(rows)
+        return buffer.getvalue().encode("utf-8")
+
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(header)
+    for row in rows:
+        sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def parse_full_table(extension: str, content: bytes) -> list[str]:
+    """Cách cũ: đọc mọi cột rồi mới chọn cột văn bản."""
+    if extension == ".csv":
+        df = pd.read_csv(io.BytesIO(content))
+    else:
+        df = pd.read_excel(io.BytesIO(content), sheet_name=0)
+    return _clean_series_to_list(df[_pick_text_column(df, None)])
+
+
+def parse_text_column(extension: str, content: bytes) -> list[str]:
+    """Cách mới (bỏ qua giới hạn 10MB của `parse_messages_from_content`)."""
+    parse = _parse_csv if extension == ".csv" else _parse_xlsx
+    return parse(content, None)[0]
+
+
+def numeric_text_cases() -> list[tuple[str, bytes, str | None]]:
+    """(tên, nội dung CSV, text_column): cột văn bản có khối chỉ gồm chữ số/số thực."""
+    phones = "\n".join(f"0912{index:06d}" for index in range(5000))
+    return [
+        ("khối số điện thoại", f"message\n{phones}\nhẹn bạn 8h\n".encode(), "message"),
+        ("số ngắn", "message,id\n4.50,1\n123,2\n007,3\n".encode(), "message"),
+        ("tự chọn cột", "id,message\n1,4.50\n2,chào bạn\n".encode(), None),
+    ]
+
+
+def check_stream_parity(cases: list[tuple[str, bytes, str | None]]) -> None:
+    """Đọc cả file và đọc luồng (khối 1000 dòng) phải cho cùng danh sách tin."""
+    for name, content, text_column in cases:
+        expected = _parse_csv(content, text_column)
+        chunks, column = iter_message_chunks(
+            "file.csv", io.BytesIO(content), text_column, chunk_rows=1000
+        )
+        streamed = [message for chunk in chunks for message in chunk]
+        if (streamed, column) != expected:
+            raise SystemExit(f"Đọc luồng lệch với đọc cả file ({name}).")
+    print(f"Parity đọc luồng .csv: khớp {len(cases)} trường hợp")
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> tuple[float, float]:
+    """(giây nhanh nhất, MB bộ nhớ đỉnh)."""
+    seconds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - started)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(seconds), peak / 1024 / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark đọc file theo cột văn bản.")
+    parser.add_argument("--rows", type=int, nargs="*", default=[10_000, 50_000])
+    parser.add_argument("--columns", type=int, default=40, help="Tổng số cột của file")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    check_stream_parity(numeric_text_cases())
+    for extension in (".csv", ".xlsx"):
+        for size in args.rows:
+            header, rows = wide_rows(size, args.columns)
+            content = file_content(extension, header, rows)
+            expected = parse_full_table(extension, content)
+            if parse_text_column(extension, content) != expected:
+                raise SystemExit(f"Kết quả lệch với cách cũ ({extension}, {size} dòng).")
+            if extension == ".csv":
+                check_stream_parity([(f"{size} dòng", content, None)])
+
+            full = measure(lambda: parse_full_table(extension, content), args.repeat)
+            pruned = measure(lambda: parse_text_column(extension, content), args.repeat)
+            print(
+                f"{extension} {size:>7,} dòng x {args.columns} cột ({len(content) / 1e6:.1f}MB): "
+                f"cả bảng {full[0] * 1000:,.0f}ms / {full[1]:,.1f}MB, "
+                f"chỉ cột text {pruned[0] * 1000:,.0f}ms / {pruned[1]:,.1f}MB "
+                f"(x{full[0] / pruned[0]:.2f} nhanh hơn)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Đo thời gian import `run` và thời gian nạp registry theo từng lựa chọn `--models`.
+
+Mỗi lần đo chạy trong 1 process Python mới (import cache trống), lấy lần nhanh nhất.
+In kèm các thư viện nặng đã bị import và RSS đỉnh của process.
+Chạy:
+  python -m benchmarks.bench_startup --select all bnb_binary
+  python -m benchmarks.bench_startup --registry models_registry.json --select all lr_embedding
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+HEAVY_MODULES = (
+    "pandas",
+    "openpyxl",
+    "joblib",
+    "sklearn",
+    "scipy",
+    "torch",
+    "sentence_transformers",
+)
+
+_CHILD = """
+import json, resource, sys, time
+started = time.perf_counter()
+import run
+import_seconds = time.perf_counter() - started
+load_seconds = None
+if {registry!r}:
+    from pathlib import Path
+    from backend.app.model_registry import ModelRegistry
+    started = time.perf_counter()
+    options = {{"model_ids": {model_ids!r}}} if {model_ids!r} else {{}}
+    registry = ModelRegistry(Path({registry!r}), **options)
+    status = registry.preload(warmup=False)
+    load_seconds = time.perf_counter() - started
+    errors = {{k: v["error"] for k, v in status.items() if v["error"]}}
+    if errors:
+        raise SystemExit(f"Nạp model lỗi: {{errors}}")
+print(json.dumps({{
+    "import_seconds": import_seconds,
+    "load_seconds": load_seconds,
+    "modules": [name for name in {heavy!r} if name in sys.modules],
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}}))
+"""
+
+
+def run_child(registry: str | None, model_ids: list[str] | None) -> dict[str, Any]:
+    code = _CHILD.format(registry=registry, model_ids=model_ids, heavy=HEAVY_MODULES)
+    process = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if process.returncode != 0:
+        raise SystemExit(process.stderr.strip())
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def measure(registry: str | None, model_ids: list[str] | None, repeat: int) -> dict[str, Any]:
+    results = [run_child(registry, model_ids) for _ in range(repeat)]
+    return min(results, key=lambda item: item["import_seconds"] + (item["load_seconds"] or 0))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark thời gian khởi động server.")
+    parser.add_argument(
+        "--registry",
+        default=None,
+        help="File registry để đo thời gian nạp model (bỏ trống: chỉ đo import)",
+    )
+    parser.add_argument(
+        "--select",
+        nargs="*",
+        default=["all"],
+        help="Mỗi giá trị là 1 lựa chọn `--models` (phân tách bằng dấu phẩy, `all` = cả registry)",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    registry = str(Path(args.registry).resolve()) if args.registry else None
+    selections = args.select if registry else ["all"]
+    for selection in selections:
+        model_ids = None if selection == "all" else selection.split(",")
+        result = measure(registry, model_ids, args.repeat)
+        load = result["load_seconds"]
+        load_text = f", nạp model {load * 1000:,.0f}ms" if load is not None else ""
+        print(
+            f"--models {selection}: import run {result['import_seconds'] * 1000:,.0f}ms"
+            f"{load_text}, RSS {result['max_rss_mb']:,.0f}MB, "
+            f"đã import: {', '.join(result['modules']) or '(không có thư viện nặng)'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
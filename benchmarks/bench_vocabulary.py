@@ -0,0 +1,183 @@
+"""So sánh CountVectorizer gốc (dict `vocabulary_`) với CompactCountVectorizer (mảng hash).
+
+- Parity: ma trận feature giống hệt trên corpus kiểu `file.txt` (+ chính file.txt).
+- Thời gian `transform` (lần nhanh nhất).
+- Kích thước artifact, thời gian nạp và RSS tăng thêm khi nạp: mỗi lần nạp chạy trong
+  1 process mới (đã import sẵn sklearn để chỉ đo phần vectorizer); bản rút gọn đo cả
+  `joblib.load(mmap_mode="r")` (trang nhớ dùng chung giữa các worker).
+- Như trên cho scorer BNB biên dịch (`bnb_binary_compiled.joblib`, artifact registry
+  thực sự nạp): bản dict token -> delta vs bản mảng hash + mảng delta, kèm parity xác
+  suất với pipeline sklearn.
+Không truyền `--vectorizer` thì fit 1 vectorizer nhị phân unigram+bigram trên corpus tổng hợp;
+không truyền `--classifier` thì fit BernoulliNB với nhãn ngẫu nhiên trên cùng corpus.
+Chạy:
+  python -m benchmarks.bench_vocabulary --vectorizer models/vec_binary.joblib \
+      --classifier models/bnb_binary_oversampled.joblib
+  python -m benchmarks.bench_vocabulary --fit-rows 300000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+from benchmarks.bench_artifacts import _memory_kb
+from benchmarks.corpus import ROOT_DIR, generate_corpus, load_seed_messages
+
+
+def probe(path: Path, load_mode: str) -> dict[str, Any]:
+    import joblib
+    from sklearn.feature_extraction.text import CountVectorizer  # noqa: F401
+
+    from backend.app.compact_vectorizer import CompactCountVectorizer  # noqa: F401
+    from backend.app.model_wrappers import CompiledBernoulliNB  # noqa: F401
+
+    before = _memory_kb()
+    started = time.perf_counter()
+    model = joblib.load(path, mmap_mode="r") if load_mode == "mmap" else joblib.load(path)
+    load_seconds = time.perf_counter() - started
+    if hasattr(model, "transform"):
+        model.transform(["xin chào, hẹn bạn 8h tối nay nhé"])
+    else:
+        model.predict_proba(["xin chào, hẹn bạn 8h tối nay nhé"])
+    after = _memory_kb()
+    return {
+        "load_ms": round(load_seconds * 1000, 2),
+        "rss_delta_kb": after.get("rss_kb", after["max_rss_kb"])
+        - before.get("rss_kb", before["max_rss_kb"]),
+        "private_delta_kb": after.get("private_kb", 0) - before.get("private_kb", 0),
+    }
+
+
+def run_isolated(path: Path, load_mode: str, repeat: int) -> dict[str, Any]:
+    results = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_vocabulary", "--probe", str(path), load_mode],
+            cwd=ROOT_DIR,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return min(results, key=lambda item: item["load_ms"])
+
+
+def best_seconds(fn: Callable[[], Any], repeat: int) -> float:
+    seconds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - started)
+    return min(seconds)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark vocabulary dict vs mảng hash.")
+    parser.add_argument("--vectorizer", default=None, help="CountVectorizer đã fit (joblib)")
+    parser.add_argument(
+        "--classifier", default=None, help="BernoulliNB đã fit trên `--vectorizer` (joblib)"
+    )
+    parser.add_argument("--fit-rows", type=int, default=200_000, help="Số tin để fit khi tự sinh")
+    parser.add_argument("--rows", type=int, default=50_000, help="Số tin để kiểm tra parity")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--probe", nargs=2, metavar=("PATH", "LOAD_MODE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.probe:
+        print(json.dumps(probe(Path(args.probe[0]), args.probe[1])))
+        return
+
+    if args.classifier and not args.vectorizer:
+        raise SystemExit("`--classifier` cần đi kèm `--vectorizer` đã dùng để fit nó.")
+
+    import joblib
+    import numpy as np
+    from sklearn.feature_extraction.text import CountVectorizer
+    from sklearn.naive_bayes import BernoulliNB
+
+    from backend.app.compact_vectorizer import CompactCountVectorizer, matrices_identical
+    from backend.app.model_wrappers import CompiledBernoulliNB
+    from backend.app.parity import PARITY_ATOL
+    from backend.app.text_preprocess import preprocess_batch
+
+    if args.vectorizer:
+        original = joblib.load(args.vectorizer)
+    else:
+        corpus = preprocess_batch(generate_corpus(args.fit_rows, seed=3))
+        original = CountVectorizer(binary=True, ngram_range=(1, 2)).fit(corpus)
+    if args.classifier:
+        classifier = joblib.load(args.classifier)
+    else:
+        if args.vectorizer:
+            corpus = preprocess_batch(generate_corpus(args.fit_rows, seed=3))
+        labels = np.random.default_rng(3).choice(["ham", "spam"], size=len(corpus))
+        classifier = BernoulliNB().fit(original.transform(corpus), labels)
+    compact = CompactCountVectorizer.from_vectorizer(original)
+    scorer_dict = CompiledBernoulliNB.from_parts(original, classifier)
+    scorer_arrays = CompiledBernoulliNB.from_parts(compact, classifier)
+
+    texts = preprocess_batch(generate_corpus(args.rows, seed=11) + load_seed_messages())
+    if not matrices_identical(original.transform(texts), compact.transform(texts)):
+        raise SystemExit("Ma trận feature của bản rút gọn khác bản gốc.")
+    print(f"Parity: khớp ma trận trên {len(texts):,} tin, {len(original.vocabulary_):,} token")
+    expected = classifier.predict_proba(original.transform(texts))
+    for label, scorer in (("dict", scorer_dict), ("mảng hash", scorer_arrays)):
+        diff = float(np.max(np.abs(expected - scorer.predict_proba(texts, preprocessed=True))))
+        if diff > PARITY_ATOL:
+            raise SystemExit(f"Scorer biên dịch ({label}) lệch sklearn: {diff:.3e}")
+        print(f"Parity scorer biên dịch ({label}): sai lệch tối đa {diff:.2e}")
+
+    dict_seconds = best_seconds(lambda: original.transform(texts), args.repeat)
+    compact_seconds = best_seconds(lambda: compact.transform(texts), args.repeat)
+    print(
+        f"transform {len(texts):,} tin: dict {dict_seconds * 1000:,.0f}ms, "
+        f"mảng hash {compact_seconds * 1000:,.0f}ms"
+    )
+
+    scorer_seconds = best_seconds(
+        lambda: scorer_dict.predict_proba(texts, preprocessed=True), args.repeat
+    )
+    arrays_seconds = best_seconds(
+        lambda: scorer_arrays.predict_proba(texts, preprocessed=True), args.repeat
+    )
+    print(
+        f"scorer biên dịch {len(texts):,} tin: dict {scorer_seconds * 1000:,.0f}ms, "
+        f"mảng hash {arrays_seconds * 1000:,.0f}ms"
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        artifacts = {
+            "vec_dict.joblib": original,
+            "vec_compact.joblib": compact,
+            "scorer_dict.joblib": scorer_dict,
+            "scorer_compact.joblib": scorer_arrays,
+        }
+        for name, model in artifacts.items():
+            joblib.dump(model, directory / name)
+        for label, name, load_mode in (
+            ("dict", "vec_dict.joblib", "joblib"),
+            ("mảng hash", "vec_compact.joblib", "joblib"),
+            ("mảng hash mmap", "vec_compact.joblib", "mmap"),
+            ("scorer dict", "scorer_dict.joblib", "joblib"),
+            ("scorer mảng", "scorer_compact.joblib", "joblib"),
+            ("scorer mảng mmap", "scorer_compact.joblib", "mmap"),
+        ):
+            path = directory / name
+            result = run_isolated(path, load_mode, args.repeat)
+            print(
+                f"{label:<17} file {path.stat().st_size / 1024:,.0f}KB, "
+                f"nạp {result['load_ms']:,.1f}ms, RSS +{result['rss_delta_kb']:,}KB "
+                f"(riêng +{result['private_delta_kb']:,}KB)"
+            )
+
+
+if __name__ == "__main__":
+    main()
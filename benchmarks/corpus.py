@@ -0,0 +1,95 @@
+"""Sinh corpus SMS tổng hợp theo phong cách `file.txt` để đo hiệu năng."""
+
+from __future__ import annotations
+
+import random
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+SAMPLE_PATH = ROOT_DIR / "file.txt"
+
+HAM_WORDS = [
+    "xin", "chào", "hẹn", "bạn", "tối", "nay", "nhé", "họp", "sáng", "mai",
+    "cà", "phê", "cuối", "tuần", "gọi", "lại", "sau", "ok", "see", "you",
+    "later", "call", "me", "when", "home", "thanks", "mẹ", "về", "ăn", "cơm",
+]
+SPAM_WORDS = [
+    "free", "win", "prize", "claim", "now", "urgent", "voucher", "cash",
+    "miễn", "phí", "quà", "tặng", "giảm", "giá", "click", "nhận", "ngay",
+    "khuyến", "mãi", "trúng", "thưởng", "bấm", "link", "congrats",
+]
+SIGNALS = [
+    "http://km-{n}.vn/nhan-qua",
+    "www.uudai{n}.com",
+    "lienhe{n}@shop.vn",
+    "0912 345 {n:03d}",
+    "+84 98{n:05d}",
+    "${n}",
+    "{n}.000 €",
+    "{n}%",
+    "{n}h",
+]
+
+
+def load_seed_messages(path: Path = SAMPLE_PATH) -> list[str]:
+    if not path.exists():
+        return []
+    lines = path.read_text(encoding="utf-8", errors="ignore").splitlines()
+    return [line.strip() for line in lines if line.strip()]
+
+
+def _synthetic_message(rng: random.Random, seeds: list[str]) -> str:
+    roll = rng.random()
+    if seeds and roll < 0.3:
+        return rng.choice(seeds)
+
+    words = SPAM_WORDS if roll < 0.6 else HAM_WORDS
+    length = rng.choice([4, 6, 8, 12, 20, 40])
+    parts = [rng.choice(words) for _ in range(length)]
+    for _ in range(rng.randint(0, 3)):
+        signal = rng.choice(SIGNALS).format(n=rng.randint(1, 99999))
+        parts.insert(rng.randint(0, len(parts)), signal)
+    text = " ".join(parts)
+    if rng.random() < 0.3:
+        text = text.capitalize() + rng.choice(["!", "!!!", ".", "?", " :)"])
+    return text
+
+
+def generate_corpus(size: int, seed: int = 13, duplicate_ratio: float = 0.0) -> list[str]:
+    """Sinh `size` tin nhắn; `duplicate_ratio` mô phỏng tin chiến dịch lặp lại."""
+    rng = random.Random(seed)
+    seeds = load_seed_messages()
+    templates = [_synthetic_message(rng, seeds) for _ in range(20)]
+    corpus = []
+    for _ in range(size):
+        if duplicate_ratio and rng.random() < duplicate_ratio:
+            corpus.append(rng.choice(templates))
+        else:
+            corpus.append(_synthetic_message(rng, seeds))
+    return corpus
+
+
+def synthetic_bnb_pipeline(size: int = 20_000, seed: int = 5):
+    """Pipeline preprocess -> CountVectorizer nhị phân -> BernoulliNB fit trên corpus tổng hợp.
+
+    Cùng cấu trúc với `bnb_binary_pipeline.joblib` nhưng không cần artifact (Git LFS);
+    nhãn gán ngẫu nhiên theo seed, chỉ dùng để so khớp điểm số.
+    """
+    from sklearn.feature_extraction.text import CountVectorizer
+    from sklearn.naive_bayes import BernoulliNB
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import FunctionTransformer
+
+    from backend.app.text_preprocess import preprocess_batch
+
+    rng = random.Random(seed)
+    texts = generate_corpus(size, seed=seed)
+    labels = [rng.choice(("ham", "spam")) for _ in texts]
+    pipeline = Pipeline(
+        steps=[
+            ("preprocess", FunctionTransformer(preprocess_batch, validate=False)),
+            ("vectorizer", CountVectorizer(binary=True, ngram_range=(1, 2))),
+            ("classifier", BernoulliNB()),
+        ]
+    )
+    return pipeline.fit(texts, labels)
@@ -0,0 +1,302 @@
+"""Bộ benchmark inference tái lập được, so sánh với baseline để bắt hồi quy.
+
+Đo:
+- `preprocess_batch`: số tin/giây.
+- `predict_one`: độ trễ p50/p95/p99 cho từng model trong registry.
+- `predict_batch`: số tin/giây theo nhiều kích thước batch.
+- `parse_messages_from_content`: thời gian đọc file .txt/.csv/.xlsx nhiều cỡ.
+
+Chạy:
+  python -m benchmarks.suite                                # ghi benchmarks/results/latest.json
+  python -m benchmarks.suite --save-baseline                # lưu benchmarks/baseline.json
+  python -m benchmarks.suite --baseline --tolerance 0.15    # so với benchmarks/baseline.json
+Baseline nằm ngoài `benchmarks/results/` (bị git bỏ qua) để commit cùng mã nguồn.
+Khi so baseline: `--size/--seed/--single` phải giống lúc lưu baseline; thoát với mã 1 nếu có
+hồi quy vượt ngưỡng, thiếu metric có trong baseline hoặc có model đo lỗi.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+import os
+import platform
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+import numpy as np
+
+from benchmarks.corpus import ROOT_DIR, generate_corpus
+
+RESULTS_DIR = ROOT_DIR / "benchmarks" / "results"
+DEFAULT_OUTPUT = RESULTS_DIR / "latest.json"
+DEFAULT_BASELINE = ROOT_DIR / "benchmarks" / "baseline.json"
+BATCH_SIZES = (1, 16, 128, 1024)
+PARSE_SIZES = (1_000, 10_000, 50_000)
+
+
+def _metric(value: float, unit: str, better: str) -> dict[str, Any]:
+    return {"value": round(float(value), 4), "unit": unit, "better": better}
+
+
+def _best_seconds(fn: Callable[[], Any], repeat: int) -> float:
+    """Lấy lần chạy nhanh nhất để giảm nhiễu từ process khác."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def bench_preprocess(corpus: list[str], repeat: int) -> dict[str, dict[str, Any]]:
+    from backend.app.text_preprocess import preprocess_batch
+
+    seconds = _best_seconds(lambda: preprocess_batch(corpus), repeat)
+    return {"preprocess.throughput": _metric(len(corpus) / seconds, "msg/s", "higher")}
+
+
+def bench_predict_one(registry, model_id: str, texts: list[str]) -> dict[str, dict[str, Any]]:
+    registry.warmup(model_id)
+    samples = []
+    for text in texts:
+        started = time.perf_counter()
+        registry.predict_one(model_id, text)
+        samples.append((time.perf_counter() - started) * 1000)
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    prefix = f"predict_one.{model_id}"
+    return {
+        f"{prefix}.p50": _metric(p50, "ms", "lower"),
+        f"{prefix}.p95": _metric(p95, "ms", "lower"),
+        f"{prefix}.p99": _metric(p99, "ms", "lower"),
+    }
+
+
+def bench_predict_batch(
+    registry,
+    model_id: str,
+    corpus: list[str],
+    batch_sizes: tuple[int, ...],
+    repeat: int,
+) -> dict[str, dict[str, Any]]:
+    results = {}
+    for batch_size in batch_sizes:
+        rows = min(len(corpus), max(batch_size, 2048))
+        batches = [corpus[start : start + batch_size] for start in range(0, rows, batch_size)]
+
+        def run() -> None:
+            for batch in batches:
+                registry.predict_batch(model_id, batch)
+
+        seconds = _best_seconds(run, repeat)
+        results[f"predict_batch.{model_id}.bs{batch_size}"] = _metric(
+            rows / seconds, "msg/s", "higher"
+        )
+    return results
+
+
+def _file_content(extension: str, messages: list[str]) -> bytes:
+    if extension == ".txt":
+        return "\n".join(messages).encode("utf-8")
+    if extension == ".csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(["id", "text"])
+        writer.writerows(enumerate(messages, start=1))
+        return buffer.getvalue().encode("utf-8")
+
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(["id", "text"])
+    for row in enumerate(messages, start=1):
+        sheet.append(list(row))
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def bench_parse(
+    corpus: list[str],
+    sizes: tuple[int, ...],
+    repeat: int,
+) -> dict[str, dict[str, Any]]:
+    from backend.app.file_parser import parse_messages_from_content
+
+    results = {}
+    for extension in (".txt", ".csv", ".xlsx"):
+        for size in sizes:
+            content = _file_content(extension, corpus[:size])
+            filename = f"bench{extension}"
+            seconds = _best_seconds(
+                lambda: parse_messages_from_content(filename, content), repeat
+            )
+            results[f"parse{extension}.{size}"] = _metric(seconds * 1000, "ms", "lower")
+    return results
+
+
+def compare(
+    current: dict[str, dict[str, Any]],
+    baseline: dict[str, dict[str, Any]],
+    tolerance: float,
+) -> list[dict[str, Any]]:
+    """Danh sách metric tệ hơn baseline quá `tolerance` (tỉ lệ, vd 0.15 = 15%).
+
+    Metric có trong baseline mà lần chạy này không đo được (model lỗi, đổi tên...) cũng tính
+    là hồi quy, với `current`/`change` là None.
+    """
+    regressions = []
+    for name, reference in baseline.items():
+        metric = current.get(name)
+        if metric is None:
+            regressions.append(
+                {
+                    "metric": name,
+                    "baseline": reference["value"],
+                    "current": None,
+                    "unit": reference["unit"],
+                    "change": None,
+                }
+            )
+            continue
+        if not reference["value"]:
+            continue
+        change = metric["value"] / reference["value"] - 1
+        worse = -change if metric["better"] == "higher" else change
+        if worse > tolerance:
+            regressions.append(
+                {
+                    "metric": name,
+                    "baseline": reference["value"],
+                    "current": metric["value"],
+                    "unit": metric["unit"],
+                    "change": round(change, 4),
+                }
+            )
+    return regressions
+
+
+def _environment() -> dict[str, Any]:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def _config(args: argparse.Namespace) -> dict[str, Any]:
+    return {"size": args.size, "seed": args.seed, "single": args.single}
+
+
+def run_suite(args: argparse.Namespace) -> dict[str, Any]:
+    from backend.app.model_registry import ModelRegistry
+
+    corpus = generate_corpus(args.size, seed=args.seed)
+    metrics: dict[str, dict[str, Any]] = {}
+    errors: dict[str, str] = {}
+
+    metrics.update(bench_preprocess(corpus, args.repeat))
+
+    registry = ModelRegistry(Path(args.registry))
+    model_ids = args.models or [item["model_id"] for item in registry.list_models()]
+    for model_id in model_ids:
+        try:
+            metrics.update(bench_predict_one(registry, model_id, corpus[: args.single]))
+            metrics.update(
+                bench_predict_batch(registry, model_id, corpus, BATCH_SIZES, args.repeat)
+            )
+        except Exception as exc:  # model thiếu artifact/phụ thuộc: ghi lỗi, đo tiếp model khác
+            errors[model_id] = str(exc)
+
+    parse_sizes = tuple(size for size in PARSE_SIZES if size <= args.size)
+    metrics.update(bench_parse(corpus, parse_sizes, args.repeat))
+    return {
+        "config": _config(args),
+        "environment": _environment(),
+        "metrics": metrics,
+        "errors": errors,
+    }
+
+
+def _print_metrics(metrics: dict[str, dict[str, Any]]) -> None:
+    width = max(len(name) for name in metrics)
+    for name, metric in metrics.items():
+        print(f"{name:<{width}}  {metric['value']:>14,.3f} {metric['unit']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark inference + so sánh baseline.")
+    parser.add_argument("--registry", default=str(ROOT_DIR / "models_registry.json"))
+    parser.add_argument("--models", nargs="*", help="model_id cần đo (mặc định toàn bộ)")
+    parser.add_argument("--size", type=int, default=50_000, help="Số tin nhắn tổng hợp")
+    parser.add_argument("--single", type=int, default=1000, help="Số lần gọi predict_one")
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--repeat", type=int, default=3, help="Số lần lặp, lấy lần nhanh nhất")
+    parser.add_argument("--output", default=str(DEFAULT_OUTPUT), help="File JSON kết quả")
+    parser.add_argument(
+        "--baseline",
+        nargs="?",
+        const=str(DEFAULT_BASELINE),
+        help=f"File JSON baseline để so sánh (bỏ trống: {DEFAULT_BASELINE.relative_to(ROOT_DIR)})",
+    )
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Ngưỡng hồi quy (tỉ lệ)")
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help=f"Ghi kết quả làm baseline ({DEFAULT_BASELINE.relative_to(ROOT_DIR)})",
+    )
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        # Corpus/số mẫu khác thì số đo không so được với nhau: dừng trước khi đo.
+        if baseline.get("config") != _config(args):
+            raise SystemExit(
+                f"Cấu hình {_config(args)} khác baseline {baseline.get('config')}, "
+                "chạy lại với cùng --size/--seed/--single hoặc lưu baseline mới."
+            )
+
+    report = run_suite(args)
+    _print_metrics(report["metrics"])
+    for model_id, error in report["errors"].items():
+        print(f"Bỏ qua {model_id}: {error}")
+
+    if baseline is not None:
+        report["regressions"] = compare(report["metrics"], baseline["metrics"], args.tolerance)
+
+    outputs = [Path(args.output)] + ([DEFAULT_BASELINE] if args.save_baseline else [])
+    for output in outputs:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"Đã ghi kết quả: {', '.join(str(path) for path in outputs)}")
+
+    if baseline is None:
+        return
+    regressions = report["regressions"]
+    if regressions:
+        print(f"Hồi quy vượt {args.tolerance:.0%}:")
+        for item in regressions:
+            if item["current"] is None:
+                print(f"- {item['metric']}: {item['baseline']} {item['unit']} -> không đo được")
+                continue
+            print(
+                f"- {item['metric']}: {item['baseline']} -> {item['current']} {item['unit']}"
+                f" ({item['change']:+.1%})"
+            )
+    if report["errors"]:
+        print(f"Model đo lỗi: {', '.join(report['errors'])}")
+    if regressions or report["errors"]:
+        sys.exit(1)
+    print("Không có hồi quy so với baseline.")
+
+
+if __name__ == "__main__":
+    main()
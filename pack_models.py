@@ -4,25 +4,35 @@
 Bạn chỉ cần sửa phần PIPELINES bên dưới khi có model mới.
 Chạy:
   .\.venv\Scripts\python pack_models.py
+  .\.venv\Scripts\python pack_models.py --format mmap   # artifact không nén, map bộ nhớ
 """
 
 from __future__ import annotations
 
+import argparse
+import csv
 import json
+import time
 from pathlib import Path
 from typing import Any
 
 import joblib
+import numpy as np
 import torch
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import FunctionTransformer
 
-from backend.app.model_wrappers import EmbeddingLogisticPipeline
+from backend.app.compact_vectorizer import CompactCountVectorizer, matrices_identical
+from backend.app.model_registry import ModelRegistry, normalize_label
+from backend.app.model_wrappers import CompiledBernoulliNB, EmbeddingLogisticPipeline
+from backend.app.parity import PARITY_ATOL, max_proba_difference
+from backend.app.repackage_models import ARTIFACT_FORMATS, dump_artifact
 from backend.app.text_preprocess import preprocess_batch
 
 ROOT_DIR = Path(__file__).resolve().parent
 MODELS_DIR = ROOT_DIR / "models"
 REGISTRY_PATH = ROOT_DIR / "models_registry.json"
+PARITY_SAMPLE_PATH = ROOT_DIR / "file.txt"
 
 # =========================
 # CẤU HÌNH MODEL CỦA BẠN
@@ -30,6 +40,20 @@ REGISTRY_PATH = ROOT_DIR / "models_registry.json"
 # type:
 #   - vectorizer_classifier: dùng vectorizer + classifier (vd: BNB, LR TFIDF)
 #   - embedding_classifier: dùng sentence embedding + classifier
+#   - quantized_embedding_classifier: như embedding_classifier nhưng lượng tử hoá động int8
+#     các lớp Linear của embedder; ghi báo cáo so với bản fp32 ra `report_path`.
+#     `eval_path` (tuỳ chọn): CSV có cột `text`, `label` để tính accuracy; thiếu thì
+#     chỉ so độ khớp trên file.txt.
+# compiled_output_path (tuỳ chọn, chỉ cho vectorizer_classifier với BernoulliNB):
+#   xuất thêm scorer biên dịch (tra bảng log-prob theo token), registry ưu tiên dùng.
+# compact_vocabulary (tuỳ chọn, chỉ cho vectorizer_classifier dùng CountVectorizer):
+#   thay dict `vocabulary_` bằng mảng hash chỉ đọc (CompactCountVectorizer), dừng nếu
+#   ma trận feature trên file.txt khác bản gốc.
+# embedding_store (tuỳ chọn, chỉ cho embedding_classifier): cache embedding trên đĩa
+#   {"path": "cache/embeddings", "max_rows": 1000000, "read_only": false}
+# encoder (tuỳ chọn, cho 2 type embedding): lưu vào artifact, registry có thể ghi đè
+#   {"batch_size": 64, "max_seq_length": 128, "num_threads": 2}; không có max_seq_length
+#   thì giữ độ dài tối đa của embedder (cắt tin dài làm đổi embedding => phải chủ động bật).
 # =========================
 PIPELINES: list[dict[str, Any]] = [
     {
@@ -39,6 +63,8 @@ PIPELINES: list[dict[str, Any]] = [
         "vectorizer_path": "models/vec_binary.joblib",
         "classifier_path": "models/bnb_binary_oversampled.joblib",
         "output_path": "models/bnb_binary_pipeline.joblib",
+        "compiled_output_path": "models/bnb_binary_compiled.joblib",
+        "compact_vocabulary": True,
         "has_proba": True,
         "default_threshold": 0.5,
         "pos_label": "spam",
@@ -54,6 +80,32 @@ PIPELINES: list[dict[str, Any]] = [
         "default_threshold": 0.5,
         "pos_label": "spam",
     },
+    {
+        "model_id": "lr_embedding_int8",
+        "type": "quantized_embedding_classifier",
+        "display_name": "Logistic Regression + Sentence Embedding int8 (Pipeline)",
+        "embedder_path": "models/sentence_transformer_embed_model.joblib",
+        "classifier_path": "models/lr_embedding.joblib",
+        "output_path": "models/lr_embedding_int8_pipeline.joblib",
+        "report_path": "models/lr_embedding_int8_report.json",
+        "has_proba": True,
+        "default_threshold": 0.5,
+        "pos_label": "spam",
+    },
+]
+
+
+# Model cascade (không có artifact riêng): tầng nhanh chấm trước, chỉ tin có điểm spam
+# nằm trong `band` mới được chấm lại bằng tầng chậm.
+CASCADES: list[dict[str, Any]] = [
+    {
+        "model_id": "cascade_bnb_lr",
+        "display_name": "Cascade: BernoulliNB -> LR Embedding (tin không chắc chắn)",
+        "stages": ["bnb_binary", "lr_embedding"],
+        "band": [0.1, 0.9],
+        "default_threshold": 0.5,
+        "pos_label": "spam",
+    },
 ]
 
 
@@ -80,8 +132,10 @@ def _load_sentence_model_cpu(path: Path):
     return model
 
 
-def build_vectorizer_pipeline(cfg: dict[str, Any]) -> Path:
+def build_vectorizer_pipeline(cfg: dict[str, Any], artifact_format: str = "joblib") -> Path:
     vec = _load_joblib(ROOT_DIR / cfg["vectorizer_path"])
+    if cfg.get("compact_vocabulary"):
+        vec = build_compact_vectorizer(cfg, vec)
     clf = _load_joblib(ROOT_DIR / cfg["classifier_path"])
     pipeline = Pipeline(
         steps=[
@@ -91,28 +145,208 @@ def build_vectorizer_pipeline(cfg: dict[str, Any]) -> Path:
         ]
     )
     output_path = ROOT_DIR / cfg["output_path"]
-    joblib.dump(pipeline, output_path, compress=3)
+    dump_artifact(pipeline, output_path, artifact_format)
+    if cfg.get("compiled_output_path"):
+        build_compiled_scorer(cfg, pipeline, artifact_format)
+    return output_path
+
+
+def _parity_texts() -> list[str]:
+    if not PARITY_SAMPLE_PATH.exists():
+        return []
+    lines = PARITY_SAMPLE_PATH.read_text(encoding="utf-8", errors="ignore").splitlines()
+    return [line.strip() for line in lines if line.strip()]
+
+
+def build_compact_vectorizer(cfg: dict[str, Any], vectorizer) -> CompactCountVectorizer:
+    """Đổi `vocabulary_` sang dạng mảng và kiểm tra ma trận feature giống hệt bản gốc."""
+    compact = CompactCountVectorizer.from_vectorizer(vectorizer)
+    texts = preprocess_batch(_parity_texts())
+    if texts and not matrices_identical(vectorizer.transform(texts), compact.transform(texts)):
+        raise ValueError(f"Vectorizer rút gọn của {cfg['model_id']} cho ma trận khác bản gốc.")
+    arrays = sum(
+        array.nbytes
+        for array in (
+            compact.vocab_hashes_,
+            compact.vocab_indices_,
+            compact.vocab_offsets_,
+            compact.vocab_blob_,
+        )
+    )
+    print(
+        f"- Vocabulary rút gọn {cfg['model_id']}: {compact.n_features:,} token, "
+        f"{arrays / 1024:,.0f}KB mảng, khớp ma trận trên {len(texts):,} tin"
+    )
+    return compact
+
+
+def build_compiled_scorer(
+    cfg: dict[str, Any],
+    pipeline: Pipeline,
+    artifact_format: str = "joblib",
+) -> Path:
+    """Xuất scorer biên dịch và kiểm tra xác suất khớp pipeline sklearn."""
+    scorer = CompiledBernoulliNB.from_pipeline(pipeline)
+    diff = max_proba_difference(pipeline, scorer, _parity_texts())
+    if diff > PARITY_ATOL:
+        raise ValueError(f"Scorer biên dịch lệch pipeline sklearn: {diff:.3e} > {PARITY_ATOL}")
+    output_path = ROOT_DIR / cfg["compiled_output_path"]
+    dump_artifact(scorer, output_path, artifact_format)
+    print(f"- Scorer biên dịch {cfg['model_id']}: sai lệch tối đa {diff:.2e}")
+    return output_path
+
+
+def build_embedding_pipeline(cfg: dict[str, Any], artifact_format: str = "joblib") -> Path:
+    embedder = _load_sentence_model_cpu(ROOT_DIR / cfg["embedder_path"])
+    clf = _load_joblib(ROOT_DIR / cfg["classifier_path"])
+    pipeline = EmbeddingLogisticPipeline(
+        embedder=embedder,
+        classifier=clf,
+        **cfg.get("encoder", {}),
+    )
+    output_path = ROOT_DIR / cfg["output_path"]
+    dump_artifact(pipeline, output_path, artifact_format)
     return output_path
 
 
-def build_embedding_pipeline(cfg: dict[str, Any]) -> Path:
+def quantize_embedder(embedder):
+    """Lượng tử hoá động int8 các lớp `nn.Linear` (trọng số int8, activation fp32)."""
+    return torch.ao.quantization.quantize_dynamic(embedder, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _load_eval_set(cfg: dict[str, Any]) -> tuple[list[str], list[str] | None]:
+    eval_path = cfg.get("eval_path")
+    if not eval_path:
+        return _parity_texts(), None
+    texts: list[str] = []
+    labels: list[str] = []
+    with (ROOT_DIR / eval_path).open(encoding="utf-8-sig", newline="") as handle:
+        for row in csv.DictReader(handle):
+            text = (row.get("text") or "").strip()
+            if text:
+                texts.append(text)
+                labels.append(normalize_label(row.get("label"), cfg.get("pos_label", "spam")))
+    return texts, labels
+
+
+def _spam_scores(model: Any, texts: list[str], pos_label: str) -> np.ndarray:
+    proba = np.asarray(model.predict_proba(texts), dtype=np.float64)
+    return proba[:, ModelRegistry._spam_index(model.classes_, pos_label)]
+
+
+def _latency_ms(model: Any, texts: list[str]) -> dict[str, float]:
+    """Độ trễ gọi từng tin (p50/p95) và chi phí mỗi tin khi chấm cả lô."""
+    samples = []
+    for text in texts:
+        started = time.perf_counter()
+        model.predict_proba([text])
+        samples.append((time.perf_counter() - started) * 1000)
+    started = time.perf_counter()
+    model.predict_proba(texts)
+    batch_ms = (time.perf_counter() - started) * 1000
+    return {
+        "single_p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "single_p95_ms": round(float(np.percentile(samples, 95)), 3),
+        "batch_per_message_ms": round(batch_ms / len(texts), 3),
+    }
+
+
+def compare_pipelines(
+    cfg: dict[str, Any],
+    reference: EmbeddingLogisticPipeline,
+    candidate: EmbeddingLogisticPipeline,
+) -> dict[str, Any]:
+    """So sánh bản int8 với bản fp32: độ khớp nhãn, sai lệch xác suất, accuracy, độ trễ."""
+    texts, labels = _load_eval_set(cfg)
+    if not texts:
+        raise ValueError("Không có văn bản để so sánh bản int8 với fp32.")
+    pos_label = cfg.get("pos_label", "spam")
+    threshold = float(cfg.get("default_threshold", 0.5))
+    reference_scores = _spam_scores(reference, texts, pos_label)
+    candidate_scores = _spam_scores(candidate, texts, pos_label)
+    reference_spam = reference_scores >= threshold
+    candidate_spam = candidate_scores >= threshold
+    diff = np.abs(reference_scores - candidate_scores)
+
+    report: dict[str, Any] = {
+        "model_id": cfg["model_id"],
+        "messages": len(texts),
+        "threshold": threshold,
+        "label_agreement": round(float(np.mean(reference_spam == candidate_spam)), 6),
+        "max_score_diff": round(float(diff.max()), 6),
+        "mean_score_diff": round(float(diff.mean()), 6),
+        "accuracy_fp32": None,
+        "accuracy_int8": None,
+        "latency_fp32": _latency_ms(reference, texts),
+        "latency_int8": _latency_ms(candidate, texts),
+    }
+    if labels is not None:
+        truth = np.asarray(labels) == "spam"
+        report["accuracy_fp32"] = round(float(np.mean(reference_spam == truth)), 6)
+        report["accuracy_int8"] = round(float(np.mean(candidate_spam == truth)), 6)
+    return report
+
+
+def build_quantized_embedding_pipeline(
+    cfg: dict[str, Any],
+    artifact_format: str = "joblib",
+) -> Path:
     embedder = _load_sentence_model_cpu(ROOT_DIR / cfg["embedder_path"])
     clf = _load_joblib(ROOT_DIR / cfg["classifier_path"])
-    pipeline = EmbeddingLogisticPipeline(embedder=embedder, classifier=clf)
+    encoder = cfg.get("encoder", {})
+    reference = EmbeddingLogisticPipeline(embedder=embedder, classifier=clf, **encoder)
+    pipeline = EmbeddingLogisticPipeline(
+        embedder=quantize_embedder(embedder),
+        classifier=clf,
+        **encoder,
+    )
+
+    report = compare_pipelines(cfg, reference, pipeline)
     output_path = ROOT_DIR / cfg["output_path"]
-    joblib.dump(pipeline, output_path, compress=3)
+    dump_artifact(pipeline, output_path, artifact_format)
+    report["artifact_bytes"] = output_path.stat().st_size
+    if cfg.get("report_path"):
+        (ROOT_DIR / cfg["report_path"]).write_text(
+            json.dumps(report, ensure_ascii=False, indent=2),
+            encoding="utf-8",
+        )
+    print(
+        f"- {cfg['model_id']}: khớp nhãn fp32 {report['label_agreement']:.2%}, "
+        f"lệch điểm tối đa {report['max_score_diff']:.4f}, "
+        f"p50 {report['latency_fp32']['single_p50_ms']}ms -> "
+        f"{report['latency_int8']['single_p50_ms']}ms/tin"
+    )
     return output_path
 
 
-def write_registry(items: list[dict[str, Any]]) -> None:
+def write_registry(items: list[dict[str, Any]], load_mode: str = "joblib") -> None:
     registry = []
     for cfg in items:
+        entry = {
+            "model_id": cfg["model_id"],
+            "display_name": cfg["display_name"],
+            "joblib_path": cfg["output_path"].replace("\\", "/"),
+            "has_proba": bool(cfg.get("has_proba", True)),
+            "default_threshold": float(cfg.get("default_threshold", 0.5)),
+            "pos_label": cfg.get("pos_label", "spam"),
+            "load_mode": load_mode,
+        }
+        if cfg.get("embedding_store"):
+            entry["embedding_store"] = cfg["embedding_store"]
+        if cfg.get("compiled_output_path"):
+            entry["compiled_path"] = cfg["compiled_output_path"].replace("\\", "/")
+        registry.append(entry)
+    packed = {cfg["model_id"] for cfg in items}
+    for cfg in CASCADES:
+        if not packed.issuperset(cfg["stages"]):
+            continue
         registry.append(
             {
                 "model_id": cfg["model_id"],
                 "display_name": cfg["display_name"],
-                "joblib_path": cfg["output_path"].replace("\\", "/"),
-                "has_proba": bool(cfg.get("has_proba", True)),
+                "type": "cascade",
+                "cascade": {"stages": cfg["stages"], "band": cfg["band"]},
+                "has_proba": True,
                 "default_threshold": float(cfg.get("default_threshold", 0.5)),
                 "pos_label": cfg.get("pos_label", "spam"),
             }
@@ -124,18 +358,30 @@ def write_registry(items: list[dict[str, Any]]) -> None:
 
 
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Đóng gói model thành pipeline joblib.")
+    parser.add_argument(
+        "--format",
+        dest="artifact_format",
+        choices=ARTIFACT_FORMATS,
+        default="joblib",
+        help="joblib (nén) hoặc mmap (không nén, map bộ nhớ dùng chung giữa worker)",
+    )
+    args = parser.parse_args()
+
     MODELS_DIR.mkdir(parents=True, exist_ok=True)
     outputs: list[Path] = []
 
     for cfg in PIPELINES:
         if cfg["type"] == "vectorizer_classifier":
-            outputs.append(build_vectorizer_pipeline(cfg))
+            outputs.append(build_vectorizer_pipeline(cfg, args.artifact_format))
         elif cfg["type"] == "embedding_classifier":
-            outputs.append(build_embedding_pipeline(cfg))
+            outputs.append(build_embedding_pipeline(cfg, args.artifact_format))
+        elif cfg["type"] == "quantized_embedding_classifier":
+            outputs.append(build_quantized_embedding_pipeline(cfg, args.artifact_format))
         else:
             raise ValueError(f"Type không hỗ trợ: {cfg['type']}")
 
-    write_registry(PIPELINES)
+    write_registry(PIPELINES, load_mode=args.artifact_format)
 
     print("Đã đóng gói xong pipeline:")
     for path in outputs:
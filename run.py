@@ -1,36 +1,94 @@
 from __future__ import annotations
 
 import argparse
+import os
+import shutil
 import threading
+import time
+import uuid
 import webbrowser
 from datetime import datetime, timezone
 from pathlib import Path
-
-import pandas as pd
-from flask import Flask, jsonify, request, send_file, send_from_directory
-
-from backend.app.file_parser import parse_messages_from_content
+from typing import Any, Callable, Iterator
+
+import numpy as np
+from flask import Flask, Response, g, jsonify, request, send_file, send_from_directory
+
+from backend.app.batch_writer import (
+    BatchFileSummary,
+    write_multi_predictions_csv,
+    write_predictions_csv,
+)
+from backend.app.file_parser import (
+    MAX_FILE_SIZE_BYTES,
+    MAX_STREAM_FILE_SIZE_BYTES,
+    iter_message_chunks,
+    parse_messages_from_content,
+    validate_extension,
+)
+from backend.app.jobs import BatchJob, JobManager, JobQueueFullError
+from backend.app.metrics import (
+    METRICS,
+    begin_request,
+    end_request,
+    server_timing_header,
+    set_request_model,
+    stage,
+)
 from backend.app.model_registry import ModelRegistry
+from backend.app.ndjson_stream import STREAM_BATCH_SIZE, stream_predictions
+from backend.app.prediction_cache import PredictionCache
+from backend.app.rethreshold import (
+    DEFAULT_THRESHOLDS,
+    relabel_csv,
+    relabel_preview,
+    spam_counts,
+)
+from backend.app.result_store import (
+    DEFAULT_MAX_BYTES,
+    DEFAULT_TTL_SECONDS,
+    ResultStore,
+    StoredResult,
+    digest_bytes,
+    digest_stream,
+)
+from backend.app.serving import limit_threads, serve_prefork
 
 ROOT_DIR = Path(__file__).resolve().parent
 FRONTEND_DIR = ROOT_DIR / "frontend"
 REGISTRY_PATH = ROOT_DIR / "models_registry.json"
 RESULT_DIR = ROOT_DIR / "backend" / "results"
 RESULT_DIR.mkdir(parents=True, exist_ok=True)
+UPLOAD_DIR = RESULT_DIR / "uploads"
+JOB_STATE_DIR = RESULT_DIR / "jobs"
+RESULT_STORE_DIR = RESULT_DIR / "store"
+MAX_BATCH_TEXTS = 100_000
+# Kho kết quả luôn lưu preview tối đa; mỗi request cắt theo `preview_limit` riêng.
+MAX_PREVIEW_ROWS = 50
+UNKNOWN_MODEL_LABEL = "unknown"
 
 app = Flask(__name__, static_folder=str(FRONTEND_DIR), static_url_path="")
 app.json.ensure_ascii = False
 
 
-def ensure_models() -> None:
-    pipeline_bnb = ROOT_DIR / "models" / "bnb_binary_pipeline.joblib"
-    pipeline_lr = ROOT_DIR / "models" / "lr_embedding_pipeline.joblib"
-    if pipeline_bnb.exists() and pipeline_lr.exists():
+def ensure_models(model_ids: list[str] | None = None) -> None:
+    """Đóng gói các pipeline còn thiếu; có `--models` thì chỉ xét pipeline các model đó cần."""
+    pipelines = {
+        "bnb_binary": ROOT_DIR / "models" / "bnb_binary_pipeline.joblib",
+        "lr_embedding": ROOT_DIR / "models" / "lr_embedding_pipeline.joblib",
+    }
+    needed = set(pipelines)
+    if model_ids and REGISTRY_PATH.exists():
+        needed &= set(ModelRegistry(REGISTRY_PATH, model_ids=model_ids).model_ids)
+    missing = [
+        model_id for model_id, path in pipelines.items() if model_id in needed and not path.exists()
+    ]
+    if not missing:
         return
 
     from backend.app.repackage_models import build_deploy_models, write_default_registry
 
-    build_deploy_models(ROOT_DIR)
+    build_deploy_models(ROOT_DIR, model_ids=missing)
     if not REGISTRY_PATH.exists():
         write_default_registry(ROOT_DIR)
 
@@ -45,10 +103,69 @@ def get_registry() -> ModelRegistry:
     return _registry
 
 
+_job_manager: JobManager | None = None
+_preload_thread: threading.Thread | None = None
+
+
+_result_store: ResultStore | None = None
+
+
+def get_result_store() -> ResultStore:
+    global _result_store
+    if _result_store is None:
+        _result_store = ResultStore(RESULT_STORE_DIR)
+    return _result_store
+
+
+def get_job_manager() -> JobManager:
+    global _job_manager
+    if _job_manager is None:
+        _job_manager = JobManager(state_dir=JOB_STATE_DIR)
+    return _job_manager
+
+
 def bad_request(message: str):
     return jsonify({"detail": message}), 400
 
 
+def _track_models(*model_ids: str) -> None:
+    """Gán nhãn `model_id` cho metric của request hiện tại.
+
+    Id không có trong registry gộp thành `unknown`: client không tự tạo được series
+    metric mới bằng cách gửi id tuỳ ý.
+    """
+    known = set(get_registry().model_ids)
+    if all(model_id in known for model_id in model_ids):
+        set_request_model(",".join(sorted(model_ids)))
+    else:
+        set_request_model(UNKNOWN_MODEL_LABEL)
+
+
+def _is_truthy(value: str | None) -> bool:
+    return (value or "").strip().lower() in {"1", "true", "yes", "on"}
+
+
+@app.before_request
+def _start_request_timing():
+    g.started_at = time.perf_counter()
+    g.timings_token = begin_request()
+
+
+@app.after_request
+def _finish_request_timing(response):
+    token = g.pop("timings_token", None)
+    if token is None:
+        return response
+    elapsed = time.perf_counter() - g.started_at
+    timings = end_request(token)
+    response.headers["Server-Timing"] = server_timing_header(timings, elapsed)
+    endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    METRICS.observe_request(endpoint, request.method, response.status_code, elapsed)
+    if response.status_code >= 400:
+        METRICS.count_error(endpoint, timings.model_id)
+    return response
+
+
 @app.route("/")
 def index():
     return send_from_directory(FRONTEND_DIR, "index.html")
@@ -56,12 +173,35 @@ def index():
 
 @app.route("/health")
 def health():
-    return jsonify(
-        {
-            "status": "ok",
-            "time_utc": datetime.now(timezone.utc).isoformat(),
-        }
-    )
+    payload = {
+        "status": "ok",
+        "time_utc": datetime.now(timezone.utc).isoformat(),
+    }
+    status_code = 200
+    if _registry is not None:
+        payload["models"] = _registry.model_status()
+        # Khi bật --preload: báo 503 tới khi mọi model đã nạp + warmup xong.
+        if _preload_thread is not None and (
+            _preload_thread.is_alive() or not _registry.is_ready()
+        ):
+            payload["status"] = "loading"
+            status_code = 503
+    if _registry is not None and _registry.prediction_cache is not None:
+        payload["prediction_cache"] = _registry.prediction_cache.stats()
+    if _registry is not None and _registry.micro_batch_stats():
+        payload["micro_batching"] = _registry.micro_batch_stats()
+    if _registry is not None and _registry.cascade_stats():
+        payload["cascade"] = _registry.cascade_stats()
+    if _result_store is not None:
+        payload["result_store"] = _result_store.stats()
+    if _job_manager is not None:
+        payload["jobs"] = _job_manager.stats()
+    return jsonify(payload), status_code
+
+
+@app.route("/metrics")
+def metrics():
+    return Response(METRICS.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 @app.route("/models")
@@ -78,6 +218,7 @@ def predict():
 
     if not model_id:
         return bad_request("Thiếu `model_id`.")
+    _track_models(str(model_id))
     if not text:
         return bad_request("Thiếu `text`.")
 
@@ -89,74 +230,435 @@ def predict():
         )
     except (KeyError, FileNotFoundError, ValueError) as exc:
         return bad_request(str(exc))
+    except TimeoutError as exc:  # micro-batch quá tải, chờ kết quả quá `result_timeout`
+        return jsonify({"detail": str(exc)}), 503
 
     return jsonify(result)
 
 
-@app.route("/predict-file", methods=["POST"])
-def predict_file():
-    if "file" not in request.files:
-        return bad_request("Thiếu file upload.")
+@app.route("/predict-batch", methods=["POST"])
+def predict_batch():
+    payload = request.get_json(silent=True) or {}
+    model_id = payload.get("model_id")
+    texts = payload.get("texts")
+    threshold = payload.get("threshold")
+
+    if not model_id:
+        return bad_request("Thiếu `model_id`.")
+    _track_models(str(model_id))
+    if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+        return bad_request("`texts` phải là mảng chuỗi.")
+    if not texts:
+        return bad_request("Thiếu `texts`.")
+    if len(texts) > MAX_BATCH_TEXTS:
+        return bad_request(f"Tối đa {MAX_BATCH_TEXTS} tin mỗi request.")
+    if threshold is not None:
+        try:
+            threshold = float(threshold)
+        except (TypeError, ValueError):
+            return bad_request("`threshold` phải là số từ 0 đến 1.")
+        if not 0.0 <= threshold <= 1.0:
+            return bad_request("`threshold` phải là số từ 0 đến 1.")
+
+    try:
+        result = get_registry().predict_batch_columnar(
+            model_id=str(model_id),
+            texts=texts,
+            threshold=threshold,
+        )
+    except (KeyError, FileNotFoundError, ValueError) as exc:
+        return bad_request(str(exc))
+
+    return jsonify(result.to_json())
+
+
+@app.route("/predict-stream", methods=["POST"])
+def predict_stream():
+    model_id = request.args.get("model_id")
+    threshold_value = request.args.get("threshold")
+    batch_size_value = request.args.get("batch_size")
+
+    if not model_id:
+        return bad_request("Thiếu `model_id`.")
+    _track_models(model_id)
+    try:
+        threshold = float(threshold_value) if threshold_value not in (None, "") else None
+    except ValueError:
+        return bad_request("`threshold` phải là số từ 0 đến 1.")
+    try:
+        batch_size = int(batch_size_value) if batch_size_value else STREAM_BATCH_SIZE
+    except ValueError:
+        return bad_request("`batch_size` phải là số nguyên.")
+
+    registry = get_registry()
+    try:
+        # Nạp model trước khi trả header 200 để lỗi cấu hình còn trả được 400.
+        registry.get_model(model_id)
+    except (KeyError, FileNotFoundError, ValueError) as exc:
+        return bad_request(str(exc))
+
+    results = stream_predictions(
+        registry,
+        model_id,
+        request.stream,
+        threshold=threshold,
+        batch_size=max(1, min(batch_size, 1000)),
+    )
+    return Response(results, mimetype="application/x-ndjson")
 
+
+def _parse_batch_form() -> dict[str, Any]:
+    """Đọc tham số chung của `/predict-file` và `/jobs`; lỗi => ValueError."""
+    if "file" not in request.files:
+        raise ValueError("Thiếu file upload.")
     file = request.files["file"]
-    model_id = request.form.get("model_id")
-    text_column = request.form.get("text_column") or None
+    # Kiểm tra đuôi trước khi tra kho: đuôi là 1 phần khoá kết quả.
+    extension = validate_extension(file.filename or "")
+
+    # Nhiều model: lặp trường `model_id` hoặc phân tách bằng dấu phẩy.
+    model_ids = list(
+        dict.fromkeys(
+            item.strip()
+            for value in request.form.getlist("model_id")
+            for item in value.split(",")
+            if item.strip()
+        )
+    )
     threshold_value = request.form.get("threshold")
     preview_limit = request.form.get("preview_limit", "20")
 
-    if not model_id:
-        return bad_request("Thiếu `model_id`.")
+    if not model_ids:
+        raise ValueError("Thiếu `model_id`.")
+    model_id = ",".join(model_ids)
+    _track_models(*model_ids)
 
     try:
         threshold = float(threshold_value) if threshold_value not in (None, "") else None
     except ValueError:
-        return bad_request("`threshold` phải là số từ 0 đến 1.")
+        raise ValueError("`threshold` phải là số từ 0 đến 1.") from None
 
     try:
         preview_limit = int(preview_limit)
     except ValueError:
         preview_limit = 20
-    preview_limit = max(10, min(preview_limit, 50))
 
-    content = file.read()
+    return {
+        "file": file,
+        "extension": extension,
+        "model_id": model_id,
+        "model_ids": model_ids,
+        "text_column": request.form.get("text_column") or None,
+        "threshold": threshold,
+        "preview_limit": max(10, min(preview_limit, MAX_PREVIEW_ROWS)),
+    }
+
+
+def _output_name(model_ids: list[str]) -> str:
+    return f"predict_{'__'.join(model_ids)}_{datetime.now().strftime('%Y%m%d%H%M%S')}.csv"
+
+
+def _write_file_predictions(model_ids: list[str], **kwargs: Any) -> BatchFileSummary:
+    """1 model: CSV như cũ; nhiều model: 1 lượt parse/chuẩn hoá, cột riêng từng model."""
+    if len(model_ids) == 1:
+        return write_predictions_csv(registry=get_registry(), model_id=model_ids[0], **kwargs)
+    return write_multi_predictions_csv(registry=get_registry(), model_ids=model_ids, **kwargs)
+
+
+def _file_result(summary: BatchFileSummary, model_ids: list[str]) -> dict[str, Any]:
+    result: dict[str, Any] = {
+        "total_rows": summary.total_rows,
+        "unique_rows": summary.unique_rows,
+        "dedup_ratio": round(summary.dedup_ratio, 4),
+    }
+    if len(model_ids) > 1:
+        result["model_ids"] = model_ids
+        result["disagreement_rows"] = summary.disagreement_rows
+    return result
+
+
+def _result_key(content_digest: str, form: dict[str, Any]) -> tuple[str, dict[str, Any]]:
+    """(result_id, thành phần khoá) trong kho kết quả; model_id không tồn tại => KeyError."""
+    registry = get_registry()
+    versions = {model_id: registry.model_version(model_id) for model_id in form["model_ids"]}
+    parts = ResultStore.key_parts(
+        content_digest, versions, form["text_column"], form["extension"]
+    )
+    return ResultStore.make_key_from_parts(parts, form["threshold"]), parts
+
+
+def _store_file_predictions(
+    result_key: tuple[str, dict[str, Any]],
+    form: dict[str, Any],
+    chunks: Iterator[list[str]],
+    selected_column: str,
+    on_chunk: Callable[[BatchFileSummary], None] | None = None,
+) -> StoredResult:
+    """Chấm điểm, ghi CSV nén + ma trận điểm thẳng vào kho kết quả, lưu payload trả client."""
+    store = get_result_store()
+    result_id, key_parts = result_key
+    model_ids = form["model_ids"]
+    temp_path, scores_temp_path = store.temp_paths(result_id)
+    summary = _write_file_predictions(
+        model_ids,
+        chunks=chunks,
+        output_path=temp_path,
+        threshold=form["threshold"],
+        preview_limit=MAX_PREVIEW_ROWS,
+        on_chunk=on_chunk,
+        scores_path=scores_temp_path,
+    )
+    payload = {
+        **_file_result(summary, model_ids),
+        "text_column_used": selected_column,
+        "preview": summary.preview,
+    }
+    return store.put(
+        result_id,
+        temp_path,
+        _output_name(model_ids),
+        payload,
+        key_parts=key_parts,
+        scores_temp_path=scores_temp_path,
+        score_columns=model_ids,
+    )
+
+
+def _stored_response(stored: StoredResult, preview_limit: int, cached: bool) -> dict[str, Any]:
+    payload = dict(stored.payload)
+    payload["preview"] = payload["preview"][:preview_limit]
+    return {
+        **payload,
+        "result_id": stored.result_id,
+        "download_url": stored.download_url,
+        "cached": cached,
+    }
+
+
+@app.route("/predict-file", methods=["POST"])
+def predict_file():
+    try:
+        form = _parse_batch_form()
+    except ValueError as exc:
+        return bad_request(str(exc))
+
+    file = form["file"]
+    text_column = form["text_column"]
+
+    filename = file.filename or ""
+    use_stream = _is_truthy(request.form.get("stream")) or (
+        (request.content_length or 0) > MAX_FILE_SIZE_BYTES
+    )
     try:
-        messages, selected_column = parse_messages_from_content(
-            filename=file.filename or "",
-            content=content,
-            text_column=text_column,
-        )
-        predictions = get_registry().predict_batch(
-            model_id=str(model_id),
-            texts=messages,
-            threshold=threshold,
-        )
+        if use_stream:
+            if (request.content_length or 0) > MAX_STREAM_FILE_SIZE_BYTES:
+                return bad_request("File vượt quá giới hạn upload.")
+            result_key = _result_key(digest_stream(file.stream), form)
+        else:
+            content = file.read()
+            result_key = _result_key(digest_bytes(content), form)
+
+        stored = get_result_store().lookup(result_key[0])
+        cached = stored is not None
+        if stored is None:
+            if use_stream:
+                chunks, selected_column = iter_message_chunks(
+                    filename=filename,
+                    stream=file.stream,
+                    text_column=text_column,
+                )
+            else:
+                messages, selected_column = parse_messages_from_content(
+                    filename=filename,
+                    content=content,
+                    text_column=text_column,
+                )
+                chunks = iter([messages])
+            stored = _store_file_predictions(result_key, form, chunks, selected_column)
     except (KeyError, FileNotFoundError, ValueError) as exc:
         return bad_request(str(exc))
 
-    rows = []
-    for idx, result in enumerate(predictions, start=1):
-        rows.append(
-            {
-                "row_id": idx,
-                "text": result["text"],
-                "label": result["label"],
-                "score": result["score"],
-                "threshold_used": result["threshold_used"],
-                "model_id": result["model_id"],
-            }
+    response = _stored_response(stored, form["preview_limit"], cached)
+    return jsonify({"model_id": form["model_id"], **response})
+
+
+def _run_file_job(job: BatchJob, upload_path: Path, form: dict[str, Any]) -> dict[str, Any]:
+    token = begin_request(job.model_id)
+    try:
+        with upload_path.open("rb") as handle:
+            result_key = _result_key(digest_stream(handle), form)
+            stored = get_result_store().lookup(result_key[0])
+            if stored is not None:
+                return _stored_response(stored, form["preview_limit"], cached=True)
+            chunks, selected_column = iter_message_chunks(
+                filename=job.filename,
+                stream=handle,
+                text_column=form["text_column"],
+            )
+            stored = _store_file_predictions(
+                result_key,
+                form,
+                chunks,
+                selected_column,
+                on_chunk=lambda progress: get_job_manager().report_progress(
+                    job, progress.total_rows, handle.tell()
+                ),
+            )
+    except Exception:
+        METRICS.count_error("job", job.model_id)
+        raise
+    finally:
+        end_request(token)
+        upload_path.unlink(missing_ok=True)
+
+    return _stored_response(stored, form["preview_limit"], cached=False)
+
+
+@app.route("/jobs", methods=["POST"])
+def create_job():
+    try:
+        form = _parse_batch_form()
+        for model_id in form["model_ids"]:
+            get_registry().get_config(model_id)
+    except (KeyError, ValueError) as exc:
+        return bad_request(str(exc))
+    if (request.content_length or 0) > MAX_STREAM_FILE_SIZE_BYTES:
+        return bad_request("File vượt quá giới hạn upload.")
+
+    file = form.pop("file")
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    upload_path = UPLOAD_DIR / f"{uuid.uuid4().hex}{form['extension']}"
+    file.save(upload_path)
+    job = BatchJob(
+        model_id=form["model_id"],
+        filename=file.filename or "",
+        bytes_total=upload_path.stat().st_size,
+    )
+    try:
+        get_job_manager().submit(job, lambda item: _run_file_job(item, upload_path, form))
+    except JobQueueFullError as exc:
+        upload_path.unlink(missing_ok=True)
+        return jsonify({"detail": str(exc)}), 429
+
+    return jsonify({"job_id": job.job_id, "status_url": f"/jobs/{job.job_id}"}), 202
+
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id: str):
+    try:
+        job = get_job_manager().get(job_id)
+    except KeyError as exc:
+        return jsonify({"detail": str(exc)}), 404
+    return jsonify(job.to_dict())
+
+
+def _get_stored_result(result_id: str) -> StoredResult:
+    stored = get_result_store().get(result_id) if result_id.isalnum() else None
+    if stored is None:
+        raise KeyError("Không tìm thấy kết quả (đã hết hạn hoặc bị dọn).")
+    return stored
+
+
+@app.route("/results/<result_id>/relabel", methods=["POST"])
+def relabel_result(result_id: str):
+    payload = request.get_json(silent=True) or {}
+    try:
+        threshold = float(payload.get("threshold"))
+    except (TypeError, ValueError):
+        return bad_request("`threshold` phải là số từ 0 đến 1.")
+    if not 0.0 <= threshold <= 1.0:
+        return bad_request("`threshold` phải là số từ 0 đến 1.")
+    try:
+        preview_limit = max(10, min(int(payload.get("preview_limit", 20)), MAX_PREVIEW_ROWS))
+    except (TypeError, ValueError):
+        preview_limit = 20
+
+    store = get_result_store()
+    try:
+        source = _get_stored_result(result_id)
+    except KeyError as exc:
+        return jsonify({"detail": str(exc)}), 404
+    model_ids = source.score_columns or []
+    _track_models(*model_ids)
+    if source.key_parts is not None:
+        # Cùng khoá với upload lại file ở ngưỡng mới => upload đó cũng trúng kho.
+        new_id = ResultStore.make_key_from_parts(source.key_parts, threshold)
+    else:
+        new_id = ResultStore.make_key(result_id, {}, threshold, None)
+
+    stored = store.lookup(new_id)
+    cached = stored is not None
+    if stored is None:
+        try:
+            scores = store.load_scores(source)
+        except ValueError as exc:
+            return bad_request(str(exc))
+        temp_path, scores_temp_path = store.temp_paths(new_id)
+        with stage("write"):
+            summary = relabel_csv(
+                store.data_path(result_id), scores, model_ids, threshold, temp_path
+            )
+            shutil.copyfile(store.scores_path(result_id), scores_temp_path)
+        result = {
+            **source.payload,
+            "preview": relabel_preview(source.payload["preview"], threshold),
+        }
+        if len(model_ids) > 1:
+            result["disagreement_rows"] = summary.disagreement_rows
+        stored = store.put(
+            new_id,
+            temp_path,
+            _output_name(model_ids),
+            result,
+            key_parts=source.key_parts,
+            scores_temp_path=scores_temp_path,
+            score_columns=model_ids,
+        )
+
+    return jsonify(
+        {
+            "model_id": ",".join(model_ids),
+            **_stored_response(stored, preview_limit, cached),
+            "threshold_used": threshold,
+            "source_result_id": result_id,
+        }
+    )
+
+
+@app.route("/results/<result_id>/spam-counts")
+def result_spam_counts(result_id: str):
+    values = request.args.get("thresholds")
+    try:
+        thresholds = (
+            [float(value) for value in values.split(",") if value.strip()]
+            if values
+            else list(DEFAULT_THRESHOLDS)
         )
+    except ValueError:
+        return bad_request("`thresholds` phải là danh sách số, phân tách bằng dấu phẩy.")
+    if not thresholds:
+        return bad_request("Thiếu `thresholds`.")
 
-    output_name = f"predict_{model_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}.csv"
-    output_path = RESULT_DIR / output_name
-    pd.DataFrame(rows).to_csv(output_path, index=False, encoding="utf-8-sig")
+    store = get_result_store()
+    try:
+        stored = _get_stored_result(result_id)
+        scores = store.load_scores(stored)
+    except KeyError as exc:
+        return jsonify({"detail": str(exc)}), 404
+    except ValueError as exc:
+        return bad_request(str(exc))
 
+    counts = {}
+    for column, model_id in enumerate(stored.score_columns or []):
+        model_scores = np.asarray(scores[:, column])
+        counts[model_id] = (
+            None if np.isnan(model_scores).all() else spam_counts(model_scores, thresholds)
+        )
     return jsonify(
         {
-            "model_id": model_id,
-            "total_rows": len(rows),
-            "text_column_used": selected_column,
-            "preview": rows[:preview_limit],
-            "download_url": f"/download/{output_name}",
+            "result_id": result_id,
+            "total_rows": int(scores.shape[0]),
+            "thresholds": thresholds,
+            "spam_counts": counts,
         }
     )
 
@@ -164,6 +666,30 @@ def predict_file():
 @app.route("/download/<path:filename>")
 def download_result(filename: str):
     safe_name = Path(filename).name
+    result_id = safe_name.removesuffix(".csv")
+    try:
+        stored = _get_stored_result(result_id)
+    except KeyError:
+        stored = None
+    if stored is not None:
+        store = get_result_store()
+        if request.accept_encodings["gzip"]:
+            # Gửi nguyên file nén, trình duyệt/curl --compressed tự giải nén.
+            response = send_file(
+                store.data_path(result_id),
+                mimetype="text/csv",
+                as_attachment=True,
+                download_name=stored.download_name,
+            )
+            response.headers["Content-Encoding"] = "gzip"
+        else:
+            response = Response(store.iter_csv(result_id), mimetype="text/csv")
+            response.headers["Content-Disposition"] = (
+                f'attachment; filename="{stored.download_name}"'
+            )
+        response.vary.add("Accept-Encoding")
+        return response
+
     path = (RESULT_DIR / safe_name).resolve()
     if not path.exists() or path.parent != RESULT_DIR.resolve():
         return bad_request("Không tìm thấy file kết quả.")
@@ -175,18 +701,145 @@ def open_browser(host: str, port: int) -> None:
     webbrowser.open(url)
 
 
+def _on_worker_start(worker_index: int) -> None:
+    registry = get_registry()
+    if worker_index > 0:
+        registry.set_embedding_stores_read_only()
+    else:
+        # Worker ghi có thể là bản fork lại: trạng thái kho kế thừa từ cha đã cũ.
+        registry.resync_embedding_stores()
+    for model_id in registry.loaded_model_ids():
+        registry.warmup(model_id)
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="Chạy Flask API + UI trong 1 lệnh.")
     parser.add_argument("--host", default="127.0.0.1", help="Host chạy server")
     parser.add_argument("--port", default=8000, type=int, help="Port chạy server")
     parser.add_argument("--no-open", action="store_true", help="Không tự mở trình duyệt")
+    parser.add_argument(
+        "--cache-entries",
+        default=0,
+        type=int,
+        help="Bật cache kết quả dự đoán với tối đa N entry (0 = tắt)",
+    )
+    parser.add_argument(
+        "--cache-mb",
+        default=None,
+        type=float,
+        help="Giới hạn bộ nhớ ước lượng của cache dự đoán (MB)",
+    )
+    parser.add_argument(
+        "--job-workers",
+        default=2,
+        type=int,
+        help="Số job file chạy nền đồng thời tối đa (/jobs)",
+    )
+    parser.add_argument(
+        "--micro-batch-ms",
+        default=0.0,
+        type=float,
+        help="Gom các /predict đồng thời trong N ms thành 1 batch (0 = tắt)",
+    )
+    parser.add_argument(
+        "--micro-batch-size",
+        default=32,
+        type=int,
+        help="Kích thước batch tối đa khi gom /predict",
+    )
+    parser.add_argument(
+        "--workers",
+        default=1,
+        type=int,
+        help="Số process phục vụ (>1: nạp model 1 lần rồi fork, chỉ Linux/macOS)",
+    )
+    parser.add_argument(
+        "--worker-threads",
+        default=None,
+        type=int,
+        help="Số thread torch/BLAS mỗi worker (mặc định: số CPU / số worker)",
+    )
+    parser.add_argument(
+        "--result-ttl-hours",
+        default=DEFAULT_TTL_SECONDS / 3600,
+        type=float,
+        help="Thời gian giữ kết quả /predict-file, /jobs trong kho (giờ)",
+    )
+    parser.add_argument(
+        "--result-max-mb",
+        default=DEFAULT_MAX_BYTES / 1024 / 1024,
+        type=float,
+        help="Tổng dung lượng tối đa của kho kết quả (MB, file đã nén)",
+    )
+    parser.add_argument(
+        "--preload",
+        action="store_true",
+        help="Nạp song song + warmup mọi model khi khởi động (/health trả 503 tới khi xong)",
+    )
+    parser.add_argument(
+        "--models",
+        default=None,
+        help="Chỉ phục vụ các model_id này, phân tách bằng dấu phẩy (mặc định: cả registry)",
+    )
     args = parser.parse_args()
+    model_ids = [item.strip() for item in (args.models or "").split(",") if item.strip()]
+
+    try:
+        ensure_models(model_ids or None)
+    except ValueError as exc:  # model_id sai trong --models
+        parser.error(str(exc))
+
+    global _result_store
+    _result_store = ResultStore(
+        RESULT_STORE_DIR,
+        ttl_seconds=args.result_ttl_hours * 3600,
+        max_bytes=int(args.result_max_mb * 1024 * 1024),
+    )
+    _result_store.evict()
+
+    global _job_manager
+    _job_manager = JobManager(max_workers=max(1, args.job_workers), state_dir=JOB_STATE_DIR)
 
-    ensure_models()
+    global _registry
+    prediction_cache = None
+    if args.cache_entries > 0:
+        max_bytes = int(args.cache_mb * 1024 * 1024) if args.cache_mb else None
+        prediction_cache = PredictionCache(max_entries=args.cache_entries, max_bytes=max_bytes)
+    micro_batch = None
+    if args.micro_batch_ms > 0:
+        micro_batch = {"max_wait_ms": args.micro_batch_ms, "max_batch_size": args.micro_batch_size}
+    _registry = ModelRegistry(
+        REGISTRY_PATH,
+        prediction_cache=prediction_cache,
+        micro_batch=micro_batch,
+        model_ids=model_ids or None,
+    )
 
     if not args.no_open:
         threading.Timer(1.0, open_browser, args=(args.host, args.port)).start()
 
+    if args.workers > 1:
+        threads = args.worker_threads or max(1, (os.cpu_count() or 1) // args.workers)
+        # Nạp ở process cha, warmup ở từng worker (OpenMP đã khởi tạo không an toàn khi fork).
+        _registry.preload(warmup=False)
+        serve_prefork(
+            app,
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            threads_per_worker=threads,
+            on_worker_start=_on_worker_start,
+        )
+        return
+
+    global _preload_thread
+    if args.worker_threads:
+        # Trước khi preload: thư viện nạp sau đó (torch, BLAS) cũng nhận giới hạn.
+        limit_threads(args.worker_threads)
+    if args.preload:
+        _preload_thread = threading.Thread(target=_registry.preload, name="preload", daemon=True)
+        _preload_thread.start()
+
     app.run(host=args.host, port=args.port, debug=False)
 
 
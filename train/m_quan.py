@@ -6,6 +6,7 @@ Lý do tồn tại file này:
 2. Bản mới tập trung vào luồng deploy thực tế:
    - đóng gói model joblib cho inference ổn định;
    - kiểm tra nhanh dự đoán theo model_id;
+   - chấm điểm offline file lớn (pool process, shard, chạy tiếp khi bị ngắt);
    - cập nhật registry để frontend/backend đọc được đồng nhất.
 """
 
@@ -15,6 +16,7 @@ import argparse
 import sys
 from pathlib import Path
 
+from backend.app.bulk_score import DEFAULT_SHARD_ROWS, score_files
 from backend.app.model_registry import ModelRegistry
 
 ROOT_DIR = Path(__file__).resolve().parent
@@ -48,6 +50,36 @@ def du_doan_nhanh(model_id: str, text: str, threshold: float | None) -> None:
     print(f"- threshold_used: {result['threshold_used']}")
 
 
+def du_doan_file(args: argparse.Namespace) -> None:
+    """Chấm điểm hàng loạt file, in tốc độ từng worker và tổng."""
+    model_ids = [item.strip() for item in args.model_id.split(",") if item.strip()]
+    report = score_files(
+        inputs=[Path(item) for item in args.inputs],
+        output_dir=Path(args.output_dir),
+        registry_path=Path(args.registry),
+        model_ids=model_ids,
+        threshold=args.threshold,
+        text_column=args.text_column,
+        shard_rows=args.shard_rows,
+        workers=args.workers,
+        threads_per_worker=args.threads,
+        compress=args.gzip,
+    )
+
+    print("Tốc độ từng worker:")
+    for pid, stats in sorted(report.workers.items()):
+        print(
+            f"- pid {pid}: {stats.shards} shard, {stats.rows:,} dòng, "
+            f"{stats.rows_per_second:,.0f} dòng/s"
+        )
+    print(
+        f"Tổng: {report.total_rows:,} dòng, chấm mới {report.scored_rows:,} dòng "
+        f"({report.shards_written} shard, bỏ qua {report.shards_skipped} shard đã xong) "
+        f"trong {report.wall_seconds:,.1f}s = {report.rows_per_second:,.0f} dòng/s"
+    )
+    print(f"Kết quả + manifest: {report.output_dir}")
+
+
 def tao_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         description="Tiện ích đóng gói model và kiểm thử inference cho đồ án SpamHam.",
@@ -72,6 +104,44 @@ def tao_parser() -> argparse.ArgumentParser:
         help="Ngưỡng spam (0-1). Nếu bỏ trống sẽ dùng default của model.",
     )
 
+    predict_file = sub.add_parser(
+        "du-doan-file",
+        help="Chấm điểm offline file lớn (.txt/.csv đọc luồng, .xlsx đọc cả file) bằng pool process.",
+    )
+    predict_file.add_argument("inputs", nargs="+", help="Các file cần chấm điểm")
+    predict_file.add_argument(
+        "--model-id",
+        required=True,
+        help="1 hoặc nhiều model_id, phân tách bằng dấu phẩy (ví dụ: bnb_binary,lr_embedding)",
+    )
+    predict_file.add_argument(
+        "--output-dir",
+        required=True,
+        help="Thư mục ghi shard + manifest.json; chạy lại cùng thư mục sẽ bỏ qua shard đã xong",
+    )
+    predict_file.add_argument("--registry", default=str(REGISTRY_PATH), help="File registry")
+    predict_file.add_argument("--threshold", type=float, default=None, help="Ngưỡng spam (0-1)")
+    predict_file.add_argument("--text-column", default=None, help="Cột văn bản của .csv/.xlsx")
+    predict_file.add_argument(
+        "--shard-rows",
+        type=int,
+        default=DEFAULT_SHARD_ROWS,
+        help="Số tin mỗi shard (mỗi shard là 1 file output)",
+    )
+    predict_file.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Số process chấm điểm (mặc định: số CPU); mỗi process nạp model 1 lần",
+    )
+    predict_file.add_argument(
+        "--threads",
+        type=int,
+        default=None,
+        help="Số thread torch/BLAS mỗi process (mặc định: số CPU / số process)",
+    )
+    predict_file.add_argument("--gzip", action="store_true", help="Ghi shard dạng .csv.gz")
+
     return parser
 
 
@@ -91,6 +161,13 @@ def main() -> None:
         )
         return
 
+    if args.command == "du-doan-file":
+        try:
+            du_doan_file(args)
+        except (ValueError, FileNotFoundError) as exc:
+            parser.error(str(exc))
+        return
+
     parser.error("Lệnh không hợp lệ.")
 
 